@@ -1,13 +1,43 @@
 import json
 from collections import OrderedDict
+from collections.abc import Mapping
+from functools import cached_property
+from threading import local
 
-from django.contrib.gis.gdal import GDALException
+from django.contrib.gis.gdal import CoordTransform, GDALException, SpatialReference
 from django.contrib.gis.geos import GEOSException, GEOSGeometry
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
-from rest_framework.fields import Field, SerializerMethodField
+from rest_framework.exceptions import ParseError
+from rest_framework.fields import Field, ReadOnlyField, SerializerMethodField
 
-__all__ = ["GeometryField", "GeometrySerializerMethodField"]
+from .geojson import geojson_to_geos, geos_to_geojson, process_coordinates
+
+__all__ = ["GeometryField", "GeometrySerializerMethodField", "DistanceField"]
+
+_coord_transforms = local()
+
+
+def get_coord_transform(source, target):
+    """
+    Returns a ``CoordTransform`` from the ``source`` to the ``target``
+    spatial reference system, which is built only once and then reused.
+
+    GDAL transformation objects are not thread safe,
+    therefore each thread keeps its own cache.
+    """
+    try:
+        cache = _coord_transforms.cache
+    except AttributeError:
+        cache = _coord_transforms.cache = {}
+    key = (source, target)
+    coord_transform = cache.get(key)
+    if coord_transform is None:
+        if not isinstance(target, SpatialReference):
+            target = SpatialReference(target)
+        coord_transform = CoordTransform(SpatialReference(source), target)
+        cache[key] = coord_transform
+    return coord_transform
 
 
 class GeometryField(Field):
@@ -16,6 +46,7 @@ class GeometryField(Field):
     """
 
     type_name = "GeometryField"
+    zoom_param = "zoom"  # The URL query parameter which contains the zoom level
 
     def __init__(
         self,
@@ -23,48 +54,111 @@ class GeometryField(Field):
         remove_duplicates=False,
         auto_bbox=False,
         transform=None,
+        force_2d=False,
+        simplify=None,
+        preserve_topology=True,
         **kwargs,
     ):
         """
         :param auto_bbox: Whether the GeoJSON object should include a bounding box
+        :param force_2d: Whether the Z and M dimensions should be dropped
+        :param simplify: Tolerance used to simplify the geometry
+        :param preserve_topology: Whether the simplification must avoid
+                                  producing invalid geometries
         """
         self.precision = precision
         self.auto_bbox = auto_bbox
         self.remove_dupes = remove_duplicates
         self.transform = transform
+        self.force_2d = force_2d
+        self.simplify = simplify
+        self.preserve_topology = preserve_topology
         super().__init__(**kwargs)
         self.style.setdefault("base_template", "textarea.html")
 
     def to_representation(self, value):
-        if isinstance(value, dict) or value is None:
+        if isinstance(value, (dict, RawGeoJson)) or value is None:
             return value
+        # GeoJSON encoded by the database (see ``GeoFeatureModelSerializer``
+        # ``db_geojson`` option), precision, transform and bbox
+        # have already been applied by the database
+        if isinstance(value, str):
+            if not self.remove_dupes and not self.force_2d:
+                return RawGeoJson(value)
+            geojson = GeoJsonDict(value)
+            process_coordinates(
+                geojson,
+                remove_duplicates=self.remove_dupes,
+                force_2d=self.force_2d,
+            )
+            return geojson
         # we expect value to be a GEOSGeometry instance
-        if value.geojson:
-            # NOTE: For repeated transformations a gdal.CoordTransform is recommended
-            if self.transform is not None and value.srid is not None:
-                value.transform(self.transform)
-
-            geojson = GeoJsonDict(value.geojson)
-        # in this case we're dealing with an empty point
-        else:
-            geojson = GeoJsonDict({"type": value.geom_type, "coordinates": []})
-        if geojson["type"] == "GeometryCollection":
-            geometries = geojson.get("geometries")
-        else:
-            geometries = [geojson]
-        for geometry in geometries:
-            if self.precision is not None:
-                geometry["coordinates"] = self._recursive_round(
-                    geometry["coordinates"], self.precision
-                )
-            if self.remove_dupes:
-                geometry["coordinates"] = self._rm_redundant_points(
-                    geometry["coordinates"], geometry["type"]
-                )
+        value = self.transform_geometry(value)
+        tolerance = self.simplify_tolerance
+        if tolerance:
+            value = value.simplify(tolerance, preserve_topology=self.preserve_topology)
+        geojson = GeoJsonDict(
+            geos_to_geojson(
+                value,
+                precision=self.precision,
+                remove_duplicates=self.remove_dupes,
+                force_2d=self.force_2d,
+            )
+        )
         if self.auto_bbox:
             geojson["bbox"] = value.extent
+        # the bbox of the feature (``auto_bbox`` option of the serializer)
+        # is taken from the geometry which has already been transformed
+        geojson.geos = value
         return geojson
 
+    @cached_property
+    def simplify_tolerance(self):
+        """
+        The tolerance used to simplify geometries: if the view defines a
+        ``simplify_tolerances`` table (mapping zoom levels to tolerances)
+        and the zoom level is passed in the query string, the tolerance of
+        the closest lower zoom level is used, otherwise ``simplify``.
+        """
+        request = self.context.get("request")
+        tolerances = getattr(self.context.get("view"), "simplify_tolerances", None)
+        if request is None or not tolerances:
+            return self.simplify
+        zoom_string = request.query_params.get(self.zoom_param, None)
+        if not zoom_string:
+            return self.simplify
+        try:
+            zoom = int(zoom_string)
+        except ValueError:
+            raise ParseError(
+                f"Invalid zoom level supplied for parameter {self.zoom_param}"
+            )
+        levels = sorted(tolerances)
+        tolerance = tolerances[levels[0]]
+        for level in levels:
+            if level > zoom:
+                break
+            tolerance = tolerances[level]
+        return tolerance
+
+    def transform_geometry(self, value):
+        """
+        Returns ``value`` reprojected according to the ``transform`` argument.
+        The geometry passed is never modified, a transformed clone is returned.
+        """
+        if (
+            self.transform is None
+            or value.srid is None
+            or value.empty
+            or self.transform == value.srid
+        ):
+            return value
+        if isinstance(self.transform, CoordTransform):
+            coord_transform = self.transform
+        else:
+            coord_transform = get_coord_transform(value.srid, self.transform)
+        return value.transform(coord_transform, clone=True)
+
     def to_internal_value(self, value):
         if value == "" or value is None:
             return value
@@ -72,7 +166,11 @@ class GeometryField(Field):
             # value already has the correct representation
             return value
         if isinstance(value, dict):
-            value = json.dumps(value)
+            try:
+                return geojson_to_geos(value)
+            except ValueError:
+                # not handled by the fast path, GDAL parses (and validates) it
+                value = json.dumps(value)
         try:
             return GEOSGeometry(value)
         except GEOSException:
@@ -89,55 +187,46 @@ class GeometryField(Field):
             self.fail("required")
         return super().validate_empty_values(data)
 
-    def _recursive_round(self, value, precision):
-        """
-        Round all numbers within an array or nested arrays
-            value: number or nested array of numbers
-            precision: integer valueue of number of decimals to keep
-        """
-        if hasattr(value, "__iter__"):
-            return tuple(self._recursive_round(v, precision) for v in value)
-        return round(value, precision)
-
-    def _rm_redundant_points(self, geometry, geo_type):
-        """
-        Remove redundant coordinate pairs from geometry
-            geometry: array of coordinates or nested-array of coordinates
-            geo_type: GeoJSON type attribute for provided geometry, used to
-                     determine structure of provided `geometry` argument
-        """
-        if geo_type in ("MultiPoint", "LineString"):
-            close = geo_type == "LineString"
-            output = []
-            for coord in geometry:
-                coord = tuple(coord)
-                if not output or coord != output[-1]:
-                    output.append(coord)
-            if close and len(output) == 1:
-                output.append(output[0])
-            return tuple(output)
-        if geo_type in ("MultiLineString", "Polygon"):
-            return [self._rm_redundant_points(c, "LineString") for c in geometry]
-        if geo_type == "MultiPolygon":
-            return [self._rm_redundant_points(c, "Polygon") for c in geometry]
-        return geometry
-
 
 class GeometrySerializerMethodField(SerializerMethodField):
     def to_representation(self, value):
         value = super().to_representation(value)
+        if isinstance(value, RawGeoJson):
+            return value
         if value is not None:
             # we expect value to be a GEOSGeometry instance
-            return GeoJsonDict(value.geojson)
+            return GeoJsonDict(geos_to_geojson(value))
         else:
             return None
 
 
+class DistanceField(ReadOnlyField):
+    """
+    Read only field for distances annotated by the database
+    (eg: by ``KNearestNeighborsFilter``), which GeoDjango returns
+    as ``Distance`` measures, represented as numbers in ``unit``.
+    """
+
+    def __init__(self, unit="m", **kwargs):
+        self.unit = unit
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if value is None:
+            return None
+        if hasattr(value, "standard"):
+            return getattr(value, self.unit)
+        return value
+
+
 class GeoJsonDict(OrderedDict):
     """
     Used for serializing GIS values to GeoJSON values.
     """
 
+    # the GEOSGeometry which has been encoded, if any
+    geos = None
+
     def __init__(self, *args, **kwargs):
         """
         If a string is passed attempt to pass it through json.loads,
@@ -159,3 +248,47 @@ class GeoJsonDict(OrderedDict):
         see: https://github.com/openwisp/django-rest-framework-gis/pull/60
         """
         return json.dumps(self)
+
+
+class RawGeoJson(Mapping):
+    """
+    GeoJSON which has already been encoded, eg: by the database (see the
+    ``db_geojson`` option of ``GeoFeatureModelSerializer``), by a cache or
+    stored in a text column.
+
+    ``GeoJsonRenderer`` (and the renderers based on it) writes the text
+    verbatim, without decoding and encoding it again, the text is decoded
+    only if the value is accessed like a dictionary.
+    """
+
+    __slots__ = ("text", "_geojson")
+
+    def __init__(self, text):
+        if isinstance(text, bytes):
+            text = text.decode()
+        self.text = text
+        self._geojson = None
+
+    @property
+    def geojson(self):
+        """
+        The decoded ``GeoJsonDict``
+        """
+        if self._geojson is None:
+            self._geojson = GeoJsonDict(json.loads(self.text))
+        return self._geojson
+
+    def __getitem__(self, key):
+        return self.geojson[key]
+
+    def __iter__(self):
+        return iter(self.geojson)
+
+    def __len__(self):
+        return len(self.geojson)
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.text!r})"
@@ -1,15 +1,32 @@
-from math import cos, pi
+import json
+from collections.abc import Mapping
+from math import asin, cos, degrees, pi, radians, sin
 
 from django.contrib.gis import forms
 from django.contrib.gis.db import models
 from django.contrib.gis.db.models.fields import BaseSpatialField
-from django.contrib.gis.db.models.functions import GeometryDistance
-from django.contrib.gis.geos import Point, Polygon
-from django.core.exceptions import ImproperlyConfigured
+from django.contrib.gis.db.models.functions import Distance, GeometryDistance, Transform
+from django.contrib.gis.db.models.lookups import DistanceLTELookup
+from django.contrib.gis.gdal import GDALException, SpatialReference
+from django.contrib.gis.geometry import hex_regex, json_regex, wkt_regex
+from django.contrib.gis.geos import (
+    GEOSException,
+    GEOSGeometry,
+    LineString,
+    MultiPolygon,
+    Point,
+    Polygon,
+)
+from django.contrib.gis.measure import D
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import connections
 from django.db.models import Q
 from rest_framework.exceptions import ParseError
 from rest_framework.filters import BaseFilterBackend
 
+from .fields import get_coord_transform
+from .geojson import geojson_to_geos
+from .polyline import decode_polyline
 from .tilenames import tile_edges
 
 try:
@@ -31,13 +48,25 @@ __all__ = [
     "TMSTileFilter",
     "DistanceToPointFilter",
     "DistanceToPointOrderingFilter",
+    "KNearestNeighborsFilter",
+    "GeometryLookupFilter",
 ]
 
 
 class InBBoxFilter(BaseFilterBackend):
     bbox_param = "in_bbox"  # The URL query parameter which contains the bbox.
+    # The URL query parameter which contains the SRID of the bbox,
+    # when omitted the bbox is in the SRID of the filtered field.
+    bbox_srid_param = "bbox_srid"
+    # points added to each side of the bbox before transforming it,
+    # since its sides are not straight lines in the target SRID
+    bbox_transform_points = 16
 
     def get_filter_bbox(self, request):
+        """
+        Returns the bbox polygon, with the SRID passed
+        in ``bbox_srid_param`` if any, see ``split_bbox``
+        """
         bbox_string = request.query_params.get(self.bbox_param, None)
         if not bbox_string:
             return None
@@ -50,8 +79,80 @@ class InBBoxFilter(BaseFilterBackend):
             )
 
         x = Polygon.from_bbox((p1x, p1y, p2x, p2y))
+        x.srid = self.get_bbox_srid(request)
         return x
 
+    def split_bbox(self, bbox, srid):
+        """
+        Returns a ``MultiPolygon`` made of the two sides of the antimeridian
+        when the minimum longitude of ``bbox`` (built by ``Polygon.from_bbox``)
+        is greater than the maximum longitude (eg: ``in_bbox=170,-20,-170,20``)
+        and the SRID of ``bbox`` (``srid`` when it has none) is geographic.
+        """
+        srid = bbox.srid or srid
+        if not isinstance(bbox, Polygon) or not srid:
+            return bbox
+        if not SpatialReference(srid).geographic:
+            return bbox
+        ring = bbox.coords[0]
+        if len(ring) != 5 or ring[0][0] <= ring[2][0]:
+            return bbox
+        (xmin, ymin), (xmax, ymax) = ring[0][:2], ring[2][:2]
+        ymin, ymax = min(ymin, ymax), max(ymin, ymax)
+        return MultiPolygon(
+            Polygon.from_bbox((xmin, ymin, 180, ymax)),
+            Polygon.from_bbox((-180, ymin, xmax, ymax)),
+            srid=bbox.srid,
+        )
+
+    def get_bbox_srid(self, request):
+        srid_string = request.query_params.get(self.bbox_srid_param, None)
+        if not srid_string:
+            return None
+        try:
+            srid = int(srid_string)
+            SpatialReference(srid)
+        except (ValueError, GDALException):
+            raise ParseError(
+                f"Invalid SRID supplied for parameter {self.bbox_srid_param}"
+            )
+        return srid
+
+    def transform_bbox(self, bbox, srid):
+        """
+        Transforms the polygons of ``bbox`` into ``srid`` (the SRID of the
+        filtered field) once, so that the spatial index of the field can be
+        used instead of transforming each row in the database.
+        """
+        if bbox.srid is None or srid is None or bbox.srid == srid:
+            return bbox
+        coord_transform = get_coord_transform(bbox.srid, srid)
+        polygons = bbox if isinstance(bbox, MultiPolygon) else [bbox]
+        transformed = []
+        for polygon in polygons:
+            if polygon.equals(polygon.envelope):
+                polygon = self._densify_bbox(polygon.extent, polygon.srid)
+            try:
+                transformed.append(polygon.transform(coord_transform, clone=True))
+            except GDALException:
+                raise ParseError(f"The bbox can't be transformed into the SRID {srid}")
+        if isinstance(bbox, MultiPolygon):
+            return MultiPolygon(*transformed, srid=srid)
+        return transformed[0]
+
+    def _densify_bbox(self, extent, srid):
+        xmin, ymin, xmax, ymax = extent
+        steps = self.bbox_transform_points + 1
+        dx, dy = (xmax - xmin) / steps, (ymax - ymin) / steps
+        ring = (
+            [(xmin + dx * n, ymin) for n in range(steps)]
+            + [(xmax, ymin + dy * n) for n in range(steps)]
+            + [(xmax - dx * n, ymax) for n in range(steps)]
+            + [(xmin, ymax - dy * n) for n in range(steps)]
+            + [(xmin, ymin)]
+        )
+        return Polygon(ring, srid=srid)
+
     def filter_queryset(self, request, queryset, view):
         filter_field = getattr(view, "bbox_filter_field", None)
         include_overlapping = getattr(view, "bbox_filter_include_overlapping", False)
@@ -66,7 +167,20 @@ class InBBoxFilter(BaseFilterBackend):
         bbox = self.get_filter_bbox(request)
         if not bbox:
             return queryset
-        return queryset.filter(Q(**{f"{filter_field}__{geoDjango_filter}": bbox}))
+        field_srid = self._get_field_srid(queryset, filter_field)
+        bbox = self.split_bbox(bbox, field_srid)
+        bbox = self.transform_bbox(bbox, field_srid)
+        # the sides of the antimeridian are looked up separately,
+        # the bbox of the MultiPolygon would cover all the longitudes
+        polygons = bbox if isinstance(bbox, MultiPolygon) else [bbox]
+        q = Q()
+        for polygon in polygons:
+            q |= Q(**{f"{filter_field}__{geoDjango_filter}": polygon})
+        return queryset.filter(q)
+
+    @staticmethod
+    def _get_field_srid(queryset, filter_field):
+        return getattr(_get_model_field(queryset, filter_field), "srid", None)
 
     def get_schema_operation_parameters(self, view):
         return [
@@ -85,6 +199,14 @@ class InBBoxFilter(BaseFilterBackend):
                 "style": "form",
                 "explode": False,
             },
+            {
+                "name": self.bbox_srid_param,
+                "required": False,
+                "in": "query",
+                "description": "SRID of the coordinates of the bounding box, "
+                "defaults to the SRID of the filtered field",
+                "schema": {"type": "integer", "example": 3857},
+            },
         ]
 
 
@@ -92,6 +214,21 @@ class InBBoxFilter(BaseFilterBackend):
 InBBOXFilter = InBBoxFilter
 
 
+def _get_model_field(queryset, filter_field):
+    """
+    Returns the model field which ``filter_field`` (which may span
+    relationships, eg: ``location__geometry``) refers to, if any
+    """
+    model = queryset.model
+    try:
+        for name in filter_field.split("__"):
+            field = model._meta.get_field(name)
+            model = field.related_model
+    except FieldDoesNotExist:
+        return None
+    return field
+
+
 class GeometryFilter(django_filters.Filter):
     field_class = forms.GeometryField
 
@@ -148,6 +285,11 @@ class TMSTileFilter(InBBoxFilter):
 class DistanceToPointFilter(BaseFilterBackend):
     dist_param = "dist"
     point_param = "point"  # The URL query parameter which contains the
+    # SRID of the point in geodesic mode (longitude, latitude)
+    geodesic_srid = 4326
+    # smallest radius of curvature of the WGS84 ellipsoid (meters),
+    # keeps the bounding box of the geodesic circle conservative
+    geodesic_earth_radius = 6335439.0
 
     def get_filter_point(self, request, **kwargs):
         point_string = request.query_params.get(self.point_param, None)
@@ -194,15 +336,85 @@ class DistanceToPointFilter(BaseFilterBackend):
         latitudeCorrection = 0.5 * (1 + cos(lat * pi / 180))
         return distance / (earthRadius * latitudeCorrection) * rad2deg
 
+    def get_geodesic_bbox(self, point, distance):
+        """
+        Returns the extents (``(xmin, ymin, xmax, ymax)``, in degrees)
+        covering all the points within ``distance`` meters of ``point``
+        (longitude, latitude): two extents when the circle crosses the
+        antimeridian, all the longitudes when it contains a pole, see
+        http://janmatuschek.de/LatitudeLongitudeBoundingCoordinates
+        """
+        lon, lat = radians(point.x), radians(point.y)
+        angle = distance / self.geodesic_earth_radius
+        min_lat, max_lat = lat - angle, lat + angle
+        if min_lat <= -pi / 2 or max_lat >= pi / 2 or angle >= pi / 2:
+            min_lat, max_lat = max(min_lat, -pi / 2), min(max_lat, pi / 2)
+            return [(-180, degrees(min_lat), 180, degrees(max_lat))]
+        delta_lon = asin(min(sin(angle) / cos(lat), 1))
+        xmin, xmax = degrees(lon - delta_lon), degrees(lon + delta_lon)
+        ymin, ymax = degrees(min_lat), degrees(max_lat)
+        if xmin < -180:
+            return [(xmin + 360, ymin, 180, ymax), (-180, ymin, xmax, ymax)]
+        if xmax > 180:
+            return [(xmin, ymin, 180, ymax), (-180, ymin, xmax - 360, ymax)]
+        return [(xmin, ymin, xmax, ymax)]
+
+    def get_geodesic_filter(self, queryset, filter_field, point, distance):
+        """
+        Returns the lookup of the rows within ``distance`` meters
+        of ``point``, measured on the ellipsoid:
+
+        * geography fields use ``dwithin``, which is exact and index assisted
+        * geometry fields are prefiltered with the (index assisted)
+          ``bboverlaps`` lookup on the bounding box of the geodesic circle,
+          the exact ``distance_lte`` on the spheroid is then checked
+          in the same query on the remaining rows only; projected fields
+          are transformed into ``geodesic_srid`` for the exact check
+        """
+        field = _get_model_field(queryset, filter_field)
+        srid = getattr(field, "srid", None)
+        geographic = not srid or SpatialReference(srid).geographic
+        if getattr(field, "geography", False) or geographic:
+            target_srid = srid
+        else:
+            target_srid = self.geodesic_srid
+        if target_srid and target_srid != point.srid:
+            coord_transform = get_coord_transform(point.srid, target_srid)
+            point = point.transform(coord_transform, clone=True)
+            point.srid = target_srid
+        if getattr(field, "geography", False):
+            return Q(**{f"{filter_field}__dwithin": (point, D(m=distance))})
+        bbox = Q()
+        for extent in self.get_geodesic_bbox(point, distance):
+            polygon = Polygon.from_bbox(extent)
+            polygon.srid = point.srid
+            if not geographic:
+                try:
+                    polygon = InBBoxFilter().transform_bbox(polygon, srid)
+                except ParseError:
+                    # eg: the poles in web mercator, only the exact check is used
+                    bbox = Q()
+                    break
+            bbox |= Q(**{f"{filter_field}__bboverlaps": polygon})
+        lookup = (point, D(m=distance), "spheroid")
+        if geographic:
+            return bbox & Q(**{f"{filter_field}__distance_lte": lookup})
+        lhs = Transform(filter_field, point.srid)
+        return bbox & Q(DistanceLTELookup(lhs, lookup))
+
     def filter_queryset(self, request, queryset, view):
         filter_field = getattr(view, "distance_filter_field", None)
         convert_distance_input = getattr(view, "distance_filter_convert_meters", False)
+        geodesic = getattr(view, "distance_filter_geodesic", False)
         geoDjango_filter = "dwithin"  # use dwithin for points
 
         if not filter_field:
             return queryset
 
-        point = self.get_filter_point(request)
+        if geodesic:
+            point = self.get_filter_point(request, srid=self.geodesic_srid)
+        else:
+            point = self.get_filter_point(request)
         if not point:
             return queryset
 
@@ -217,6 +429,11 @@ class DistanceToPointFilter(BaseFilterBackend):
                 )
             )
 
+        if geodesic:
+            return queryset.filter(
+                self.get_geodesic_filter(queryset, filter_field, point, dist)
+            )
+
         if convert_distance_input:
             # Warning:  assumes that the point is (lon,lat)
             dist = self.dist_to_deg(dist, point[1])
@@ -291,3 +508,274 @@ class DistanceToPointOrderingFilter(DistanceToPointFilter):
                 "explode": False,
             },
         ]
+
+
+class KNearestNeighborsFilter(DistanceToPointFilter):
+    """
+    Returns the ``k`` instances nearest to a point, optionally within
+    ``dist`` meters, annotated with their distance from the point.
+    """
+
+    k_param = "k"
+    default_k = 10
+    max_k = 100
+    # name of the annotation which contains the distance, which can be
+    # included in the properties with ``DistanceField``
+    distance_annotation = "distance"
+
+    def get_k(self, request, view):
+        default_k = getattr(view, "knn_default_k", self.default_k)
+        max_k = getattr(view, "knn_max_k", self.max_k)
+        k_string = request.query_params.get(self.k_param, default_k)
+        try:
+            k = int(k_string)
+            if k < 1:
+                raise ValueError()
+        except ValueError:
+            raise ParseError(f"Invalid number supplied for parameter {self.k_param}")
+        return min(k, max_k)
+
+    def get_max_distance(self, request):
+        dist_string = request.query_params.get(self.dist_param, None)
+        if not dist_string:
+            return None
+        try:
+            return float(dist_string)
+        except ValueError:
+            raise ParseError(
+                f"Invalid distance string supplied for parameter {self.dist_param}"
+            )
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Orders by ``GeometryDistance`` (the ``<->`` operator, which is
+        index assisted on PostGIS) and restricts the results to the ``k``
+        nearest rows with a subquery (``LIMIT k``), the queryset is not
+        sliced: pagination and the following filter backends still work.
+
+        Detail routes (``lookup_url_kwarg`` in the URL) are not restricted.
+        """
+        filter_field = getattr(view, "knn_filter_field", None)
+        if not filter_field:
+            return queryset
+
+        point = self.get_filter_point(request, srid=self.geodesic_srid)
+        if not point:
+            return queryset
+        k = self.get_k(request, view)
+        max_distance = self.get_max_distance(request)
+
+        field = _get_model_field(queryset, filter_field)
+        srid = getattr(field, "srid", None)
+        geodesic_point = point
+        if srid and srid != point.srid:
+            point = point.transform(get_coord_transform(point.srid, srid), clone=True)
+            point.srid = srid
+        if max_distance is not None:
+            queryset = queryset.filter(
+                self.get_geodesic_filter(queryset, filter_field, point, max_distance)
+            )
+        projected = (
+            srid
+            and not getattr(field, "geography", False)
+            and not SpatialReference(srid).geographic
+        )
+        if projected:
+            # the units of projected SRIDs are not meters on the ellipsoid,
+            # the distance is measured in geodesic_srid (see get_geodesic_filter)
+            lhs = Transform(filter_field, self.geodesic_srid)
+            distance = Distance(lhs, geodesic_point, spheroid=True)
+        else:
+            distance = Distance(filter_field, point, spheroid=True)
+        queryset = queryset.annotate(**{self.distance_annotation: distance})
+        if getattr(connections[queryset.db].ops, "postgis", False):
+            queryset = queryset.order_by(GeometryDistance(filter_field, point))
+        else:
+            queryset = queryset.order_by(self.distance_annotation)
+        if self._is_detail(view):
+            return queryset
+        return queryset.filter(pk__in=queryset.values("pk")[:k])
+
+    @staticmethod
+    def _is_detail(view):
+        lookup = getattr(view, "lookup_url_kwarg", None) or getattr(
+            view, "lookup_field", None
+        )
+        return lookup is not None and lookup in getattr(view, "kwargs", {})
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.point_param,
+                "required": False,
+                "in": "query",
+                "description": "Point represented in **lon,lat** format, "
+                "the nearest objects to this point are returned",
+                "schema": {
+                    "type": "array",
+                    "items": {"type": "number", "format": "float"},
+                    "minItems": 2,
+                    "maxItems": 2,
+                    "example": [0, 10],
+                },
+                "style": "form",
+                "explode": False,
+            },
+            {
+                "name": self.k_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of objects to return, "
+                f"at most {getattr(view, 'knn_max_k', self.max_k)}",
+                "schema": {
+                    "type": "integer",
+                    "default": getattr(view, "knn_default_k", self.default_k),
+                },
+            },
+            {
+                "name": self.dist_param,
+                "required": False,
+                "in": "query",
+                "description": "Maximum distance from the point in meters",
+                "schema": {"type": "number", "format": "float"},
+            },
+        ]
+
+
+class GeometryLookupFilter(BaseFilterBackend):
+    """
+    Filters a queryset with a spatial lookup (``intersects``, ``within``
+    or ``contains``) against a geometry passed in the query string or,
+    in ``POST`` requests, in the request body.
+    """
+
+    # WKT, EWKT, HEXEWKB, GeoJSON or encoded polyline, not named "geometry"
+    # which can omit the geometry (see GeoFeatureModelSerializer.geometry_param)
+    geometry_param = "geometry_filter"
+    lookup_param = "geometry_lookup"
+    lookups = ("intersects", "within", "contains")
+    # bounding box operators which prefilter the rows with the spatial index
+    bbox_lookups = {
+        "intersects": "bboverlaps",
+        "within": "contained",
+        "contains": "bbcontains",
+    }
+    srid = 4326  # SRID of the geometries which don't specify it
+    polyline_precision = 5
+    max_vertices = 10000
+
+    def _get_param(self, request, name):
+        value = request.query_params.get(name, None)
+        if not value and request.method == "POST" and isinstance(request.data, Mapping):
+            value = request.data.get(name, None)
+        return value or None
+
+    def parse_geometry(self, value):
+        """
+        Returns the ``GEOSGeometry`` of ``value``: a GeoJSON dictionary or
+        a string containing WKT, EWKT, HEXEWKB, GeoJSON or an encoded
+        polyline, which is a ``Polygon`` when its ends are the same point
+        """
+        if isinstance(value, dict):
+            try:
+                return geojson_to_geos(value)
+            except ValueError:
+                value = json.dumps(value)
+        if not isinstance(value, str):
+            raise TypeError(f"Unsupported geometry value: {type(value).__name__}")
+        if wkt_regex.match(value) or hex_regex.match(value) or json_regex.match(value):
+            return GEOSGeometry(value)
+        coordinates = decode_polyline(value.strip(), self.polyline_precision)
+        if len(coordinates) == 1:
+            return Point(coordinates[0], srid=self.srid)
+        if len(coordinates) > 3 and coordinates[0] == coordinates[-1]:
+            return Polygon(coordinates, srid=self.srid)
+        return LineString(coordinates, srid=self.srid)
+
+    def get_filter_geometry(self, request, view, srid=None):
+        """
+        Returns the geometry transformed into ``srid`` (the SRID of the
+        filtered field) and simplified with the tolerance of the
+        ``geometry_filter_simplify`` view attribute, if any.
+        """
+        value = self._get_param(request, self.geometry_param)
+        if not value:
+            return None
+        try:
+            geometry = self.parse_geometry(value)
+        except (ValueError, TypeError, GEOSException, GDALException):
+            raise ParseError(
+                f"Invalid geometry supplied for parameter {self.geometry_param}"
+            )
+        # checked on the input, before paying for the transformation
+        max_vertices = getattr(view, "geometry_filter_max_vertices", self.max_vertices)
+        if max_vertices and geometry.num_coords > max_vertices:
+            raise ParseError(
+                f"The geometry supplied for parameter {self.geometry_param} "
+                f"has more than {max_vertices} vertices"
+            )
+        if geometry.srid is None:
+            geometry.srid = self.srid
+        if srid and geometry.srid != srid:
+            try:
+                geometry.transform(get_coord_transform(geometry.srid, srid))
+            except GDALException:
+                raise ParseError(
+                    f"The geometry can't be transformed into the SRID {srid}"
+                )
+        tolerance = getattr(view, "geometry_filter_simplify", None)
+        if tolerance:
+            geometry = geometry.simplify(tolerance, preserve_topology=True)
+        return geometry
+
+    def get_lookup(self, request, view):
+        lookup = self._get_param(request, self.lookup_param)
+        if not lookup:
+            return getattr(view, "geometry_filter_lookup", self.lookups[0])
+        if lookup not in self.lookups:
+            raise ParseError(
+                f"Invalid lookup supplied for parameter {self.lookup_param}, "
+                f"expected one of: {', '.join(self.lookups)}"
+            )
+        return lookup
+
+    def filter_queryset(self, request, queryset, view):
+        filter_field = getattr(view, "geometry_filter_field", None)
+        if not filter_field:
+            return queryset
+
+        srid = getattr(_get_model_field(queryset, filter_field), "srid", None)
+        geometry = self.get_filter_geometry(request, view, srid)
+        if geometry is None:
+            return queryset
+        lookup = self.get_lookup(request, view)
+        return queryset.filter(
+            Q(**{f"{filter_field}__{self.bbox_lookups[lookup]}": geometry}),
+            Q(**{f"{filter_field}__{lookup}": geometry}),
+        )
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.geometry_param,
+                "required": False,
+                "in": "query",
+                "description": "Geometry to filter by, in WKT, EWKT, GeoJSON "
+                "or encoded polyline format",
+                "schema": {
+                    "type": "string",
+                    "example": "POLYGON((0 0, 10 0, 10 10, 0 0))",
+                },
+            },
+            {
+                "name": self.lookup_param,
+                "required": False,
+                "in": "query",
+                "description": "Spatial relationship between the objects and the geometry",
+                "schema": {
+                    "type": "string",
+                    "enum": list(self.lookups),
+                    "default": getattr(view, "geometry_filter_lookup", self.lookups[0]),
+                },
+            },
+        ]
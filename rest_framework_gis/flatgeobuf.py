@@ -0,0 +1,542 @@
+"""
+GeoJSON to FlatGeobuf encoding.
+
+A FlatGeobuf file is made of a header, an optional packed Hilbert R-tree
+spatial index and the features, sorted by the Hilbert value of the center
+of their bounding box; the header and each feature are size prefixed
+FlatBuffers tables, see https://flatgeobuf.org and
+https://github.com/flatgeobuf/flatgeobuf/tree/master/src/fbs
+"""
+
+import json
+from array import array
+from decimal import Decimal
+from math import ceil, floor, inf
+from struct import pack
+
+__all__ = ["encode_flatgeobuf"]
+
+MAGIC_BYTES = b"fgb\x03fgb\x00"
+
+GEOMETRY_TYPES = {
+    "Point": 1,
+    "LineString": 2,
+    "Polygon": 3,
+    "MultiPoint": 4,
+    "MultiLineString": 5,
+    "MultiPolygon": 6,
+    "GeometryCollection": 7,
+}
+
+# column types
+BOOL = 2
+LONG = 7
+DOUBLE = 10
+STRING = 11
+JSON = 12
+
+HILBERT_MAX = (1 << 16) - 1
+
+
+def encode_flatgeobuf(
+    features, srid=4326, index_node_size=16, name=None, buffer_size=64 * 1024
+):
+    """
+    Returns an iterator which yields the FlatGeobuf file containing
+    ``features`` (GeoJSON feature dictionaries) as chunks of bytes,
+    the id of the features is stored in the ``id`` column.
+
+    The coordinates of the features are copied into arrays of doubles
+    and kept in memory, along with the properties, until the columns,
+    the extent and the index are known.
+
+    :param srid: EPSG code of the coordinate reference system,
+                 ``None`` leaves it unspecified
+    :param index_node_size: number of children of each node of the
+                            spatial index, ``0`` disables the index
+    :param name: the name of the dataset
+    :param buffer_size: the features are yielded in chunks of about
+                        this size (in bytes)
+    """
+    items = []
+    columns = {}
+    has_z = None
+    for feature in features:
+        geometry = _Geometry.from_geojson(feature.get("geometry"))
+        properties = feature.get("properties") or {}
+        # FlatGeobuf features have no id
+        if feature.get("id") is not None and "id" not in properties:
+            properties = {"id": feature["id"], **properties}
+        for key, value in properties.items():
+            if value is not None:
+                column_type = _get_column_type(value)
+                columns[key] = _merge_column_types(columns.get(key), column_type)
+        if geometry is not None:
+            has_z = geometry.has_z if has_z is None else has_z and geometry.has_z
+        items.append((geometry, properties))
+    has_z = bool(has_z)
+    bboxes = [_get_bbox(geometry) for geometry, _ in items]
+    extent = _merge_bboxes(bboxes)
+    # the index of a single feature would be useless
+    if len(items) < 2:
+        index_node_size = 0
+    if index_node_size:
+        order = _hilbert_sort(bboxes, extent)
+    else:
+        order = range(len(items))
+    column_indexes = {key: index for index, key in enumerate(columns)}
+    header = _encode_header(
+        name=name,
+        extent=extent,
+        geometry_type=_get_geometry_type(geometry for geometry, _ in items),
+        has_z=has_z,
+        columns=columns,
+        features_count=len(items),
+        index_node_size=index_node_size,
+        srid=srid,
+    )
+    encoded = (
+        _encode_feature(*items[index], columns, column_indexes, has_z)
+        for index in order
+    )
+    if not index_node_size:
+        yield MAGIC_BYTES + header
+        yield from _join_chunks(encoded, buffer_size)
+        return
+    # the offsets of the features are needed by the index,
+    # which is written before them
+    encoded = list(encoded)
+    offsets = []
+    offset = 0
+    for data in encoded:
+        offsets.append(offset)
+        offset += len(data)
+    index = _encode_index([bboxes[i] for i in order], offsets, index_node_size)
+    yield MAGIC_BYTES + header
+    yield from _join_chunks([index], buffer_size)
+    yield from _join_chunks(encoded, buffer_size)
+
+
+def _join_chunks(chunks, buffer_size):
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+class _Geometry:
+    """
+    Flattened geometry: coordinates are stored in arrays of doubles,
+    ``ends`` holds the end index of each ring or line (if more than one),
+    collections and multi polygons are made of ``parts``
+    """
+
+    __slots__ = ("type", "xy", "z", "ends", "parts")
+
+    def __init__(self, geom_type, xy=None, z=None, ends=None, parts=None):
+        self.type = geom_type
+        self.xy = xy
+        self.z = z
+        self.ends = ends
+        self.parts = parts
+
+    @property
+    def has_z(self):
+        if self.parts is not None:
+            return all(part.has_z for part in self.parts)
+        return self.z is not None
+
+    @classmethod
+    def from_geojson(cls, geometry):
+        if not geometry:
+            return None
+        geom_type = geometry["type"]
+        if geom_type == "GeometryCollection":
+            parts = [cls.from_geojson(member) for member in geometry["geometries"]]
+            parts = [part for part in parts if part is not None]
+            return cls(geom_type, parts=parts) if parts else None
+        coordinates = geometry["coordinates"]
+        if geom_type == "MultiPolygon":
+            parts = [
+                cls.from_geojson({"type": "Polygon", "coordinates": polygon})
+                for polygon in coordinates
+            ]
+            parts = [part for part in parts if part is not None]
+            return cls(geom_type, parts=parts) if parts else None
+        if geom_type == "Point":
+            lines = [[coordinates]] if coordinates else []
+        elif geom_type in ("LineString", "MultiPoint"):
+            lines = [coordinates]
+        elif geom_type in ("Polygon", "MultiLineString"):
+            lines = coordinates
+        else:
+            raise ValueError(f"Unsupported geometry type: {geom_type}")
+        xy = array("d")
+        z = array("d")
+        ends = []
+        for line in lines:
+            for position in line:
+                xy.append(position[0])
+                xy.append(position[1])
+                if z is not None and len(position) > 2:
+                    z.append(position[2])
+                else:
+                    z = None
+            ends.append(len(xy) // 2)
+        # empty geometries are encoded as null geometries
+        if not xy:
+            return None
+        return cls(geom_type, xy, z, ends if len(ends) > 1 else None)
+
+
+def _get_bbox(geometry):
+    """
+    Returns the bounding box of ``geometry``, null
+    geometries have an empty (inverted) bounding box
+    """
+    if geometry is None:
+        return (inf, inf, -inf, -inf)
+    if geometry.parts is not None:
+        return _merge_bboxes(_get_bbox(part) for part in geometry.parts)
+    xs = geometry.xy[::2]
+    ys = geometry.xy[1::2]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _merge_bboxes(bboxes):
+    min_x = min_y = inf
+    max_x = max_y = -inf
+    for bbox in bboxes:
+        min_x = min(min_x, bbox[0])
+        min_y = min(min_y, bbox[1])
+        max_x = max(max_x, bbox[2])
+        max_y = max(max_y, bbox[3])
+    return (min_x, min_y, max_x, max_y)
+
+
+def _get_geometry_type(geometries):
+    """
+    Returns the type of the geometries if they're all
+    of the same type, ``0`` (unknown) otherwise
+    """
+    types = {geometry.type for geometry in geometries if geometry is not None}
+    if len(types) == 1:
+        return GEOMETRY_TYPES[types.pop()]
+    return 0
+
+
+def _get_column_type(value):
+    if isinstance(value, bool):
+        return BOOL
+    if isinstance(value, int):
+        return LONG
+    if isinstance(value, (float, Decimal)):
+        return DOUBLE
+    if isinstance(value, (dict, list)):
+        return JSON
+    return STRING
+
+
+def _merge_column_types(current, column_type):
+    if current is None or current == column_type:
+        return column_type
+    if {current, column_type} == {LONG, DOUBLE}:
+        return DOUBLE
+    if JSON in (current, column_type):
+        return JSON
+    return STRING
+
+
+def _encode_property(column_type, value):
+    if column_type == BOOL:
+        return pack("<B", value)
+    if column_type == LONG:
+        return pack("<q", value)
+    if column_type == DOUBLE:
+        return pack("<d", float(value))
+    if column_type == JSON:
+        data = json.dumps(value, default=str).encode()
+    elif isinstance(value, str):
+        data = value.encode()
+    else:
+        data = json.dumps(value, default=str).encode()
+    return pack("<I", len(data)) + data
+
+
+def _hilbert_sort(bboxes, extent):
+    """
+    Returns the indexes of ``bboxes`` sorted by
+    the Hilbert value of their centers
+    """
+    min_x, min_y, max_x, max_y = extent
+    width = max_x - min_x if extent[0] != inf else 0
+    height = max_y - min_y if extent[0] != inf else 0
+    values = []
+    for bbox in bboxes:
+        x = y = 0
+        if bbox[0] != inf:
+            if width:
+                x = floor(HILBERT_MAX * ((bbox[0] + bbox[2]) / 2 - min_x) / width)
+            if height:
+                y = floor(HILBERT_MAX * ((bbox[1] + bbox[3]) / 2 - min_y) / height)
+        values.append(_hilbert(x, y))
+    return sorted(range(len(bboxes)), key=values.__getitem__, reverse=True)
+
+
+def _hilbert(x, y):
+    """
+    Returns the position of (x, y) on the Hilbert curve of order 16, see
+    https://github.com/rawrunprotected/hilbert_curves (public domain)
+    """
+    a = x ^ y
+    b = 0xFFFF ^ a
+    c = 0xFFFF ^ (x | y)
+    d = x & (y ^ 0xFFFF)
+    A = a | (b >> 1)
+    B = (a >> 1) ^ a
+    C = ((c >> 1) ^ (b & (d >> 1))) ^ c
+    D = ((a & (c >> 1)) ^ (d >> 1)) ^ d
+
+    a, b, c, d = A, B, C, D
+    A = (a & (a >> 2)) ^ (b & (b >> 2))
+    B = (a & (b >> 2)) ^ (b & ((a ^ b) >> 2))
+    C ^= (a & (c >> 2)) ^ (b & (d >> 2))
+    D ^= (b & (c >> 2)) ^ ((a ^ b) & (d >> 2))
+
+    a, b, c, d = A, B, C, D
+    A = (a & (a >> 4)) ^ (b & (b >> 4))
+    B = (a & (b >> 4)) ^ (b & ((a ^ b) >> 4))
+    C ^= (a & (c >> 4)) ^ (b & (d >> 4))
+    D ^= (b & (c >> 4)) ^ ((a ^ b) & (d >> 4))
+
+    a, b, c, d = A, B, C, D
+    C ^= (a & (c >> 8)) ^ (b & (d >> 8))
+    D ^= (b & (c >> 8)) ^ ((a ^ b) & (d >> 8))
+
+    a = C ^ (C >> 1)
+    b = D ^ (D >> 1)
+    i0 = x ^ y
+    i1 = b | (0xFFFF ^ (i0 | a))
+    return (_interleave(i1) << 1) | _interleave(i0)
+
+
+def _interleave(value):
+    value = (value | (value << 8)) & 0x00FF00FF
+    value = (value | (value << 4)) & 0x0F0F0F0F
+    value = (value | (value << 2)) & 0x33333333
+    value = (value | (value << 1)) & 0x55555555
+    return value
+
+
+def _encode_index(bboxes, offsets, node_size):
+    """
+    Returns the packed Hilbert R-tree of the features, ``bboxes`` and
+    ``offsets`` (the byte offsets of the features) are in Hilbert order.
+
+    Nodes are stored level by level starting from the root, the leaves
+    (the features) are at the end; the offset of each internal node is
+    the index of its first child.
+    """
+    # number of nodes of each level, from the leaves to the root
+    level_sizes = [len(bboxes)]
+    count = len(bboxes)
+    while True:
+        count = ceil(count / node_size)
+        level_sizes.append(count)
+        if count == 1:
+            break
+    num_nodes = sum(level_sizes)
+    level_starts = []
+    end = num_nodes
+    for size in level_sizes:
+        end -= size
+        level_starts.append(end)
+    nodes = [None] * num_nodes
+    leaves_start = level_starts[0]
+    for index, (bbox, offset) in enumerate(zip(bboxes, offsets)):
+        nodes[leaves_start + index] = (*bbox, offset)
+    for level in range(len(level_sizes) - 1):
+        start = level_starts[level]
+        end = start + level_sizes[level]
+        parent = level_starts[level + 1]
+        for first in range(start, end, node_size):
+            last = min(first + node_size, end)
+            children = nodes[first:last]
+            nodes[parent] = (
+                min(child[0] for child in children),
+                min(child[1] for child in children),
+                max(child[2] for child in children),
+                max(child[3] for child in children),
+                first,
+            )
+            parent += 1
+    return b"".join(pack("<ddddQ", *node) for node in nodes)
+
+
+def _encode_header(
+    name, extent, geometry_type, has_z, columns, features_count, index_node_size, srid
+):
+    builder = _Builder()
+    column_offsets = []
+    for column_name, column_type in columns.items():
+        name_offset = builder.create_string(column_name)
+        column_offsets.append(
+            builder.create_table([(0, "offset", name_offset), (1, "B", column_type)])
+        )
+    fields = [
+        (2, "B", geometry_type),
+        (3, "B", has_z),
+        (8, "Q", features_count),
+        (9, "H", index_node_size),
+    ]
+    if name:
+        fields.append((0, "offset", builder.create_string(name)))
+    if extent[0] != inf:
+        fields.append((1, "offset", builder.create_vector("d", extent)))
+    if column_offsets:
+        fields.append((7, "offset", builder.create_offset_vector(column_offsets)))
+    if srid:
+        org = builder.create_string("EPSG")
+        crs = builder.create_table([(0, "offset", org), (1, "i", srid)])
+        fields.append((10, "offset", crs))
+    return builder.finish(builder.create_table(fields))
+
+
+def _encode_feature(geometry, properties, columns, column_indexes, has_z):
+    builder = _Builder()
+    fields = []
+    if geometry is not None:
+        fields.append((0, "offset", _encode_geometry(builder, geometry, has_z)))
+    data = b"".join(
+        pack("<H", column_indexes[key]) + _encode_property(columns[key], value)
+        for key, value in properties.items()
+        if value is not None
+    )
+    if data:
+        fields.append((1, "offset", builder.create_vector("B", data)))
+    return builder.finish(builder.create_table(fields))
+
+
+def _encode_geometry(builder, geometry, has_z):
+    fields = [(6, "B", GEOMETRY_TYPES[geometry.type])]
+    if geometry.parts is not None:
+        parts = [_encode_geometry(builder, part, has_z) for part in geometry.parts]
+        fields.append((7, "offset", builder.create_offset_vector(parts)))
+        return builder.create_table(fields)
+    if geometry.ends:
+        fields.append((0, "offset", builder.create_vector("I", geometry.ends)))
+    if geometry.xy:
+        fields.append((1, "offset", builder.create_vector("d", geometry.xy)))
+    if has_z and geometry.z:
+        fields.append((2, "offset", builder.create_vector("d", geometry.z)))
+    return builder.create_table(fields)
+
+
+class _Builder:
+    """
+    Minimal FlatBuffers builder: like the reference implementation,
+    the buffer is built back to front, positions are counted from
+    the end of the buffer and referenced objects are written first
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+        self.min_align = 1
+
+    def write(self, data):
+        self.chunks.append(data)
+        self.size += len(data)
+
+    def prep(self, align, additional):
+        """
+        Pads the buffer so that it's aligned to ``align``
+        after writing ``additional`` bytes
+        """
+        self.min_align = max(self.min_align, align)
+        padding = -(self.size + additional) % align
+        if padding:
+            self.write(b"\x00" * padding)
+
+    def write_offset(self, position):
+        self.prep(4, 4)
+        self.write(pack("<I", self.size + 4 - position))
+
+    def create_string(self, value):
+        data = value.encode()
+        self.prep(4, len(data) + 1)
+        self.write(data + b"\x00")
+        self.prep(4, 4)
+        self.write(pack("<I", len(data)))
+        return self.size
+
+    def create_vector(self, fmt, values):
+        if fmt == "B":
+            data = bytes(values)
+        else:
+            data = array(fmt, values).tobytes()
+        self.prep(4, len(data))
+        self.prep(array(fmt).itemsize, len(data))
+        self.write(data)
+        self.write(pack("<I", len(values)))
+        return self.size
+
+    def create_offset_vector(self, positions):
+        self.prep(4, 4 * len(positions))
+        for position in reversed(positions):
+            self.write_offset(position)
+        self.write(pack("<I", len(positions)))
+        return self.size
+
+    def create_table(self, fields):
+        """
+        Writes a table made of ``fields``, a list of
+        (field index, struct format or "offset", value)
+        """
+        object_end = self.size
+        field_positions = {}
+        # larger fields first, to minimize the padding
+        for index, fmt, value in sorted(
+            fields, key=lambda field: -_field_size(field[1])
+        ):
+            if fmt == "offset":
+                self.write_offset(value)
+            else:
+                self.prep(_field_size(fmt), _field_size(fmt))
+                self.write(pack(f"<{fmt}", value))
+            field_positions[index] = self.size
+        self.prep(4, 4)
+        soffset_index = len(self.chunks)
+        self.write(b"\x00\x00\x00\x00")
+        table = self.size
+        num_fields = max(field_positions, default=-1) + 1
+        vtable = [4 + 2 * num_fields, table - object_end]
+        for index in range(num_fields):
+            position = field_positions.get(index)
+            vtable.append(table - position if position else 0)
+        self.write(pack(f"<{len(vtable)}H", *vtable))
+        # the vtable is located before the table
+        self.chunks[soffset_index] = pack("<i", self.size - table)
+        return table
+
+    def finish(self, root):
+        """
+        Returns the size prefixed buffer
+        """
+        self.prep(self.min_align, 8)
+        self.write_offset(root)
+        self.write(pack("<I", self.size))
+        return b"".join(reversed(self.chunks))
+
+
+def _field_size(fmt):
+    if fmt == "offset":
+        return 4
+    return array(fmt).itemsize
@@ -0,0 +1,62 @@
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import GeomOutputGeoFunc
+from django.db.models import Func, IntegerField
+
+__all__ = [
+    "AsMVTGeom",
+    "ClusterDBSCAN",
+    "Simplify",
+    "SimplifyPreserveTopology",
+    "TileEnvelope",
+]
+
+
+class AsMVTGeom(GeomOutputGeoFunc):
+    """
+    Transforms a geometry into the coordinate space of a
+    Mapbox Vector Tile, clipping it to the tile bounds (PostGIS)
+    """
+
+    function = "ST_AsMVTGeom"
+    arity = 5
+
+
+class TileEnvelope(Func):
+    """
+    Returns the envelope of the tile with
+    the supplied address in EPSG:3857 (PostGIS)
+    """
+
+    function = "ST_TileEnvelope"
+    arity = 3
+    output_field = GeometryField(srid=3857)
+
+
+class Simplify(GeomOutputGeoFunc):
+    """
+    Simplifies a geometry with the Douglas-Peucker algorithm
+    """
+
+    function = "ST_Simplify"
+    arity = 2
+
+
+class SimplifyPreserveTopology(GeomOutputGeoFunc):
+    """
+    Simplifies a geometry avoiding the creation of invalid geometries
+    """
+
+    function = "ST_SimplifyPreserveTopology"
+    arity = 2
+
+
+class ClusterDBSCAN(Func):
+    """
+    Window function returning the number of the density based cluster
+    of each geometry, must be used with ``Window`` (PostGIS)
+    """
+
+    function = "ST_ClusterDBSCAN"
+    arity = 3
+    window_compatible = True
+    output_field = IntegerField()
@@ -0,0 +1,454 @@
+"""
+GeoJSON to Geobuf encoding and decoding.
+
+Geobuf is a lossless compact binary encoding of GeoJSON based on protocol
+buffers: coordinates are stored as delta-encoded integers at a fixed
+precision and property keys are stored once, see
+https://github.com/mapbox/geobuf/blob/master/geobuf.proto
+"""
+
+import json
+import struct
+
+from .protobuf import (
+    double_field,
+    iter_fields,
+    message,
+    packed,
+    read_packed,
+    unzigzag,
+    varint_field,
+    zigzag,
+)
+
+__all__ = ["decode_geobuf", "encode_geobuf"]
+
+GEOMETRY_TYPES = [
+    "Point",
+    "MultiPoint",
+    "LineString",
+    "MultiLineString",
+    "Polygon",
+    "MultiPolygon",
+    "GeometryCollection",
+]
+GEOMETRY_TYPE_CODES = {name: code for code, name in enumerate(GEOMETRY_TYPES)}
+
+# members which are not stored as custom properties
+SPECIAL_KEYS = {
+    "FeatureCollection": {"type", "features"},
+    "Feature": {"type", "id", "properties", "geometry"},
+    "Geometry": {"type", "coordinates", "arcs", "geometries", "properties"},
+}
+
+MAX_PRECISION = 6
+# limits of the decoded data, larger values are rejected as invalid
+MAX_DECODED_DIMENSIONS = 4
+MAX_DECODED_PRECISION = 15
+
+
+def encode_geobuf(data, precision=None):
+    """
+    Returns the Geobuf encoding of a GeoJSON dictionary (a FeatureCollection,
+    a Feature or a geometry).
+
+    :param precision: number of decimal digits of the coordinates,
+                      if ``None`` the precision is the smallest one which
+                      represents the coordinates exactly (at most 6 digits)
+    """
+    encoder = _Encoder(precision)
+    return encoder.encode(data)
+
+
+def decode_geobuf(data):
+    """
+    Returns the GeoJSON dictionary encoded by ``data``.
+
+    Raises ``ValueError`` when ``data`` is not valid Geobuf.
+    """
+    try:
+        return _Decoder().decode(data)
+    except (IndexError, KeyError, TypeError, UnicodeDecodeError, struct.error) as e:
+        raise ValueError(f"Invalid Geobuf data: {e}") from e
+
+
+class _Encoder:
+    def __init__(self, precision):
+        self.precision = precision
+        self.keys = {}
+        self.dimensions = 2
+
+    def encode(self, data):
+        digits = self.analyze(data)
+        if self.precision is None:
+            self.precision = min(digits, MAX_PRECISION)
+        self.factor = 10**self.precision
+        chunks = [message(1, key.encode()) for key in self.keys]
+        if self.dimensions != 2:
+            chunks.append(varint_field(2, self.dimensions))
+        if self.precision != 6:
+            chunks.append(varint_field(3, self.precision))
+        if data["type"] == "FeatureCollection":
+            chunks.append(message(4, self.encode_feature_collection(data)))
+        elif data["type"] == "Feature":
+            chunks.append(message(5, self.encode_feature(data)))
+        else:
+            chunks.append(message(6, self.encode_geometry(data)))
+        return b"".join(chunks)
+
+    def analyze(self, data):
+        """
+        Collects the keys and the number of dimensions of the coordinates,
+        returns the number of decimal digits needed by the coordinates
+        (only computed if the precision is not set)
+        """
+        digits = 0
+        stack = [data]
+        while stack:
+            obj = stack.pop()
+            if not obj:
+                continue
+            obj_type = obj["type"]
+            if obj_type == "FeatureCollection":
+                self.add_keys(obj, SPECIAL_KEYS[obj_type])
+                stack.extend(obj["features"])
+            elif obj_type == "Feature":
+                self.add_keys(obj, SPECIAL_KEYS[obj_type])
+                self.add_keys(obj.get("properties") or {}, ())
+                stack.append(obj.get("geometry"))
+            else:
+                self.add_keys(obj, SPECIAL_KEYS["Geometry"])
+                if obj_type == "GeometryCollection":
+                    stack.extend(obj["geometries"])
+                else:
+                    digits = self.analyze_coordinates(obj["coordinates"], digits)
+        return digits
+
+    def add_keys(self, obj, special_keys):
+        keys = self.keys
+        for key in obj:
+            if key not in special_keys and key not in keys:
+                keys[key] = len(keys)
+
+    def analyze_coordinates(self, coordinates, digits):
+        if not coordinates:
+            return digits
+        if not isinstance(coordinates[0], (int, float)):
+            for member in coordinates:
+                digits = self.analyze_coordinates(member, digits)
+            return digits
+        self.dimensions = max(self.dimensions, len(coordinates))
+        if self.precision is not None:
+            return digits
+        for value in coordinates:
+            factor = 10**digits
+            while digits < MAX_PRECISION and round(value * factor) / factor != value:
+                digits += 1
+                factor *= 10
+        return digits
+
+    def encode_feature_collection(self, collection):
+        chunks = [
+            message(1, self.encode_feature(feature))
+            for feature in collection["features"]
+        ]
+        chunks.append(
+            self.encode_properties(collection, SPECIAL_KEYS["FeatureCollection"], 15)
+        )
+        return b"".join(chunks)
+
+    def encode_feature(self, feature):
+        chunks = []
+        if feature.get("geometry"):
+            chunks.append(message(1, self.encode_geometry(feature["geometry"])))
+        feature_id = feature.get("id")
+        if isinstance(feature_id, int) and not isinstance(feature_id, bool):
+            chunks.append(varint_field(12, zigzag(feature_id)))
+        elif feature_id is not None:
+            chunks.append(message(11, str(feature_id).encode()))
+        if feature.get("properties"):
+            chunks.append(self.encode_properties(feature["properties"], (), 14))
+        chunks.append(self.encode_properties(feature, SPECIAL_KEYS["Feature"], 15))
+        return b"".join(chunks)
+
+    def encode_geometry(self, geometry):
+        geom_type = geometry["type"]
+        chunks = [varint_field(1, GEOMETRY_TYPE_CODES[geom_type])]
+        if geom_type == "GeometryCollection":
+            for member in geometry["geometries"]:
+                chunks.append(message(4, self.encode_geometry(member)))
+        else:
+            lengths, coords = self.encode_coordinates(
+                geom_type, geometry["coordinates"]
+            )
+            chunks.append(packed(2, lengths))
+            chunks.append(packed(3, [zigzag(value) for value in coords]))
+        chunks.append(self.encode_properties(geometry, SPECIAL_KEYS["Geometry"], 15))
+        return b"".join(chunks)
+
+    def encode_coordinates(self, geom_type, coordinates):
+        """
+        Returns the lengths and the delta-encoded integer coordinates,
+        the last point of the rings is left out
+        """
+        lengths = []
+        coords = []
+        if not coordinates:
+            return lengths, coords
+        if geom_type == "Point":
+            self.add_line(coords, [coordinates])
+        elif geom_type in ("MultiPoint", "LineString"):
+            self.add_line(coords, coordinates)
+        elif geom_type in ("MultiLineString", "Polygon"):
+            closed = geom_type == "Polygon"
+            if len(coordinates) != 1:
+                lengths = [len(line) - closed for line in coordinates]
+            for line in coordinates:
+                self.add_line(coords, line, closed)
+        else:
+            if len(coordinates) != 1 or len(coordinates[0]) != 1:
+                lengths.append(len(coordinates))
+                for polygon in coordinates:
+                    lengths.append(len(polygon))
+                    lengths.extend(len(ring) - 1 for ring in polygon)
+            for polygon in coordinates:
+                for ring in polygon:
+                    self.add_line(coords, ring, closed=True)
+        return lengths, coords
+
+    def add_line(self, coords, line, closed=False):
+        factor = self.factor
+        dimensions = self.dimensions
+        previous = [0] * dimensions
+        if closed:
+            line = line[:-1]
+        for position in line:
+            for dimension in range(dimensions):
+                value = position[dimension] if dimension < len(position) else 0
+                value = round(value * factor)
+                coords.append(value - previous[dimension])
+                previous[dimension] = value
+
+    def encode_properties(self, obj, special_keys, field):
+        """
+        Returns the values followed by the pairs of
+        key and value indexes of the properties of ``obj``
+        """
+        chunks = []
+        indexes = []
+        for key, value in obj.items():
+            if key in special_keys:
+                continue
+            indexes.append(self.keys[key])
+            indexes.append(len(chunks))
+            chunks.append(message(13, _encode_value(value)))
+        chunks.append(packed(field, indexes))
+        return b"".join(chunks)
+
+
+def _encode_value(value):
+    if isinstance(value, str):
+        return message(1, value.encode())
+    if isinstance(value, bool):
+        return varint_field(5, value)
+    if isinstance(value, int) and -(2**64) < value < 2**64:
+        if value >= 0:
+            return varint_field(3, value)
+        return varint_field(4, -value)
+    if isinstance(value, float):
+        return double_field(2, value)
+    return message(6, json.dumps(value, default=str).encode())
+
+
+class _Decoder:
+    def __init__(self):
+        self.keys = []
+        self.dimensions = 2
+        self.factor = 10**6
+
+    def decode(self, data):
+        result = None
+        for field, wire_type, value in iter_fields(data):
+            if field == 1:
+                self.keys.append(_decode_string(value))
+            elif field == 2:
+                if not 1 <= value <= MAX_DECODED_DIMENSIONS:
+                    raise ValueError(f"Invalid Geobuf data: {value} dimensions")
+                self.dimensions = value
+            elif field == 3:
+                if value > MAX_DECODED_PRECISION:
+                    raise ValueError(f"Invalid Geobuf data: precision {value}")
+                self.factor = 10**value
+            elif field == 4:
+                result = self.decode_feature_collection(value)
+            elif field == 5:
+                result = self.decode_feature(value)
+            elif field == 6:
+                result = self.decode_geometry(value)
+        if result is None:
+            raise ValueError("Invalid Geobuf data: no GeoJSON object found")
+        return result
+
+    def decode_feature_collection(self, data):
+        collection = {"type": "FeatureCollection", "features": []}
+        values = []
+        start = 0
+        for field, wire_type, value in iter_fields(data):
+            if field == 1:
+                collection["features"].append(self.decode_feature(value))
+            elif field == 13:
+                values.append(_decode_value(value))
+            elif field == 15:
+                self.decode_properties(value, values, start, collection)
+                start = len(values)
+        return collection
+
+    def decode_feature(self, data):
+        feature = {"type": "Feature", "geometry": None, "properties": {}}
+        values = []
+        start = 0
+        for field, wire_type, value in iter_fields(data):
+            if field == 1:
+                feature["geometry"] = self.decode_geometry(value)
+            elif field == 11:
+                feature["id"] = _decode_string(value)
+            elif field == 12:
+                feature["id"] = unzigzag(value)
+            elif field == 13:
+                values.append(_decode_value(value))
+            elif field in (14, 15):
+                target = feature["properties"] if field == 14 else feature
+                self.decode_properties(value, values, start, target)
+                start = len(values)
+        return feature
+
+    def decode_geometry(self, data):
+        # the type is omitted by some encoders when it has the default value
+        geometry = {"type": "Point"}
+        values = []
+        start = 0
+        lengths = None
+        coords = None
+        for field, wire_type, value in iter_fields(data):
+            if field == 1:
+                geometry["type"] = GEOMETRY_TYPES[value]
+            elif field == 2:
+                lengths = read_packed(value)
+            elif field == 3:
+                coords = [unzigzag(value) for value in read_packed(value)]
+            elif field == 4:
+                geometry.setdefault("geometries", [])
+                geometry["geometries"].append(self.decode_geometry(value))
+            elif field == 13:
+                values.append(_decode_value(value))
+            elif field == 15:
+                self.decode_properties(value, values, start, geometry)
+                start = len(values)
+        if geometry["type"] == "GeometryCollection":
+            geometry.setdefault("geometries", [])
+        else:
+            geometry["coordinates"] = self.decode_coordinates(
+                geometry["type"], lengths, coords or []
+            )
+        return geometry
+
+    def decode_coordinates(self, geom_type, lengths, coords):
+        if len(coords) % self.dimensions:
+            raise ValueError(
+                f"Invalid Geobuf data: {len(coords)} coordinates "
+                f"in {self.dimensions} dimensions"
+            )
+        if geom_type == "Point":
+            return self.decode_line(coords)[0] if coords else []
+        if geom_type in ("MultiPoint", "LineString"):
+            return self.decode_line(coords)
+        if geom_type in ("MultiLineString", "Polygon"):
+            if lengths is None:
+                lengths = [len(coords) // self.dimensions] if coords else []
+            return self.decode_lines(coords, lengths, geom_type == "Polygon")[0]
+        # multi polygons made of a single ring have no lengths
+        if lengths is None:
+            lengths = [1, 1, len(coords) // self.dimensions] if coords else [0]
+        polygons = []
+        index = 1
+        offset = 0
+        for _ in range(lengths[0]):
+            if index >= len(lengths):
+                raise ValueError("Invalid Geobuf data: missing polygon lengths")
+            start = index + 1
+            index = start + lengths[index]
+            if index > len(lengths):
+                raise ValueError("Invalid Geobuf data: missing ring lengths")
+            rings, offset = self.decode_lines(
+                coords, lengths[start:index], True, offset
+            )
+            polygons.append(rings)
+        return polygons
+
+    def decode_lines(self, coords, lengths, closed, offset=0):
+        """
+        Returns the lines made of the points which follow ``offset``
+        and the offset of the following point
+        """
+        lines = []
+        for length in lengths:
+            end = offset + length * self.dimensions
+            if end > len(coords):
+                raise ValueError("Invalid Geobuf data: lengths exceed coordinates")
+            lines.append(self.decode_line(coords[offset:end], closed))
+            offset = end
+        return lines, offset
+
+    def decode_line(self, coords, closed=False):
+        dimensions = self.dimensions
+        factor = self.factor
+        current = [0] * dimensions
+        line = []
+        for index in range(0, len(coords), dimensions):
+            position = []
+            for dimension in range(dimensions):
+                current[dimension] += coords[index + dimension]
+                position.append(current[dimension] / factor)
+            line.append(position)
+        # the last point of the rings is left out
+        if closed and line:
+            line.append(list(line[0]))
+        return line
+
+    def decode_properties(self, data, values, start, target):
+        """
+        Sets the properties encoded by ``data`` on ``target``, the value
+        indexes are relative to the values which follow the previous
+        properties of the message (``start`` in ``values``)
+        """
+        indexes = read_packed(data)
+        if len(indexes) % 2:
+            raise ValueError("Invalid Geobuf data: odd number of property indexes")
+        keys = self.keys
+        values = values[start:]
+        for index in range(0, len(indexes), 2):
+            key_index, value_index = indexes[index], indexes[index + 1]
+            if key_index >= len(keys) or value_index >= len(values):
+                raise ValueError("Invalid Geobuf data: property index out of range")
+            target[keys[key_index]] = values[value_index]
+
+
+def _decode_string(data):
+    return bytes(data).decode()
+
+
+def _decode_value(data):
+    for field, wire_type, value in iter_fields(data):
+        if field == 1:
+            return _decode_string(value)
+        if field == 2:
+            return value
+        if field == 3:
+            return value
+        if field == 4:
+            return -value
+        if field == 5:
+            return bool(value)
+        if field == 6:
+            return json.loads(_decode_string(value))
+    return None
@@ -0,0 +1,381 @@
+"""
+Direct GEOS to GeoJSON encoding (and decoding).
+
+GEOS is asked for the (E)WKB representation of a geometry, which is
+obtained with a single C call, the binary coordinate arrays are then
+unpacked and arranged in the nested structure required by the GeoJSON
+specification, avoiding the round trip through the GeoJSON string
+generated by GDAL and ``json.loads``.
+
+The coordinates can be post-processed while they are unpacked (rounding,
+removal of consecutive duplicates, removal of the Z/M dimensions):
+large coordinate sequences are processed with NumPy when it's installed.
+
+The reverse conversion packs GeoJSON geometry dictionaries into WKB,
+which is read by GEOS without going through GDAL.
+"""
+
+from itertools import chain
+from math import isnan
+from struct import error as StructError
+from struct import pack, unpack_from
+
+from django.contrib.gis.geos import GEOSException, GEOSGeometry
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+__all__ = ["geos_to_geojson", "geojson_to_geos", "process_coordinates"]
+
+WKB_GEOMETRY_TYPES = {
+    1: "Point",
+    2: "LineString",
+    3: "Polygon",
+    4: "MultiPoint",
+    5: "MultiLineString",
+    6: "MultiPolygon",
+    7: "GeometryCollection",
+}
+WKB_TYPE_CODES = {value: key for key, value in WKB_GEOMETRY_TYPES.items()}
+
+# EWKB flags, see postgis/liblwgeom
+EWKB_Z_FLAG = 0x80000000
+EWKB_M_FLAG = 0x40000000
+EWKB_SRID_FLAG = 0x20000000
+
+# below this number of points the overhead
+# of NumPy is higher than the time it saves
+NUMPY_MIN_POINTS = 16
+
+
+def geos_to_geojson(geometry, precision=None, remove_duplicates=False, force_2d=False):
+    """
+    Returns a dictionary containing the GeoJSON representation
+    of the supplied ``GEOSGeometry`` instance.
+
+    :param precision: number of decimals to which coordinates are rounded
+    :param remove_duplicates: remove consecutive duplicate coordinates
+                              (after rounding) from lines and polygons
+    :param force_2d: drop the Z and M dimensions
+    """
+    if geometry.empty and geometry.geom_type != "GeometryCollection":
+        return {"type": _geojson_type(geometry.geom_type), "coordinates": []}
+    # the WKB of django includes the Z dimension of 3D geometries,
+    # which is dropped by the reader if force_2d is set
+    reader = _WKBReader(geometry.wkb, precision, remove_duplicates, force_2d)
+    geojson, _ = reader.read_geometry(0)
+    return geojson
+
+
+def geojson_to_geos(geojson):
+    """
+    Returns a ``GEOSGeometry`` instance (in SRID 4326) created
+    from a GeoJSON geometry dictionary.
+
+    Raises ``ValueError`` when the geometry is not supported by this fast
+    path (eg: empty geometries, mixed dimensions, a ``crs`` member) or is
+    not valid, the caller is expected to fall back to ``GEOSGeometry``.
+    """
+    if "crs" in geojson:
+        raise ValueError("GeoJSON crs member is not supported")
+    writer = _WKBWriter()
+    try:
+        writer.write_geometry(geojson)
+        return GEOSGeometry(memoryview(b"".join(writer.chunks)), srid=4326)
+    except (KeyError, TypeError, IndexError, StructError, GEOSException) as e:
+        raise ValueError(str(e))
+
+
+def process_coordinates(
+    geojson, precision=None, remove_duplicates=False, force_2d=False
+):
+    """
+    Applies the same post-processing performed by ``geos_to_geojson``
+    to an already decoded GeoJSON geometry dictionary (in place).
+    """
+    if geojson["type"] == "GeometryCollection":
+        for geometry in geojson["geometries"]:
+            process_coordinates(geometry, precision, remove_duplicates, force_2d)
+        return geojson
+    reader = _WKBReader(None, precision, remove_duplicates, force_2d)
+    geojson["coordinates"] = reader.process_nested(
+        geojson["coordinates"], geojson["type"]
+    )
+    return geojson
+
+
+def _geojson_type(geom_type):
+    # GeoJSON has no LinearRing type
+    if geom_type == "LinearRing":
+        return "LineString"
+    return geom_type
+
+
+class _WKBReader:
+    def __init__(self, wkb, precision, remove_duplicates, force_2d):
+        self.wkb = wkb
+        self.precision = precision
+        self.remove_duplicates = remove_duplicates
+        self.force_2d = force_2d
+
+    def read_geometry(self, offset):
+        """
+        Reads the geometry which starts at ``offset``,
+        returns a tuple containing the GeoJSON dictionary
+        and the offset at which the geometry ends.
+        """
+        wkb = self.wkb
+        byte_order = "<" if wkb[offset] else ">"
+        (type_code,) = unpack_from(f"{byte_order}I", wkb, offset + 1)
+        offset += 5
+        if type_code & EWKB_SRID_FLAG:
+            offset += 4
+        dims = 2
+        if type_code & EWKB_Z_FLAG:
+            dims += 1
+        if type_code & EWKB_M_FLAG:
+            dims += 1
+        type_code &= 0x0FFFFFFF
+        # ISO WKB encodes the dimensions in the thousands
+        if type_code > 1000:
+            dims += (1, 1, 2)[type_code // 1000 - 1]
+            type_code %= 1000
+        geom_type = WKB_GEOMETRY_TYPES[type_code]
+
+        if geom_type == "Point":
+            point = unpack_from(f"{byte_order}{dims}d", wkb, offset)
+            offset += 8 * dims
+            # empty points are encoded with NaN coordinates
+            if isnan(point[0]):
+                return {"type": geom_type, "coordinates": []}, offset
+            return {"type": geom_type, "coordinates": self.process_point(point)}, offset
+        if geom_type == "LineString":
+            coordinates, offset = self.read_points(offset, byte_order, dims)
+            return {"type": geom_type, "coordinates": coordinates}, offset
+        if geom_type == "Polygon":
+            coordinates, offset = self.read_rings(offset, byte_order, dims)
+            return {"type": geom_type, "coordinates": coordinates}, offset
+
+        (count,) = unpack_from(f"{byte_order}I", wkb, offset)
+        offset += 4
+        members = []
+        for _ in range(count):
+            member, offset = self.read_geometry(offset)
+            members.append(member)
+        if geom_type == "GeometryCollection":
+            return {"type": geom_type, "geometries": members}, offset
+        coordinates = [member["coordinates"] for member in members]
+        if geom_type == "MultiPoint" and self.remove_duplicates:
+            coordinates = remove_duplicate_points(coordinates, closed=False)
+        return {"type": geom_type, "coordinates": coordinates}, offset
+
+    def read_points(self, offset, byte_order, dims):
+        wkb = self.wkb
+        (count,) = unpack_from(f"{byte_order}I", wkb, offset)
+        offset += 4
+        end = offset + 8 * dims * count
+        if numpy is not None and count >= NUMPY_MIN_POINTS:
+            points = numpy.frombuffer(
+                wkb, dtype=f"{byte_order}f8", count=count * dims, offset=offset
+            )
+            return self.process_array(points.reshape(count, dims)), end
+        values = unpack_from(f"{byte_order}{count * dims}d", wkb, offset)
+        return self.process_points(zip(*[iter(values)] * dims)), end
+
+    def read_rings(self, offset, byte_order, dims):
+        (count,) = unpack_from(f"{byte_order}I", self.wkb, offset)
+        offset += 4
+        rings = []
+        for _ in range(count):
+            ring, offset = self.read_points(offset, byte_order, dims)
+            rings.append(ring)
+        return rings, offset
+
+    def process_point(self, point):
+        if self.force_2d:
+            point = point[:2]
+        if self.precision is not None:
+            return [round(value, self.precision) for value in point]
+        return list(point)
+
+    def process_points(self, points, closed=True):
+        """
+        Processes an iterable of coordinates in pure python
+        """
+        if self.force_2d:
+            points = (point[:2] for point in points)
+        if self.precision is not None:
+            precision = self.precision
+            points = [[round(value, precision) for value in point] for point in points]
+        else:
+            points = list(map(list, points))
+        if self.remove_duplicates:
+            points = remove_duplicate_points(points, closed)
+        return points
+
+    def process_array(self, points, closed=True):
+        """
+        Processes a NumPy array of shape (number of points, dimensions)
+        """
+        if self.force_2d:
+            points = points[:, :2]
+        if self.precision is not None:
+            points = _round_array(points, self.precision)
+        if self.remove_duplicates and len(points) > 1:
+            keep = numpy.empty(len(points), dtype=bool)
+            keep[0] = True
+            numpy.any(points[1:] != points[:-1], axis=1, out=keep[1:])
+            points = points[keep]
+            # a line must have at least two points
+            if closed and len(points) == 1:
+                return points.tolist() * 2
+        return points.tolist()
+
+    def process_nested(self, coordinates, geo_type):
+        """
+        Processes the nested coordinate arrays of a GeoJSON geometry
+        """
+        if geo_type == "Point":
+            return self.process_point(coordinates) if coordinates else coordinates
+        if geo_type in ("MultiPoint", "LineString"):
+            closed = geo_type == "LineString"
+            if numpy is not None and len(coordinates) >= NUMPY_MIN_POINTS:
+                return self.process_array(numpy.array(coordinates), closed)
+            return self.process_points(coordinates, closed)
+        if geo_type in ("MultiLineString", "Polygon"):
+            return [self.process_nested(c, "LineString") for c in coordinates]
+        if geo_type == "MultiPolygon":
+            return [self.process_nested(c, "Polygon") for c in coordinates]
+        return coordinates
+
+
+def remove_duplicate_points(points, closed=False):
+    """
+    Removes consecutive duplicate points,
+    closed lines are kept with at least two points
+    """
+    output = []
+    for point in points:
+        if not output or point != output[-1]:
+            output.append(point)
+    if closed and len(output) == 1:
+        output.append(output[0])
+    return output
+
+
+def iter_geometries(geometry):
+    """
+    Yields the members of a GeoJSON geometry collection
+    (recursively), or the geometry itself
+    """
+    if not geometry:
+        return
+    if geometry["type"] == "GeometryCollection":
+        for member in geometry["geometries"]:
+            yield from iter_geometries(member)
+    else:
+        yield geometry
+
+
+def _round_array(points, precision):
+    """
+    Rounds a NumPy array consistently with the builtin ``round()``.
+
+    NumPy rounds ``points * 10 ** precision``, the multiplication can turn
+    a value which is slightly below or above a half into an exact half, the
+    few values affected are rounded with the builtin ``round()``.
+    """
+    rounded = points.round(precision)
+    if precision >= 0:
+        scaled = points * 10.0**precision
+    else:
+        scaled = points / 10.0**-precision
+    for index in zip(*numpy.nonzero(scaled - numpy.floor(scaled) == 0.5)):
+        rounded[index] = round(float(points[index]), precision)
+    return rounded
+
+
+class _WKBWriter:
+    """
+    Writes the little endian EWKB representation of a GeoJSON geometry
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.dims = None
+
+    def write_geometry(self, geojson):
+        geom_type = geojson["type"]
+        type_code = WKB_TYPE_CODES[geom_type]
+        if geom_type == "GeometryCollection":
+            geometries = geojson["geometries"]
+            self.chunks.append(pack("<BII", 1, type_code, len(geometries)))
+            for geometry in geometries:
+                self.write_geometry(geometry)
+            return
+        coordinates = geojson["coordinates"]
+        dims = _get_dimensions(coordinates)
+        if self.dims is None:
+            self.dims = dims
+        elif dims != self.dims:
+            raise ValueError("mixed dimensions are not supported")
+        if dims == 3:
+            type_code |= EWKB_Z_FLAG
+        if geom_type == "Point":
+            self.chunks.append(pack("<BI", 1, type_code))
+            self.write_points([coordinates], dims, count=False)
+        elif geom_type == "LineString":
+            self.chunks.append(pack("<BI", 1, type_code))
+            self.write_points(coordinates, dims)
+        elif geom_type == "Polygon":
+            self.chunks.append(pack("<BI", 1, type_code))
+            self.write_rings(coordinates, dims)
+        else:
+            # multi geometries are made of geometries of a single type
+            member_type_code = type_code - 3
+            self.chunks.append(pack("<BII", 1, type_code, len(coordinates)))
+            for member in coordinates:
+                self.chunks.append(pack("<BI", 1, member_type_code))
+                if geom_type == "MultiPoint":
+                    self.write_points([member], dims, count=False)
+                elif geom_type == "MultiLineString":
+                    self.write_points(member, dims)
+                else:
+                    self.write_rings(member, dims)
+
+    def write_rings(self, rings, dims):
+        self.chunks.append(pack("<I", len(rings)))
+        for ring in rings:
+            self.write_points(ring, dims)
+
+    def write_points(self, points, dims, count=True):
+        if not points:
+            raise ValueError("empty geometries are not supported")
+        if count:
+            self.chunks.append(pack("<I", len(points)))
+        if numpy is not None and len(points) >= NUMPY_MIN_POINTS:
+            array = numpy.asarray(points)
+            if array.shape != (len(points), dims) or array.dtype.kind not in "iuf":
+                raise ValueError("invalid coordinates")
+            self.chunks.append(array.astype("<f8").tobytes())
+            return
+        for point in points:
+            if len(point) != dims:
+                raise ValueError("mixed dimensions are not supported")
+        self.chunks.append(
+            pack(f"<{len(points) * dims}d", *chain.from_iterable(points))
+        )
+
+
+def _get_dimensions(coordinates):
+    """
+    Returns the number of dimensions of the first
+    point found in the nested coordinate arrays
+    """
+    while coordinates and isinstance(coordinates[0], (list, tuple)):
+        coordinates = coordinates[0]
+    if len(coordinates) not in (2, 3):
+        raise ValueError("only 2D and 3D coordinates are supported")
+    return len(coordinates)
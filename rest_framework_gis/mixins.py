@@ -0,0 +1,534 @@
+from itertools import islice
+
+from django.contrib.gis.db.models.aggregates import Collect
+from django.contrib.gis.db.models.functions import Centroid, SnapToGrid, Transform
+from django.contrib.gis.gdal import SpatialReference
+from django.contrib.gis.geos import GEOSGeometry, Polygon
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, router, transaction
+from django.db.models import BinaryField, Count, ExpressionWrapper, F, Value, Window
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from .filters import _get_model_field
+from .functions import AsMVTGeom, ClusterDBSCAN, TileEnvelope
+from .geojson import geos_to_geojson
+from .mvt import MERCATOR_ORIGIN, encode_tile, tile_bounds, tile_geometry
+from .renderers import MvtRenderer, StreamingGeoJsonRenderer
+from .serializers import GeoFeatureModelSerializer
+
+__all__ = [
+    "GeoFeatureQuerysetMixin",
+    "StreamingGeoJsonListMixin",
+    "StreamingGeoJsonCreateMixin",
+    "VectorTileMixin",
+    "TileCacheMixin",
+    "ClusterMixin",
+]
+
+# model fields whose values can be encoded by ST_AsMVT
+# as they would be represented by the serializer
+MVT_COLUMN_TYPES = {
+    "AutoField",
+    "BigAutoField",
+    "SmallAutoField",
+    "BooleanField",
+    "CharField",
+    "TextField",
+    "SlugField",
+    "EmailField",
+    "URLField",
+    "IntegerField",
+    "BigIntegerField",
+    "SmallIntegerField",
+    "PositiveIntegerField",
+    "PositiveBigIntegerField",
+    "PositiveSmallIntegerField",
+    "FloatField",
+}
+
+
+class GeoFeatureQuerysetMixin:
+    """
+    Loads only the columns and relations used by the serializer,
+    see ``GeoFeatureModelSerializer.optimize_queryset``.
+
+    Must be used with ``GenericAPIView``.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if not hasattr(serializer_class, "optimize_queryset"):
+            return queryset
+        return serializer_class.optimize_queryset(
+            queryset, self.get_serializer_context()
+        )
+
+
+class StreamingGeoJsonListMixin:
+    """
+    List a queryset as a GeoJSON FeatureCollection which is serialized
+    and sent to the client feature by feature, so that memory usage
+    does not grow with the number of rows.
+
+    Must be used with ``GenericAPIView`` and a ``GeoFeatureModelSerializer``,
+    pagination is not applied. If the renderer selected by content negotiation
+    provides ``render_stream`` (eg: ``GeoJsonSeqRenderer``) it's used,
+    otherwise ``stream_renderer_class`` is used.
+    """
+
+    stream_chunk_size = 2000  # rows fetched from the database at once
+    stream_renderer_class = StreamingGeoJsonRenderer
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+        features = (
+            serializer.to_representation(instance)
+            for instance in queryset.iterator(chunk_size=self.stream_chunk_size)
+        )
+        # the negotiated renderer is used if it supports streaming
+        renderer = getattr(request, "accepted_renderer", None)
+        if not hasattr(renderer, "render_stream"):
+            renderer = self.stream_renderer_class()
+        return StreamingHttpResponse(
+            renderer.render_stream(features, self.get_renderer_context()),
+            content_type=renderer.media_type,
+        )
+
+
+class StreamingGeoJsonCreateMixin:
+    """
+    Create the features of large uploads in batches: when ``request.data``
+    is an iterator of features (see ``GeoJsonParser``, ``GeoJsonSeqParser``
+    and ``NewlineDelimitedGeoJsonParser``) the features are validated and
+    saved by the list serializer ``upload_batch_size`` at a time, in a single
+    transaction, so that only one batch is kept in memory.
+
+    Must be used with ``CreateModelMixin`` and a ``GeoFeatureModelSerializer``
+    (the ``bulk_batch_size`` option allows saving each batch with
+    ``bulk_create``), other data (eg: a single feature) is created as usual.
+    The response contains the number of features created.
+    """
+
+    upload_batch_size = 1000
+
+    def create(self, request, *args, **kwargs):
+        data = request.data
+        if not hasattr(data, "__next__"):
+            return super().create(request, *args, **kwargs)
+        model = self.get_serializer_class().Meta.model
+        count = 0
+        with transaction.atomic(using=router.db_for_write(model)):
+            while True:
+                batch = list(islice(data, self.upload_batch_size))
+                if not batch:
+                    break
+                serializer = self.get_serializer(data=batch, many=True)
+                if not serializer.is_valid():
+                    errors = serializer.errors
+                    # errors are reported by the position of the feature
+                    if isinstance(errors, list):
+                        errors = {
+                            str(count + index): feature_errors
+                            for index, feature_errors in enumerate(errors)
+                            if feature_errors
+                        }
+                    raise ValidationError(errors)
+                self.perform_create(serializer)
+                count += len(batch)
+        return Response({"count": count}, status=status.HTTP_201_CREATED)
+
+
+class TileAddressMixin:
+    """
+    Reads the address of the tile requested to the view
+    """
+
+    tile_param = "tile"
+
+    def get_tile_address(self):
+        """
+        Returns the (z, x, y) tile address
+        """
+        try:
+            if "z" in self.kwargs:
+                z, x, y = (int(self.kwargs[key]) for key in ("z", "x", "y"))
+            else:
+                tile_string = self.request.query_params.get(self.tile_param, "")
+                z, x, y = (int(n) for n in tile_string.split("/"))
+        except (KeyError, ValueError):
+            raise ParseError(
+                f"Invalid tile string supplied for parameter {self.tile_param}"
+            )
+        if z < 0 or not 0 <= x < 2**z or not 0 <= y < 2**z:
+            raise ParseError(f"Invalid tile address: {z}/{x}/{y}")
+        return z, x, y
+
+
+class VectorTileMixin(TileAddressMixin):
+    """
+    Lists the features of a tile as a Mapbox Vector Tile when ``MvtRenderer``
+    is selected by content negotiation, otherwise the list is rendered as usual.
+
+    Must be used with ``GenericAPIView`` and a ``GeoFeatureModelSerializer``,
+    pagination is not applied. The tile address is taken from the ``z``,
+    ``x`` and ``y`` URL keyword arguments or from the ``tile`` query string
+    parameter (``tile=z/x/y``, same format used by ``TMSTileFilter``).
+
+    On PostGIS tiles are generated by the database (``ST_AsMVTGeom`` and,
+    when the properties are plain model columns, ``ST_AsMVT``),
+    on other databases geometries are clipped and encoded in Python.
+    """
+
+    vector_tile_layer_name = None  # defaults to the name of the model
+    vector_tile_extent = 4096
+    vector_tile_buffer = 256
+
+    def list(self, request, *args, **kwargs):
+        if not isinstance(getattr(request, "accepted_renderer", None), MvtRenderer):
+            return super().list(request, *args, **kwargs)
+        z, x, y = self.get_tile_address()
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.get_vector_tile(queryset, z, x, y))
+
+    def get_vector_tile(self, queryset, z, x, y):
+        """
+        Returns the bytes of the tile containing the features of ``queryset``
+        """
+        serializer = self.get_serializer()
+        geo_field = serializer.fields[serializer.Meta.geo_field]
+        source = geo_field.source.replace(".", "__")
+        extent = self.vector_tile_extent
+        buffer = self.vector_tile_buffer
+        layer_name = self.vector_tile_layer_name or queryset.model._meta.model_name
+        bounds = tile_bounds(x, y, z)
+        margin = (bounds[2] - bounds[0]) * buffer / extent
+        envelope = Polygon.from_bbox(
+            (
+                bounds[0] - margin,
+                bounds[1] - margin,
+                bounds[2] + margin,
+                bounds[3] + margin,
+            )
+        )
+        envelope.srid = 3857
+        id_field, _, _, property_fields = serializer._feature_fields
+
+        if getattr(connections[queryset.db].ops, "postgis", False):
+            # bounding box comparison, ST_AsMVTGeom takes care of clipping
+            queryset = queryset.filter(**{f"{source}__bboverlaps": envelope})
+            mvt_geom = AsMVTGeom(
+                Transform(source, 3857),
+                TileEnvelope(z, x, y),
+                extent,
+                buffer,
+                Value(True),
+            )
+            columns = self._get_mvt_columns(serializer, queryset.model)
+            if columns is not None:
+                return self._get_postgis_tile(
+                    queryset, columns, mvt_geom, layer_name, extent
+                )
+            instances = queryset.annotate(mvt_geom=mvt_geom).iterator()
+            features = (
+                (
+                    self._get_feature_id(id_field, instance),
+                    geos_to_geojson(instance.mvt_geom, force_2d=True),
+                    serializer.get_properties(instance, property_fields),
+                )
+                for instance in instances
+                if instance.mvt_geom is not None
+            )
+        else:
+            queryset = queryset.filter(**{f"{source}__intersects": envelope})
+            features = (
+                (
+                    self._get_feature_id(id_field, instance),
+                    geometry,
+                    serializer.get_properties(instance, property_fields),
+                )
+                for instance, geometry in (
+                    (
+                        instance,
+                        self._get_tile_geometry(geo_field, instance, bounds),
+                    )
+                    for instance in queryset.iterator()
+                )
+                if geometry is not None
+            )
+        return encode_tile([(layer_name, extent, features)])
+
+    def _get_tile_geometry(self, geo_field, instance, bounds):
+        geometry = geo_field.get_attribute(instance)
+        if geometry is None or geometry.empty:
+            return None
+        return tile_geometry(
+            geometry, bounds, self.vector_tile_extent, self.vector_tile_buffer
+        )
+
+    @staticmethod
+    def _get_feature_id(id_field, instance):
+        if id_field is None:
+            return None
+        return id_field.to_representation(id_field.get_attribute(instance))
+
+    @staticmethod
+    def _get_mvt_columns(serializer, model):
+        """
+        Returns the columns to select if the properties of the features
+        can be encoded by ``ST_AsMVT``: the properties must be model columns
+        represented by the default serializer fields, ``None`` otherwise.
+
+        The first column is the id of the features, if any.
+        """
+        if type(serializer).get_properties is not (
+            GeoFeatureModelSerializer.get_properties
+        ):
+            return None
+        id_field, _, _, property_fields = serializer._feature_fields
+        columns = [None]
+        pk = model._meta.pk
+        if (
+            id_field is not None
+            and id_field.source == pk.name == pk.column
+            and pk.get_internal_type() in MVT_COLUMN_TYPES - {"BooleanField"}
+            and pk.get_internal_type().endswith(("AutoField", "IntegerField"))
+        ):
+            columns[0] = pk.column
+        for field in property_fields:
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                return None
+            if (
+                field.source != field.field_name
+                or getattr(model_field, "column", None) != field.field_name
+                or model_field.get_internal_type() not in MVT_COLUMN_TYPES
+                or type(field)
+                is not serializer.serializer_field_mapping.get(type(model_field))
+            ):
+                return None
+            columns.append(model_field.column)
+        return columns
+
+    @staticmethod
+    def _get_postgis_tile(queryset, columns, mvt_geom, layer_name, extent):
+        """
+        Generates the tile with ``ST_AsMVT``
+        """
+        id_column, *property_columns = columns
+        names = [id_column, *property_columns] if id_column else property_columns
+        # avoids the cast to bytea of geometries selected by django
+        mvt_geom = ExpressionWrapper(mvt_geom, output_field=BinaryField())
+        values = queryset.values(*names, mvt_geom=mvt_geom)
+        sql, params = values.query.sql_with_params()
+        id_param = ", %s::text" if id_column else ""
+        query = (
+            f"SELECT ST_AsMVT(tile, %s::text, %s::integer, 'mvt_geom'{id_param}) "
+            f"FROM ({sql}) AS tile"
+        )
+        params = [layer_name, extent, *([id_column] if id_column else []), *params]
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+        return bytes(row[0]) if row and row[0] else b""
+
+
+class TileCacheMixin(TileAddressMixin):
+    """
+    Caches the rendered responses of the tiles listed by the view in the
+    ``TileCache`` set in ``tile_cache`` (see ``rest_framework_gis.tilecache``),
+    eg: tiles requested with ``TMSTileFilter`` or ``VectorTileMixin``.
+
+    The responses are keyed by view, tile address, accepted media type and
+    the other query string parameters, only successful responses are cached.
+    Authentication, permissions and throttling are applied before the cache
+    is read, responses which depend on the user must not be cached.
+    """
+
+    tile_cache = None
+
+    def list(self, request, *args, **kwargs):
+        address = self.get_cached_tile_address()
+        if self.tile_cache is None or address is None:
+            return super().list(request, *args, **kwargs)
+        variant = self.get_tile_cache_variant()
+        # the key is taken before the queryset is evaluated, a response
+        # rendered while the tile is invalidated is stored under the
+        # previous version of the tile, which is not read anymore
+        key = self.tile_cache.get_key(*address, variant)
+        cached = self.tile_cache.get(*address, variant, key=key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = super().list(request, *args, **kwargs)
+        if isinstance(response, Response) and response.status_code == 200:
+
+            def store(response):
+                value = (response.content, response["Content-Type"])
+                self.tile_cache.set(*address, value, variant, key=key)
+
+            response.add_post_render_callback(store)
+        return response
+
+    def get_cached_tile_address(self):
+        """
+        Returns the (z, x, y) tile address, ``None`` if the request is not
+        for a tile or is for the browsable API (the response is not cached)
+        """
+        renderer = getattr(self.request, "accepted_renderer", None)
+        if isinstance(renderer, BrowsableAPIRenderer):
+            return None
+        try:
+            return self.get_tile_address()
+        except ParseError:
+            return None
+
+    def get_tile_cache_variant(self):
+        """
+        Returns the text identifying the view and the request parameters
+        which affect the response, other than the tile address
+        """
+        view = f"{self.__class__.__module__}.{self.__class__.__qualname__}"
+        kwargs = sorted(
+            (key, str(value))
+            for key, value in self.kwargs.items()
+            if key not in ("z", "x", "y")
+        )
+        params = sorted(
+            (key, values)
+            for key, values in self.request.query_params.lists()
+            if key != self.tile_param
+        )
+        media_type = getattr(self.request, "accepted_media_type", "")
+        return repr((view, media_type, kwargs, params))
+
+
+class ClusterMixin(TileAddressMixin):
+    """
+    Lists the clusters of the features, computed by the database, when the
+    zoom level requested is lower than ``cluster_max_zoom``: one point
+    feature per cluster, placed at the centroid of the clustered geometries,
+    with ``cluster`` and the ``count`` of the features in the properties.
+
+    Must be used with ``GenericAPIView`` and a ``GeoFeatureModelSerializer``,
+    pagination is not applied to the clusters. The zoom level is taken from
+    the ``zoom`` query string parameter or from the tile address (see
+    ``VectorTileMixin``), the features are filtered as usual (eg: by
+    ``InBBoxFilter`` or ``TMSTileFilter``) before being clustered.
+
+    The geometries are grouped by the cells of a grid (``ST_SnapToGrid``)
+    whose side is the width of a tile divided by ``cluster_tile_divisions``,
+    with ``cluster_method = "dbscan"`` the side of the cells is the distance
+    used by ``ST_ClusterDBSCAN`` instead (PostGIS only, the other databases
+    use the grid).
+    """
+
+    zoom_param = "zoom"
+    cluster_max_zoom = 14  # the features are listed from this zoom level on
+    cluster_method = "grid"
+    cluster_tile_divisions = 8
+
+    def list(self, request, *args, **kwargs):
+        if isinstance(getattr(request, "accepted_renderer", None), MvtRenderer):
+            return super().list(request, *args, **kwargs)
+        zoom = self.get_cluster_zoom()
+        if zoom is None or zoom >= self.cluster_max_zoom:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.get_clusters(queryset, zoom))
+
+    def get_cluster_zoom(self):
+        """
+        Returns the zoom level requested, ``None`` if not specified
+        """
+        zoom_string = self.request.query_params.get(self.zoom_param, None)
+        if zoom_string:
+            try:
+                zoom = int(zoom_string)
+            except ValueError:
+                zoom = -1
+            if zoom < 0:
+                raise ParseError(
+                    f"Invalid zoom level supplied for parameter {self.zoom_param}"
+                )
+            return zoom
+        if "z" in self.kwargs or self.request.query_params.get(self.tile_param):
+            return self.get_tile_address()[0]
+        return None
+
+    def get_cluster_size(self, queryset, source, zoom):
+        """
+        Returns the side of the cells of the grid in the units
+        of the SRID of the clustered field (WGS84 if not a model field)
+        """
+        srid = getattr(_get_model_field(queryset, source), "srid", 4326)
+        if SpatialReference(srid).geographic:
+            width = 360
+        else:
+            # assumes meters, as in web mercator
+            width = 2 * MERCATOR_ORIGIN
+        return width / 2**zoom / self.cluster_tile_divisions
+
+    def get_clusters(self, queryset, zoom):
+        """
+        Returns the ``FeatureCollection`` of the clusters of ``queryset``
+        """
+        serializer = self.get_serializer()
+        geo_field = serializer.fields[serializer.Meta.geo_field]
+        source = geo_field.source.replace(".", "__")
+        size = self.get_cluster_size(queryset, source, zoom)
+        queryset = queryset.order_by().filter(**{f"{source}__isnull": False})
+        if self.cluster_method == "dbscan" and getattr(
+            connections[queryset.db].ops, "postgis", False
+        ):
+            clusters = self._get_dbscan_clusters(queryset, source, size)
+        else:
+            clusters = (
+                queryset.annotate(cluster_cell=SnapToGrid(source, size))
+                .values("cluster_cell")
+                .annotate(
+                    cluster_count=Count("pk"),
+                    cluster_center=Centroid(Collect(source)),
+                )
+                .values_list("cluster_count", "cluster_center")
+            )
+        return {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": geos_to_geojson(center),
+                    "properties": {"cluster": True, "count": count},
+                }
+                for count, center in clusters
+            ],
+        }
+
+    @staticmethod
+    def _get_dbscan_clusters(queryset, source, distance):
+        """
+        Returns the (count, centroid) tuples of the clusters
+        computed by ``ST_ClusterDBSCAN``
+        """
+        # avoids the cast to bytea of geometries selected by django
+        values = queryset.values(
+            cluster_geom=ExpressionWrapper(F(source), output_field=BinaryField()),
+            cluster_id=Window(ClusterDBSCAN(source, Value(distance), Value(1))),
+        )
+        sql, params = values.query.sql_with_params()
+        query = (
+            "SELECT COUNT(*), ST_AsEWKB(ST_Centroid(ST_Collect(cluster_geom))) "
+            f"FROM ({sql}) AS clusters GROUP BY cluster_id"
+        )
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(query, params)
+            return [
+                (count, GEOSGeometry(memoryview(center)))
+                for count, center in cursor.fetchall()
+            ]
@@ -0,0 +1,268 @@
+"""
+Mapbox Vector Tile encoding.
+
+Implements the subset of protocol buffers needed to write tiles following
+version 2.1 of the specification, see
+https://github.com/mapbox/vector-tile-spec/tree/master/2.1
+"""
+
+import json
+from math import pi
+
+from django.contrib.gis.geos import Polygon
+
+from .fields import get_coord_transform
+from .geojson import geos_to_geojson, iter_geometries, remove_duplicate_points
+from .protobuf import double_field, message, packed, varint_field, zigzag
+
+__all__ = ["encode_tile", "tile_bounds", "tile_geometry", "tile_range"]
+
+# half of the circumference of the earth in EPSG:3857
+MERCATOR_ORIGIN = pi * 6378137
+
+GEOM_TYPES = {
+    "Point": 1,
+    "MultiPoint": 1,
+    "LineString": 2,
+    "MultiLineString": 2,
+    "Polygon": 3,
+    "MultiPolygon": 3,
+}
+
+MOVE_TO = 1
+LINE_TO = 2
+CLOSE_PATH = 7
+
+
+def tile_bounds(x, y, z):
+    """
+    Returns the bounds (min x, min y, max x, max y) in EPSG:3857
+    of the tile with the supplied address (XYZ scheme)
+    """
+    size = 2 * MERCATOR_ORIGIN / 2**z
+    min_x = -MERCATOR_ORIGIN + x * size
+    max_y = MERCATOR_ORIGIN - y * size
+    return (min_x, max_y - size, min_x + size, max_y)
+
+
+def tile_range(bounds, z, buffer=0):
+    """
+    Returns the range (min x, min y, max x, max y) of the addresses of the
+    tiles of zoom level ``z`` which intersect ``bounds`` (in EPSG:3857),
+    ``buffer`` extends the bounds by a fraction of the size of a tile
+    """
+    count = 2**z
+    size = 2 * MERCATOR_ORIGIN / count
+    min_x, min_y, max_x, max_y = bounds
+
+    def clamp(value):
+        return int(min(max(value, 0), count - 1))
+
+    return (
+        clamp((min_x + MERCATOR_ORIGIN) / size - buffer),
+        clamp((MERCATOR_ORIGIN - max_y) / size - buffer),
+        clamp((max_x + MERCATOR_ORIGIN) / size + buffer),
+        clamp((MERCATOR_ORIGIN - min_y) / size + buffer),
+    )
+
+
+def tile_geometry(geometry, bounds, extent=4096, buffer=256):
+    """
+    Returns the GeoJSON geometry dictionary of ``geometry`` in the integer
+    coordinate space of the tile with the supplied ``bounds``, clipped to
+    the tile bounds plus ``buffer``, ``None`` if nothing is left.
+
+    Geometries without a SRID are assumed to be in EPSG:4326.
+    """
+    srid = geometry.srid or 4326
+    if srid != 3857:
+        geometry = geometry.clone()
+        geometry.srid = srid
+        geometry.transform(get_coord_transform(srid, 3857))
+    min_x, min_y, max_x, max_y = bounds
+    scale_x = extent / (max_x - min_x)
+    scale_y = extent / (max_y - min_y)
+    margin = buffer / scale_x
+    clip = Polygon.from_bbox(
+        (min_x - margin, min_y - margin, max_x + margin, max_y + margin)
+    )
+    if not geometry.intersects(clip):
+        return None
+    if not clip.contains(geometry):
+        geometry = geometry.intersection(clip)
+        if geometry.empty:
+            return None
+
+    def transform(coordinates):
+        if coordinates and isinstance(coordinates[0], (int, float)):
+            return [
+                int(round((coordinates[0] - min_x) * scale_x)),
+                int(round((max_y - coordinates[1]) * scale_y)),
+            ]
+        return [transform(member) for member in coordinates]
+
+    geojson = geos_to_geojson(geometry, force_2d=True)
+    for member in iter_geometries(geojson):
+        member["coordinates"] = transform(member["coordinates"])
+    return geojson
+
+
+def encode_tile(layers):
+    """
+    Returns the bytes of a vector tile containing ``layers``, an iterable of
+    tuples containing the name, the extent and the features of each layer.
+
+    Each feature is a tuple containing the id (``None`` or an unsigned
+    integer), a GeoJSON geometry dictionary in tile coordinates and a
+    dictionary of properties, ``None`` values are left out.
+
+    Layers without features are left out (like ``ST_AsMVT`` does).
+    """
+    chunks = []
+    for name, extent, features in layers:
+        layer = _encode_layer(name, extent, features)
+        if layer is not None:
+            chunks.append(message(3, layer))
+    return b"".join(chunks)
+
+
+def _encode_layer(name, extent, features):
+    keys = {}
+    values = {}
+    chunks = [varint_field(15, 2), message(1, name.encode())]
+    for feature_id, geometry, properties in features:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value)
+            key_index = keys.setdefault(key, len(keys))
+            # booleans are also integers
+            value_key = (type(value), value)
+            value_index = values.setdefault(value_key, len(values))
+            tags.extend((key_index, value_index))
+        for geom_type, commands in _encode_geometry(geometry):
+            feature = []
+            if isinstance(feature_id, int) and feature_id >= 0:
+                feature.append(varint_field(1, feature_id))
+            if tags:
+                feature.append(packed(2, tags))
+            feature.append(varint_field(3, geom_type))
+            feature.append(packed(4, commands))
+            chunks.append(message(2, b"".join(feature)))
+    if len(chunks) == 2:
+        return None
+    chunks.extend(message(3, key.encode()) for key in keys)
+    chunks.extend(message(4, _encode_value(value)) for _, value in values)
+    chunks.append(varint_field(5, extent))
+    return b"".join(chunks)
+
+
+def _encode_value(value):
+    if isinstance(value, bool):
+        return varint_field(7, int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return varint_field(5, value)
+        return varint_field(6, zigzag(value))
+    if isinstance(value, float):
+        return double_field(3, value)
+    return message(1, str(value).encode())
+
+
+def _encode_geometry(geometry):
+    """
+    Yields the type and the commands of each feature needed to represent
+    ``geometry`` (geometry collections are split into several features)
+    """
+    for member in iter_geometries(geometry):
+        geom_type = member["type"]
+        coordinates = member["coordinates"]
+        if not coordinates:
+            continue
+        if geom_type == "Point":
+            commands = _encode_points([coordinates])
+        elif geom_type == "MultiPoint":
+            commands = _encode_points(coordinates)
+        elif geom_type == "LineString":
+            commands = _encode_lines([coordinates])
+        elif geom_type == "MultiLineString":
+            commands = _encode_lines(coordinates)
+        elif geom_type == "Polygon":
+            commands = _encode_polygons([coordinates])
+        else:
+            commands = _encode_polygons(coordinates)
+        if commands:
+            yield GEOM_TYPES[geom_type], commands
+
+
+class _Cursor:
+    """
+    Keeps track of the position of the cursor,
+    geometry commands are relative to it
+    """
+
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+        self.commands = []
+
+    def command(self, command, points):
+        commands = self.commands
+        commands.append(command | (len(points) << 3))
+        for x, y in points:
+            # the coordinates returned by PostGIS are integer floats
+            x, y = int(x), int(y)
+            commands.append(zigzag(x - self.x))
+            commands.append(zigzag(y - self.y))
+            self.x = x
+            self.y = y
+
+
+def _encode_points(points):
+    cursor = _Cursor()
+    cursor.command(MOVE_TO, points)
+    return cursor.commands
+
+
+def _encode_lines(lines):
+    cursor = _Cursor()
+    for line in lines:
+        points = remove_duplicate_points(line)
+        if len(points) < 2:
+            continue
+        cursor.command(MOVE_TO, points[:1])
+        cursor.command(LINE_TO, points[1:])
+    return cursor.commands
+
+
+def _encode_polygons(polygons):
+    cursor = _Cursor()
+    for polygon in polygons:
+        for index, ring in enumerate(polygon):
+            points = remove_duplicate_points(ring)
+            if points and points[0] == points[-1]:
+                points.pop()
+            area = _area(points) if len(points) >= 3 else 0
+            if not area:
+                # a polygon without exterior ring is left out
+                if index == 0:
+                    break
+                continue
+            # exterior rings must have a positive area, interior ones negative
+            if (area > 0) != (index == 0):
+                points.reverse()
+            cursor.command(MOVE_TO, points[:1])
+            cursor.command(LINE_TO, points[1:])
+            cursor.commands.append(CLOSE_PATH | (1 << 3))
+    return cursor.commands
+
+
+def _area(points):
+    """
+    Returns twice the signed area of a ring (surveyor's formula)
+    """
+    return sum(
+        x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1])
+    )
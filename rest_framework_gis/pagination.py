@@ -1,22 +1,120 @@
+import json
 from collections import OrderedDict
 
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 from rest_framework import pagination
 from rest_framework.response import Response
 
 
+class _InexactCountPage(Page):
+    def has_next(self):
+        # the count is not exact, a full page may be followed by more results
+        return len(self) == self.paginator.per_page
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator which avoids counting all the rows of large querysets:
+
+    * ``count_mode = "exact"``: ``COUNT(*)``, as the django paginator
+    * ``count_mode = "capped"``: counts at most ``count_limit + 1`` rows,
+      larger results are reported as ``count_limit``
+    * ``count_mode = "estimated"``: uses the estimate of the query planner
+      (PostgreSQL, the other databases use the capped count), results
+      estimated to be smaller than ``count_limit`` are counted
+
+    ``count_exact`` is ``False`` when the count is an estimate or the limit,
+    in which case pages beyond the count can be requested.
+    """
+
+    count_mode = "exact"
+    count_limit = 10000
+
+    def __init__(self, object_list, per_page, **kwargs):
+        self.count_exact = True
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.count_mode == "exact" or not isinstance(self.object_list, QuerySet):
+            return super().count
+        if self.count_mode == "estimated":
+            estimate = self.get_estimated_count()
+            if estimate is not None and estimate > self.count_limit:
+                self.count_exact = False
+                return estimate
+        count = self.object_list[: self.count_limit + 1].count()
+        if count > self.count_limit:
+            self.count_exact = False
+            return self.count_limit
+        return count
+
+    def get_estimated_count(self):
+        """
+        Returns the number of rows estimated by the query planner,
+        ``None`` if not supported by the database
+        """
+        queryset = self.object_list.order_by()
+        if connections[queryset.db].vendor != "postgresql":
+            return None
+        plan = json.loads(queryset.explain(format="json"))
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self.count_exact or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.count_exact:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        return _InexactCountPage(self.object_list[bottom:top], number, self)
+
+
 class GeoJsonPagination(pagination.PageNumberPagination):
     """
     A geoJSON implementation of a pagination serializer.
     """
 
     page_size_query_param = "page_size"
+    django_paginator_class = EstimatedCountPaginator
+    # "exact", "capped" or "estimated", see EstimatedCountPaginator
+    count_mode = "exact"
+    count_limit = 10000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        paginator_class = self.django_paginator_class
+        if issubclass(paginator_class, EstimatedCountPaginator) and (
+            paginator_class.count_mode,
+            paginator_class.count_limit,
+        ) != (self.count_mode, self.count_limit):
+            # the paginator counts the rows as soon as it is created
+            self.django_paginator_class = type(
+                paginator_class.__name__,
+                (paginator_class,),
+                {"count_mode": self.count_mode, "count_limit": self.count_limit},
+            )
+        return super().paginate_queryset(queryset, request, view)
 
     def get_paginated_response(self, data):
+        paginator = self.page.paginator
+        count = [("count", paginator.count)]
+        if self.count_mode != "exact":
+            count.append(("count_exact", getattr(paginator, "count_exact", True)))
         return Response(
             OrderedDict(
                 [
                     ("type", "FeatureCollection"),
-                    ("count", self.page.paginator.count),
+                    *count,
                     ("next", self.get_next_link()),
                     ("previous", self.get_previous_link()),
                     ("features", data["features"]),
@@ -27,6 +125,8 @@ class GeoJsonPagination(pagination.PageNumberPagination):
     def get_paginated_response_schema(self, view):
         schema = super().get_paginated_response_schema(view)
         schema["properties"]["features"] = schema["properties"].pop("results")
+        if self.count_mode != "exact":
+            schema["properties"]["count_exact"] = {"type": "boolean", "example": True}
         schema["properties"] = {
             "type": {"type": "string", "enum": ["FeatureCollection"]},
             **schema["properties"],
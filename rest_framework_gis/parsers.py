@@ -0,0 +1,340 @@
+import codecs
+import json
+import re
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from .geobuf import decode_geobuf
+
+__all__ = [
+    "GeobufParser",
+    "GeoJsonParser",
+    "GeoJsonSeqParser",
+    "NewlineDelimitedGeoJsonParser",
+]
+
+RECORD_SEPARATOR = b"\x1e"
+WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+# decoding errors which may be caused by a value which continues in the
+# data which hasn't been read yet, rather than by malformed data
+TRUNCATION_MARGIN = 8
+
+
+class _JsonReader:
+    """
+    Reads the JSON values of a stream one at a time, keeping in memory
+    only the chunk being read and the value being decoded.
+    """
+
+    def __init__(self, stream, chunk_size, max_value_size, max_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_value_size = max_value_size
+        self.max_size = max_size
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.position = 0
+        # number of characters discarded before the buffer
+        self.offset = 0
+        self.size = 0
+        self.exhausted = False
+
+    def fill(self, size=None):
+        """
+        Reads the next chunk (at least ``size`` bytes),
+        returns ``False`` at the end of the stream
+        """
+        if self.exhausted:
+            return False
+        chunk = self.stream.read(max(size or 0, self.chunk_size))
+        self.size += len(chunk)
+        if self.max_size and self.size > self.max_size:
+            raise ParseError(
+                f"GeoJSON parse error - the data exceeds {self.max_size} bytes"
+            )
+        try:
+            text = self.text_decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError as e:
+            raise ParseError(f"GeoJSON parse error - {e}")
+        start, self.position = self.position, 0
+        self.buffer = self.buffer[start:] + text
+        self.offset += start
+        self.exhausted = not chunk
+        return True
+
+    def peek(self):
+        """
+        Returns the next character which is not whitespace (``""`` at the
+        end of the stream), without consuming it
+        """
+        while True:
+            self.position = WHITESPACE_RE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ""
+
+    def expect(self, characters):
+        """
+        Consumes and returns the next character, which must be in ``characters``
+        """
+        char = self.peek()
+        if not char or char not in characters:
+            expected = " or ".join(repr(c) for c in characters)
+            found = repr(char) if char else "end of data"
+            raise ParseError(
+                f"GeoJSON parse error - expected {expected}, found {found}"
+            )
+        self.position += 1
+        return char
+
+    def end(self):
+        if self.peek():
+            raise ParseError("GeoJSON parse error - extra data after the document")
+
+    def read_value(self):
+        """
+        Decodes and returns the next JSON value, reading more data
+        until the value is complete
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError as e:
+                if not self.is_truncated(e):
+                    raise ParseError(
+                        f"GeoJSON parse error - {e.msg} (char {self.offset + e.pos})"
+                    )
+            else:
+                # numbers and literals may continue in the next chunk
+                if end < len(self.buffer) or self.exhausted:
+                    self.position = end
+                    return value
+            size = len(self.buffer) - self.position
+            if self.max_value_size and size > self.max_value_size:
+                raise ParseError(
+                    "GeoJSON parse error - a single value exceeds "
+                    f"{self.max_value_size} bytes"
+                )
+            # the read size grows with the value to avoid decoding it too often
+            self.fill(size)
+
+    def is_truncated(self, error):
+        if self.exhausted:
+            return False
+        return (
+            error.msg.startswith("Unterminated string")
+            or error.pos >= len(self.buffer) - TRUNCATION_MARGIN
+        )
+
+    def iter_members(self):
+        """
+        Yields the keys of the object which begins at the current position,
+        the value of each member must be consumed before the next key
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.position += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise ParseError("GeoJSON parse error - object keys must be strings")
+            key = self.read_value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+    def iter_items(self):
+        """
+        Yields once for each item of the array which begins at the current
+        position, each item must be consumed before the next one
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+            return
+        while True:
+            yield
+            if self.expect(",]") == "]":
+                return
+
+
+class _FeatureParser(BaseParser):
+    def is_streaming(self, parser_context):
+        """
+        Whether the view consumes the features one at a time,
+        instead of a list which can be iterated more than once
+        """
+        from .mixins import StreamingGeoJsonCreateMixin
+
+        view = (parser_context or {}).get("view")
+        return isinstance(view, StreamingGeoJsonCreateMixin)
+
+
+class NewlineDelimitedGeoJsonParser(_FeatureParser):
+    """
+    Parses newline delimited GeoJSON.
+
+    ``request.data`` is the list of the features. In views which use
+    ``StreamingGeoJsonCreateMixin`` the request body is read lazily:
+    ``request.data`` is an iterator which yields one feature at a time,
+    which allows validating and saving large uploads in constant memory.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return []
+        features = self.iter_features(self.iter_records(stream))
+        if self.is_streaming(parser_context):
+            return features
+        return list(features)
+
+    def iter_records(self, stream):
+        """
+        Yields the raw JSON texts contained in ``stream``
+        """
+        for line in iter(stream.readline, b""):
+            if line.strip():
+                yield line
+
+    def iter_features(self, records):
+        for number, record in enumerate(records, 1):
+            try:
+                yield json.loads(record)
+            except ValueError as e:
+                raise ParseError(f"Invalid GeoJSON in record {number}: {e}")
+
+
+class GeoJsonSeqParser(NewlineDelimitedGeoJsonParser):
+    """
+    Parses GeoJSON Text Sequences (RFC 8142), in which each feature
+    is preceded by a record separator and followed by a line feed.
+    """
+
+    media_type = "application/geo+json-seq"
+
+    def iter_records(self, stream):
+        """
+        Yields the raw JSON texts contained in ``stream``, each JSON text
+        ends where the next record separator (or the stream) begins
+        """
+        record = []
+        for line in iter(stream.readline, b""):
+            if line.startswith(RECORD_SEPARATOR):
+                if record:
+                    yield b"".join(record)
+                record = [line[1:]]
+            elif record:
+                record.append(line)
+            elif line.strip():
+                raise ParseError("GeoJSON text sequence must begin with RS (0x1E)")
+        if record:
+            yield b"".join(record)
+
+
+class GeobufParser(BaseParser):
+    """
+    Parses Geobuf, see ``rest_framework_gis.geobuf``:
+    ``request.data`` is the decoded GeoJSON dictionary.
+    """
+
+    media_type = "application/geobuf"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            raise ParseError("Geobuf parse error - empty request body")
+        try:
+            return decode_geobuf(stream.read())
+        except ValueError as e:
+            raise ParseError(f"Geobuf parse error - {e}")
+
+
+class GeoJsonParser(_FeatureParser):
+    """
+    Parses GeoJSON incrementally.
+
+    When the request body is a ``FeatureCollection``, ``request.data`` is the
+    list of its features, the other members of the collection are only
+    validated. In views which use ``StreamingGeoJsonCreateMixin``,
+    ``request.data`` is an iterator which yields one feature at a time while
+    the body is read in chunks of ``chunk_size`` bytes, which allows
+    validating and saving large uploads in constant memory. Other GeoJSON
+    objects (eg: a single ``Feature``) are returned as dictionaries.
+
+    Malformed data raises ``ParseError`` as soon as it's read, the size of
+    a single feature (or of any other member) is limited to
+    ``max_feature_size`` bytes, the size of the body to ``max_upload_size``
+    bytes and the number of features to ``max_features``.
+    """
+
+    media_type = "application/geo+json"
+    chunk_size = 64 * 1024
+    max_feature_size = 16 * 1024 * 1024
+    max_upload_size = None
+    max_features = None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            raise ParseError("GeoJSON parse error - empty request body")
+        self.check_content_length(parser_context)
+        reader = _JsonReader(
+            stream, self.chunk_size, self.max_feature_size, self.max_upload_size
+        )
+        members = reader.iter_members()
+        data = {}
+        for key in members:
+            # the type may follow the features
+            collection = data.get("type", "FeatureCollection") == "FeatureCollection"
+            if key == "features" and collection:
+                features = self.iter_features(reader, members, data)
+                if self.is_streaming(parser_context):
+                    return features
+                return list(features)
+            data[key] = reader.read_value()
+        reader.end()
+        return data
+
+    def check_content_length(self, parser_context):
+        """
+        Rejects the request before reading it if the
+        ``Content-Length`` header exceeds ``max_upload_size``
+        """
+        request = (parser_context or {}).get("request")
+        if not self.max_upload_size or request is None:
+            return
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return
+        if content_length > self.max_upload_size:
+            raise ParseError(
+                f"GeoJSON parse error - the data exceeds {self.max_upload_size} bytes"
+            )
+
+    def iter_features(self, reader, members, collection):
+        number = 0
+        for _ in reader.iter_items():
+            number += 1
+            if self.max_features and number > self.max_features:
+                raise ParseError(
+                    "GeoJSON parse error - the number of features "
+                    f"exceeds {self.max_features}"
+                )
+            feature = reader.read_value()
+            if not isinstance(feature, dict) or feature.get("type") != "Feature":
+                raise ParseError(f"Invalid GeoJSON in feature {number}: not a Feature")
+            yield feature
+        # the members which follow the features
+        for key in members:
+            collection[key] = reader.read_value()
+        reader.end()
+        if collection.get("type") != "FeatureCollection":
+            raise ParseError(
+                "GeoJSON parse error - 'features' requires a FeatureCollection"
+            )
@@ -0,0 +1,53 @@
+"""
+Encoded polyline algorithm format, see
+https://developers.google.com/maps/documentation/utilities/polylinealgorithm
+"""
+
+
+def encode_polyline(coordinates, precision=5):
+    """
+    Encodes a sequence of (x, y) coordinates (longitude, latitude),
+    the polyline stores latitude first
+    """
+    factor = 10**precision
+    output = []
+    previous_x = previous_y = 0
+    for x, y, *_ in coordinates:
+        x, y = round(x * factor), round(y * factor)
+        for delta in (y - previous_y, x - previous_x):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                output.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            output.append(chr(value + 63))
+        previous_x, previous_y = x, y
+    return "".join(output)
+
+
+def decode_polyline(text, precision=5):
+    """
+    Returns the list of (x, y) coordinates (longitude, latitude) of an
+    encoded polyline, raises ``ValueError`` if ``text`` is not valid
+    """
+    factor = 10**precision
+    coordinates = []
+    values = []
+    value = shift = 0
+    for char in text:
+        byte = ord(char) - 63
+        if not 0 <= byte < 64:
+            raise ValueError(f"Invalid character in encoded polyline: {char!r}")
+        value |= (byte & 0x1F) << shift
+        if byte & 0x20:
+            shift += 5
+            continue
+        values.append(~(value >> 1) if value & 1 else value >> 1)
+        value = shift = 0
+    if shift or len(values) % 2:
+        raise ValueError("Truncated encoded polyline")
+    x = y = 0
+    for n in range(0, len(values), 2):
+        y += values[n]
+        x += values[n + 1]
+        coordinates.append((x / factor, y / factor))
+    return coordinates
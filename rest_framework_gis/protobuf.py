@@ -0,0 +1,122 @@
+"""
+Minimal protocol buffers wire format encoding and decoding,
+used by the vector tile and Geobuf encoders, see
+https://protobuf.dev/programming-guides/encoding/
+"""
+
+from struct import pack, unpack_from
+
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+FIXED32 = 5
+
+
+def zigzag(value):
+    """
+    Maps signed integers to unsigned integers (``sint64`` fields)
+    """
+    return (value << 1) ^ (value >> 63)
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def varint(value):
+    output = bytearray()
+    while value > 0x7F:
+        output.append((value & 0x7F) | 0x80)
+        value >>= 7
+    output.append(value)
+    return bytes(output)
+
+
+def key(field, wire_type):
+    return varint((field << 3) | wire_type)
+
+
+def varint_field(field, value):
+    return key(field, VARINT) + varint(value)
+
+
+def double_field(field, value):
+    return key(field, FIXED64) + pack("<d", value)
+
+
+def message(field, data):
+    """
+    Length delimited field (strings, messages)
+    """
+    return key(field, LENGTH_DELIMITED) + varint(len(data)) + data
+
+
+def packed(field, values):
+    """
+    Packed repeated varint field, omitted when there are no values
+    """
+    if not values:
+        return b""
+    return message(field, b"".join(varint(value) for value in values))
+
+
+def read_varint(data, offset):
+    """
+    Returns the varint at ``offset`` and the offset of the following byte
+    """
+    value = shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError("Truncated varint")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+        if shift >= 70:
+            raise ValueError("Varint longer than 10 bytes")
+
+
+def iter_fields(data):
+    """
+    Yields the (field, wire type, value) tuples of a message, the value of
+    length delimited fields is a memoryview, the value of fixed size fields
+    is the unpacked double (64 bits) or float (32 bits)
+    """
+    data = memoryview(data)
+    offset = 0
+    end = len(data)
+    while offset < end:
+        field_key, offset = read_varint(data, offset)
+        field, wire_type = field_key >> 3, field_key & 7
+        if wire_type == VARINT:
+            value, offset = read_varint(data, offset)
+        elif wire_type == LENGTH_DELIMITED:
+            length, offset = read_varint(data, offset)
+            if offset + length > end:
+                raise ValueError("Truncated message")
+            start, offset = offset, offset + length
+            value = data[start:offset]
+        elif wire_type in (FIXED64, FIXED32):
+            size, fmt = (8, "<d") if wire_type == FIXED64 else (4, "<f")
+            if offset + size > end:
+                raise ValueError("Truncated message")
+            value = unpack_from(fmt, data, offset)[0]
+            offset += size
+        else:
+            raise ValueError(f"Unsupported wire type: {wire_type}")
+        yield field, wire_type, value
+
+
+def read_packed(data):
+    """
+    Returns the values of a packed repeated varint field
+    """
+    values = []
+    offset = 0
+    end = len(data)
+    while offset < end:
+        value, offset = read_varint(data, offset)
+        values.append(value)
+    return values
@@ -0,0 +1,280 @@
+import re
+from uuid import uuid4
+
+from rest_framework.compat import LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .fields import RawGeoJson
+from .flatgeobuf import encode_flatgeobuf
+from .geobuf import encode_geobuf
+from .topojson import geojson_to_topology
+
+__all__ = [
+    "GeoJsonEncoder",
+    "GeoJsonRenderer",
+    "StreamingGeoJsonRenderer",
+    "GeoJsonSeqRenderer",
+    "NewlineDelimitedGeoJsonRenderer",
+    "TopoJsonRenderer",
+    "MvtRenderer",
+    "FlatGeobufRenderer",
+    "GeobufRenderer",
+]
+
+GEOJSON_TYPES = {
+    "FeatureCollection",
+    "Feature",
+    "Point",
+    "MultiPoint",
+    "LineString",
+    "MultiLineString",
+    "Polygon",
+    "MultiPolygon",
+    "GeometryCollection",
+}
+
+
+class GeoJsonEncoder(JSONEncoder):
+    """
+    JSON encoder which writes ``RawGeoJson`` values verbatim: they are
+    encoded as unique placeholder strings which are then replaced.
+    """
+
+    def encode(self, o):
+        self._fragments = []
+        text = super().encode(o)
+        if self._fragments:
+            text = self._placeholder_re.sub(self._replace_placeholder, text)
+        self._fragments = []
+        return text
+
+    def default(self, o):
+        if isinstance(o, RawGeoJson):
+            if not hasattr(self, "_placeholder"):
+                self._placeholder = f"rawgeojson-{uuid4().hex}-"
+                self._placeholder_re = re.compile(f'"{self._placeholder}(\\d+)"')
+            self._fragments.append(o.text)
+            return f"{self._placeholder}{len(self._fragments) - 1}"
+        return super().default(o)
+
+    def _replace_placeholder(self, match):
+        return self._fragments[int(match.group(1))]
+
+
+class GeoJsonRenderer(JSONRenderer):
+    """
+    Renders GeoJSON using the ``application/geo+json`` media type,
+    ``RawGeoJson`` geometries are written without being decoded
+    """
+
+    media_type = "application/geo+json"
+    format = "geojson"
+    encoder_class = GeoJsonEncoder
+
+
+class StreamingGeoJsonRenderer(GeoJsonRenderer):
+    """
+    Renders a GeoJSON FeatureCollection incrementally,
+    see ``rest_framework_gis.mixins.StreamingGeoJsonListMixin``.
+    """
+
+    # the features are yielded in chunks of about this size (in bytes)
+    buffer_size = 64 * 1024
+    # bytes written before, between and after the features
+    stream_header = b'{"type":"FeatureCollection","features":['
+    feature_separator = b","
+    stream_footer = b"]}"
+    # bytes written before and after each feature
+    feature_prefix = b""
+    feature_suffix = b""
+
+    def get_encoder(self):
+        """
+        Returns the JSON encoder instance used for each feature
+        """
+        return self.encoder_class(
+            ensure_ascii=self.ensure_ascii,
+            allow_nan=not self.strict,
+            separators=SHORT_SEPARATORS if self.compact else LONG_SEPARATORS,
+        )
+
+    def render_stream(self, features, renderer_context=None):
+        """
+        Returns an iterator which yields the FeatureCollection
+        containing ``features`` as chunks of bytes.
+        """
+        encode = self.get_encoder().encode
+        prefix, suffix = self.feature_prefix, self.feature_suffix
+        buffer = [self.stream_header]
+        size = 0
+        separator = b""
+        for feature in features:
+            # same escaping performed by JSONRenderer
+            text = encode(feature).replace("\u2028", "\\u2028")
+            text = text.replace("\u2029", "\\u2029")
+            chunk = separator + prefix + text.encode() + suffix
+            separator = self.feature_separator
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= self.buffer_size:
+                yield b"".join(buffer)
+                buffer = []
+                size = 0
+        buffer.append(self.stream_footer)
+        yield b"".join(buffer)
+
+
+class GeoJsonSeqRenderer(StreamingGeoJsonRenderer):
+    """
+    Renders features as a GeoJSON Text Sequence (RFC 8142):
+    each feature is preceded by a record separator and followed
+    by a line feed, without any surrounding FeatureCollection.
+    """
+
+    media_type = "application/geo+json-seq"
+    format = "geojsonseq"
+    stream_header = b""
+    feature_separator = b""
+    stream_footer = b""
+    feature_prefix = b"\x1e"
+    feature_suffix = b"\n"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Renders a FeatureCollection (or a single feature)
+        as a sequence of features.
+        """
+        if data is None:
+            return b""
+        if isinstance(data, dict) and data.get("type") == "FeatureCollection":
+            features = data["features"]
+        else:
+            features = [data]
+        return b"".join(self.render_stream(features, renderer_context))
+
+
+class NewlineDelimitedGeoJsonRenderer(GeoJsonSeqRenderer):
+    """
+    Renders features as newline delimited GeoJSON:
+    one feature per line, without any surrounding FeatureCollection.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    feature_prefix = b""
+
+
+class TopoJsonRenderer(JSONRenderer):
+    """
+    Renders GeoJSON FeatureCollections as TopoJSON topologies,
+    other data (eg: errors) is rendered as JSON.
+    """
+
+    media_type = "application/topo+json"
+    format = "topojson"
+    # see ``rest_framework_gis.topojson.geojson_to_topology``
+    quantization = 10000
+    topology_object_name = "collection"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and data.get("type") == "FeatureCollection":
+            topology = geojson_to_topology(
+                data["features"], self.quantization, self.topology_object_name
+            )
+            # keeps foreign members, eg: pagination links
+            for key, value in data.items():
+                if key not in ("type", "features", "bbox"):
+                    topology.setdefault(key, value)
+            data = topology
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class MvtRenderer(BaseRenderer):
+    """
+    Renders the Mapbox Vector Tiles generated by
+    ``rest_framework_gis.mixins.VectorTileMixin``,
+    other data (eg: errors) is rendered as JSON.
+    """
+
+    media_type = "application/vnd.mapbox-vector-tile"
+    format = "mvt"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return JSONRenderer().render(data)
+
+
+class FlatGeobufRenderer(BaseRenderer):
+    """
+    Renders GeoJSON FeatureCollections as FlatGeobuf files, including
+    a packed Hilbert R-tree spatial index, other data (eg: errors) is
+    rendered as JSON. Can be used with ``StreamingGeoJsonListMixin``.
+    """
+
+    media_type = "application/flatgeobuf"
+    format = "fgb"
+    charset = None
+    render_style = "binary"
+    # see ``rest_framework_gis.flatgeobuf.encode_flatgeobuf``
+    srid = 4326
+    index_node_size = 16
+    dataset_name = None
+    buffer_size = 64 * 1024
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and data.get("type") == "FeatureCollection":
+            return b"".join(self.render_stream(data["features"], renderer_context))
+        return JSONRenderer().render(data)
+
+    def render_stream(self, features, renderer_context=None):
+        """
+        Returns an iterator which yields the FlatGeobuf
+        file containing ``features`` as chunks of bytes.
+        """
+        return encode_flatgeobuf(
+            features,
+            srid=self.srid,
+            index_node_size=self.index_node_size,
+            name=self.dataset_name,
+            buffer_size=self.buffer_size,
+        )
+
+
+class GeobufRenderer(BaseRenderer):
+    """
+    Renders GeoJSON as Geobuf, see ``rest_framework_gis.geobuf``,
+    other data (eg: errors) is rendered as JSON.
+    """
+
+    media_type = "application/geobuf"
+    format = "geobuf"
+    charset = None
+    render_style = "binary"
+    # number of decimal digits of the coordinates,
+    # see ``get_precision`` for the default behaviour
+    precision = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and data.get("type") in GEOJSON_TYPES:
+            return encode_geobuf(data, self.get_precision(renderer_context))
+        return JSONRenderer().render(data)
+
+    def get_precision(self, renderer_context):
+        """
+        Returns the ``precision`` attribute if set, otherwise the precision
+        of the ``geo_field`` of the serializer of the view, if any, otherwise
+        ``None``: the precision is inferred from the coordinates
+        """
+        if self.precision is not None:
+            return self.precision
+        view = (renderer_context or {}).get("view")
+        if not hasattr(view, "get_serializer"):
+            return None
+        serializer = view.get_serializer()
+        geo_field = getattr(getattr(serializer, "Meta", None), "geo_field", None)
+        field = serializer.fields.get(geo_field) if geo_field else None
+        return getattr(field, "precision", None)
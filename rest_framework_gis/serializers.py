@@ -1,14 +1,29 @@
 from collections import OrderedDict
 
+from django.contrib.gis.db.models.functions import AsGeoJSON, Transform
 from django.contrib.gis.geos import Polygon
-from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.fields import BooleanField
+from rest_framework.relations import HyperlinkedIdentityField, RelatedField
 from rest_framework.serializers import (
     LIST_SERIALIZER_KWARGS,
     ListSerializer,
     ModelSerializer,
+    raise_errors_on_nested_writes,
 )
+from rest_framework.utils import model_meta
 
-from .fields import GeometryField, GeometrySerializerMethodField  # noqa
+from .fields import (  # noqa
+    GeoJsonDict,
+    GeometryField,
+    GeometrySerializerMethodField,
+    RawGeoJson,
+)
+from .functions import Simplify, SimplifyPreserveTopology
+from .topojson import geojson_to_topology
 
 
 class GeoModelSerializer(ModelSerializer):
@@ -33,6 +48,135 @@ class GeoFeatureModelListSerializer(ListSerializer):
             )
         )
 
+    def to_internal_value(self, data):
+        """
+        Accepts a FeatureCollection as well as a list of features
+        """
+        data = self._get_features(data)
+        if self.instance is None or hasattr(ListSerializer, "run_child_validation"):
+            return super().to_internal_value(data)
+        # djangorestframework < 3.15 validates each item with the child directly
+        run_validation = self.child.run_validation
+
+        def run_child_validation(feature):
+            self.child.instance = self._get_instance(feature)
+            return run_validation(feature)
+
+        self.child.run_validation = run_child_validation
+        try:
+            return super().to_internal_value(data)
+        finally:
+            del self.child.run_validation
+
+    def run_child_validation(self, data):
+        # features are validated against the instance they update
+        if self.instance is not None:
+            self.child.instance = self._get_instance(data)
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        """
+        Saves the features with ``bulk_create`` when
+        the ``bulk_batch_size`` option is set
+        """
+        batch_size = self.child.Meta.bulk_batch_size
+        if not batch_size or self._has_many_to_many(validated_data):
+            return super().create(validated_data)
+        model = self.child.Meta.model
+        instances = []
+        for attrs in validated_data:
+            raise_errors_on_nested_writes("create", self.child, attrs)
+            instances.append(model(**attrs))
+        return model._default_manager.bulk_create(instances, batch_size=batch_size)
+
+    def update(self, instance, validated_data):
+        """
+        Updates the instances matching the ``id`` of each feature,
+        with ``bulk_update`` when the ``bulk_batch_size`` option is set
+        """
+        features = self._get_features(self.initial_data)
+        instances = [self._get_instance(feature) for feature in features]
+        batch_size = self.child.Meta.bulk_batch_size
+        if not batch_size or self._has_many_to_many(validated_data):
+            return [
+                self.child.update(obj, attrs)
+                for obj, attrs in zip(instances, validated_data)
+            ]
+        model = self.child.Meta.model
+        update_fields = set()
+        for obj, attrs in zip(instances, validated_data):
+            raise_errors_on_nested_writes("update", self.child, attrs)
+            for attr, value in attrs.items():
+                setattr(obj, attr, value)
+            update_fields.update(attrs)
+        update_fields.discard(model._meta.pk.name)
+        if update_fields:
+            model._default_manager.bulk_update(
+                instances, sorted(update_fields), batch_size=batch_size
+            )
+        return instances
+
+    @staticmethod
+    def _get_features(data):
+        if isinstance(data, dict) and data.get("type") == "FeatureCollection":
+            return data.get("features", data)
+        return data
+
+    def _get_instance(self, feature):
+        """
+        Returns the instance whose ``id_field`` matches the ``id`` of ``feature``
+        """
+        id_field = self.child.Meta.id_field
+        if not id_field:
+            raise ImproperlyConfigured(
+                "Updating a list of features requires an 'id_field'."
+            )
+        feature_id = feature.get("id") if isinstance(feature, dict) else None
+        try:
+            return self._instances_by_id[str(feature_id)]
+        except KeyError:
+            raise ValidationError({"id": [_("Feature not found.")]}, code="not_found")
+
+    @cached_property
+    def _instances_by_id(self):
+        field = self.child.fields[self.child.Meta.id_field]
+        return {
+            str(field.to_representation(field.get_attribute(obj))): obj
+            for obj in self.instance
+        }
+
+    def _has_many_to_many(self, validated_data):
+        """
+        Many to many relations can't be set with ``bulk_create``
+        and ``bulk_update``, the instances are saved one by one
+        """
+        relations = model_meta.get_field_info(self.child.Meta.model).relations
+        many_to_many = {
+            name for name, relation in relations.items() if relation.to_many
+        }
+        return any(many_to_many.intersection(attrs) for attrs in validated_data)
+
+
+class TopoJsonListSerializer(GeoFeatureModelListSerializer):
+    """
+    Outputs a TopoJSON topology instead of a FeatureCollection,
+    boundaries shared by neighbouring features are stored only once.
+
+    Can be used by setting ``list_serializer_class`` in the ``Meta``
+    of a ``GeoFeatureModelSerializer``.
+    """
+
+    # number of distinct values per dimension of the
+    # quantized coordinates, None disables quantization
+    quantization = 10000
+    topology_object_name = "collection"
+
+    def to_representation(self, data):
+        features = super(GeoFeatureModelListSerializer, self).to_representation(data)
+        return geojson_to_topology(
+            features, self.quantization, self.topology_object_name
+        )
+
 
 class GeoFeatureModelSerializer(ModelSerializer):
     """
@@ -41,6 +185,11 @@ class GeoFeatureModelSerializer(ModelSerializer):
     features and feature collections
     """
 
+    # query string parameters used to select the properties and to omit
+    # the geometry (eg: "properties" and "geometry"), disabled by default
+    properties_param = None
+    geometry_param = None
+
     @classmethod
     def many_init(cls, *args, **kwargs):
         child_serializer = cls(*args, **kwargs)
@@ -58,21 +207,66 @@ class GeoFeatureModelSerializer(ModelSerializer):
         )
         return list_serializer_class(*args, **list_kwargs)
 
+    # message of the error found in the Meta options by __init_subclass__
+    _meta_error = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # the Meta options are validated and normalized only once,
+        # configuration errors are raised when the serializer is instantiated
+        cls._meta_error = None
+        try:
+            cls.Meta = cls._resolve_meta(cls.Meta)
+        except ImproperlyConfigured as error:
+            cls._meta_error = str(error)
+        except AttributeError as error:
+            cls._meta_error = f"Invalid Meta options of {cls.__name__}: {error}"
+
     def __init__(self, *args, **kwargs):
+        if self._meta_error is not None:
+            raise ImproperlyConfigured(self._meta_error)
         super().__init__(*args, **kwargs)
-        meta = getattr(self, "Meta")
-        default_id_field = None
-        primary_key = self.Meta.model._meta.pk.name
+
+    @classmethod
+    def _resolve_meta(cls, meta):
+        """
+        Returns a subclass of ``meta`` holding the normalized options,
+        ``meta`` itself is never modified.
+        """
+
+        def get_option(name, *default):
+            """
+            Returns the option as declared by the user,
+            ignoring the values set by ``_resolve_meta``
+            """
+            for klass in meta.__mro__:
+                if name in vars(klass) and not vars(klass).get("_resolved", False):
+                    return vars(klass)[name]
+            if default:
+                return default[0]
+            raise AttributeError(name)
+
+        fields = get_option("fields", None)
+        exclude = get_option("exclude", None)
+        primary_key = meta.model._meta.pk.name
         # use primary key as id_field when possible
-        if (
-            not hasattr(meta, "fields")
-            or meta.fields == "__all__"
-            or primary_key in meta.fields
-        ):
+        default_id_field = None
+        if fields is None or fields == "__all__" or primary_key in fields:
             default_id_field = primary_key
-        meta.id_field = getattr(meta, "id_field", default_id_field)
-
-        if not hasattr(meta, "geo_field"):
+        options = {
+            "__module__": meta.__module__,
+            "__qualname__": meta.__qualname__,
+            "_resolved": True,
+            "id_field": get_option("id_field", default_id_field),
+            "bbox_geo_field": get_option("bbox_geo_field", None),
+            "auto_bbox": get_option("auto_bbox", False),
+            "db_geojson": get_option("db_geojson", False),
+            "bulk_batch_size": get_option("bulk_batch_size", None),
+        }
+
+        try:
+            geo_field = get_option("geo_field")
+        except AttributeError:
             raise ImproperlyConfigured(
                 "You must define a 'geo_field'. "
                 "Set it to None if there is no geometry."
@@ -80,52 +274,206 @@ class GeoFeatureModelSerializer(ModelSerializer):
 
         def check_excludes(field_name, field_role):
             """make sure the field is not excluded"""
-            if hasattr(meta, "exclude") and field_name in meta.exclude:
+            if exclude is not None and field_name in exclude:
                 raise ImproperlyConfigured(f"You cannot exclude your '{field_role}'.")
 
-        def add_to_fields(field_name):
+        def add_to_fields(fields, field_name):
             """Make sure the field is included in the fields"""
-            if hasattr(meta, "fields") and meta.fields != "__all__":
-                if field_name not in meta.fields:
-                    if type(meta.fields) is tuple:
+            if fields is not None and fields != "__all__":
+                if field_name not in fields:
+                    if type(fields) is tuple:
                         additional_fields = (field_name,)
                     else:
                         additional_fields = [field_name]
-                    meta.fields += additional_fields
+                    fields = fields + additional_fields
+            return fields
 
-        check_excludes(meta.geo_field, "geo_field")
+        check_excludes(geo_field, "geo_field")
 
-        if meta.geo_field is not None:
-            add_to_fields(meta.geo_field)
+        if geo_field is not None:
+            fields = add_to_fields(fields, geo_field)
 
-        meta.bbox_geo_field = getattr(meta, "bbox_geo_field", None)
-        if meta.bbox_geo_field:
-            check_excludes(meta.bbox_geo_field, "bbox_geo_field")
-            add_to_fields(meta.bbox_geo_field)
+        if options["bbox_geo_field"]:
+            check_excludes(options["bbox_geo_field"], "bbox_geo_field")
+            fields = add_to_fields(fields, options["bbox_geo_field"])
 
-        meta.auto_bbox = getattr(meta, "auto_bbox", False)
-        if meta.bbox_geo_field and meta.auto_bbox:
+        if options["bbox_geo_field"] and options["auto_bbox"]:
             raise ImproperlyConfigured(
                 "You must eiher define a 'bbox_geo_field' or "
                 "'auto_bbox', but you can not set both"
             )
 
+        if isinstance(fields, (list, tuple)):
+            # fields copied from a resolved Meta
+            # may already contain the geo fields
+            options["fields"] = type(fields)(dict.fromkeys(fields))
+        return type("Meta", (meta,), options)
+
+    @classmethod
+    def annotate_geojson(cls, queryset, context=None):
+        """
+        When the ``db_geojson`` option is enabled, annotates ``queryset``
+        with the GeoJSON representation of the ``geo_field`` encoded by the
+        database and defers the loading of the geometry column.
+
+        ``precision``, ``transform``, ``auto_bbox`` and ``simplify`` are
+        translated into database functions and their options, ``context``
+        is needed to resolve the zoom dependent simplification tolerance.
+        """
+        serializer = cls(context=context or {})
+        meta = serializer.Meta
+        if not meta.db_geojson or not meta.geo_field:
+            return queryset
+        # the geometry is omitted from the output
+        if serializer._feature_fields[1] is None:
+            return serializer._defer_geo_field(queryset)
+        field = serializer.fields[meta.geo_field]
+        if not isinstance(field, GeometryField):
+            raise ImproperlyConfigured(
+                "The 'db_geojson' option requires 'geo_field' to be a GeometryField."
+            )
+        if field.transform is not None and not isinstance(field.transform, int):
+            raise ImproperlyConfigured(
+                "The 'db_geojson' option requires 'transform' to be a SRID."
+            )
+        source = field.source.replace(".", "__")
+        expression = source
+        if field.transform is not None:
+            expression = Transform(source, field.transform)
+        tolerance = field.simplify_tolerance
+        if tolerance:
+            if field.preserve_topology:
+                expression = SimplifyPreserveTopology(expression, tolerance)
+            else:
+                expression = Simplify(expression, tolerance)
+        geojson = AsGeoJSON(
+            expression,
+            bbox=field.auto_bbox or meta.auto_bbox,
+            # the maximum number of decimal digits
+            # allowed by the database when not specified
+            precision=15 if field.precision is None else field.precision,
+        )
+        queryset = queryset.annotate(**{cls._get_geojson_annotation(meta): geojson})
+        return serializer._defer_geo_field(queryset)
+
+    def _defer_geo_field(self, queryset):
+        """
+        Defers the loading of the geometry column
+        """
+        source = self.fields[self.Meta.geo_field].source
+        if "." not in source:
+            queryset = queryset.defer(source)
+        return queryset
+
+    @classmethod
+    def optimize_queryset(cls, queryset, context=None):
+        """
+        Restricts the columns loaded by ``queryset`` to those read by the
+        serializer fields (which include ``id_field``, ``geo_field`` and
+        ``bbox_geo_field``) and adds the ``select_related`` and
+        ``prefetch_related`` lookups needed by the fields which follow
+        relations, avoiding to load and parse unused geometry columns.
+
+        The columns are not restricted if any field reads attributes
+        which are not model fields (eg: ``SerializerMethodField``).
+        """
+        serializer = cls(context=context or {})
+        model = queryset.model
+        only = {model._meta.pk.name}
+        select_related = set()
+        prefetch_related = set()
+        prunable = True
+        id_field, geo_field, bbox_field, property_fields = serializer._feature_fields
+        for field in (id_field, geo_field, bbox_field, *property_fields):
+            if field is None:
+                continue
+            lookups = _get_field_lookups(model, field)
+            if lookups is None:
+                prunable = False
+                continue
+            column, relation, many = lookups
+            if column:
+                only.add(column)
+            if relation and many:
+                prefetch_related.add(relation)
+            elif relation:
+                select_related.add(relation)
+        if prunable:
+            queryset = queryset.only(*sorted(only))
+        elif serializer.Meta.geo_field and geo_field is None:
+            queryset = serializer._defer_geo_field(queryset)
+        if select_related:
+            queryset = queryset.select_related(*sorted(select_related))
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*sorted(prefetch_related))
+        return queryset
+
+    @staticmethod
+    def _get_geojson_annotation(meta):
+        return f"{meta.geo_field}_geojson"
+
+    @cached_property
+    def _feature_fields(self):
+        """
+        Returns the fields used to build each feature: a tuple containing
+        the id field, the geometry field, the bbox field (``None`` when not
+        used) and the list of readable fields rendered as properties.
+
+        Computed only once per serializer instance, which is reused
+        for every object of a list by ``GeoFeatureModelListSerializer``.
+        """
+        meta = self.Meta
+        fields = self.fields
+        id_field = fields[meta.id_field] if meta.id_field else None
+        geo_field = fields[meta.geo_field] if meta.geo_field else None
+        bbox_field = fields[meta.bbox_geo_field] if meta.bbox_geo_field else None
+        # fields already processed are removed
+        # to increase performance on large numbers
+        processed_fields = {id_field, geo_field, bbox_field}
+        property_fields = [
+            field
+            for field in fields.values()
+            if field not in processed_fields and not field.write_only
+        ]
+        # sparse fieldsets requested in the query string
+        query_params = getattr(self.context.get("request"), "query_params", {})
+        if self._is_geometry_omitted(query_params):
+            geo_field = None
+        names = None
+        if self.properties_param:
+            names = query_params.get(self.properties_param, None)
+        if names is not None:
+            names = {name.strip() for name in names.split(",") if name.strip()}
+            unknown = names.difference(field.field_name for field in property_fields)
+            if unknown:
+                raise ParseError(
+                    f"Invalid properties supplied for parameter {self.properties_param}: "
+                    f"{', '.join(sorted(unknown))}"
+                )
+            property_fields = [
+                field for field in property_fields if field.field_name in names
+            ]
+        return id_field, geo_field, bbox_field, property_fields
+
+    def _is_geometry_omitted(self, query_params):
+        if not self.geometry_param or not self.Meta.geo_field:
+            return False
+        value = query_params.get(self.geometry_param, None)
+        return value in BooleanField.FALSE_VALUES
+
     def to_representation(self, instance):
         """
         Serialize objects -> primitives.
         """
+        id_field, field, bbox_field, property_fields = self._feature_fields
+
         # prepare OrderedDict geojson structure
         feature = OrderedDict()
 
-        # keep track of the fields being processed
-        processed_fields = set()
-
         # optional id attribute
-        if self.Meta.id_field:
-            field = self.fields[self.Meta.id_field]
-            value = field.get_attribute(instance)
-            feature["id"] = field.to_representation(value)
-            processed_fields.add(self.Meta.id_field)
+        if id_field is not None:
+            value = id_field.get_attribute(instance)
+            feature["id"] = id_field.to_representation(value)
 
         # required type attribute
         # must be "Feature" according to GeoJSON spec
@@ -133,11 +481,15 @@ class GeoFeatureModelSerializer(ModelSerializer):
 
         # geometry attribute
         # must be present in output according to GeoJSON spec
-        if self.Meta.geo_field:
-            field = self.fields[self.Meta.geo_field]
-            geo_value = field.get_attribute(instance)
+        geo_value = None
+        if field is not None:
+            geojson_annotation = self._get_geojson_annotation(self.Meta)
+            # GeoJSON encoded by the database, see ``annotate_geojson``
+            if self.Meta.db_geojson and hasattr(instance, geojson_annotation):
+                geo_value = getattr(instance, geojson_annotation)
+            else:
+                geo_value = field.get_attribute(instance)
             feature["geometry"] = field.to_representation(geo_value)
-            processed_fields.add(self.Meta.geo_field)
         else:
             feature["geometry"] = None
 
@@ -145,25 +497,28 @@ class GeoFeatureModelSerializer(ModelSerializer):
         # if auto_bbox feature is enabled
         # bbox will be determined automatically automatically
         if self.Meta.auto_bbox and geo_value:
-            feature["bbox"] = geo_value.extent
+            # encoded by the database along with the geometry
+            if isinstance(geo_value, str):
+                geometry = feature["geometry"]
+                feature["bbox"] = geometry["bbox"]
+                if not field.auto_bbox:
+                    if isinstance(geometry, RawGeoJson):
+                        geometry = feature["geometry"] = GeoJsonDict(geometry)
+                    del geometry["bbox"]
+            elif isinstance(field, GeometryField):
+                geometry = getattr(feature["geometry"], "geos", None)
+                if geometry is None:
+                    geometry = field.transform_geometry(geo_value)
+                feature["bbox"] = geometry.extent
+            else:
+                feature["bbox"] = geo_value.extent
         # otherwise it can be determined via another field
-        elif self.Meta.bbox_geo_field:
-            field = self.fields[self.Meta.bbox_geo_field]
-            value = field.get_attribute(instance)
+        elif bbox_field is not None:
+            value = bbox_field.get_attribute(instance)
             feature["bbox"] = value.extent if hasattr(value, "extent") else None
-            processed_fields.add(self.Meta.bbox_geo_field)
-
-        # the list of fields that will be processed by get_properties
-        # we will remove fields that have been already processed
-        # to increase performance on large numbers
-        fields = [
-            field_value
-            for field_key, field_value in self.fields.items()
-            if field_key not in processed_fields
-        ]
 
         # GeoJSON properties
-        feature["properties"] = self.get_properties(instance, fields)
+        feature["properties"] = self.get_properties(instance, property_fields)
 
         return feature
 
@@ -172,8 +527,8 @@ class GeoFeatureModelSerializer(ModelSerializer):
         Get the feature metadata which will be used for the GeoJSON
         "properties" key.
 
-        By default it returns all serializer fields excluding those used for
-        the ID, the geometry and the bounding box.
+        By default it returns all readable serializer fields excluding those
+        used for the ID, the geometry and the bounding box.
 
         :param instance: The current Django model instance
         :param fields: The list of fields to process (fields already processed have been removed)
@@ -227,3 +582,54 @@ class GeoFeatureModelSerializer(ModelSerializer):
             attrs[self.Meta.bbox_geo_field] = Polygon.from_bbox(feature["bbox"])
 
         return attrs
+
+
+def _get_field_lookups(model, field):
+    """
+    Returns a tuple containing the column of ``model`` read by ``field``,
+    the relation lookup it follows and whether the relation is multi-valued,
+    ``None`` when the attributes read by ``field`` can't be determined.
+    """
+    if field.source == "*":
+        # hyperlinked identity fields read only the lookup field
+        if (
+            isinstance(field, HyperlinkedIdentityField)
+            and "__" not in field.lookup_field
+        ):
+            return field.lookup_field, None, False
+        return None
+    source_attrs = field.source_attrs
+    try:
+        model_field = model._meta.get_field(source_attrs[0])
+    except FieldDoesNotExist:
+        return None
+    column = None
+    if model_field.concrete and not model_field.many_to_many:
+        column = source_attrs[0]
+    if not model_field.is_relation:
+        return column, None, False
+    # follow the relations traversed by the source
+    path = []
+    many = False
+    for attr in source_attrs:
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not model_field.is_relation:
+            break
+        # generic foreign keys can't be followed with select_related
+        if model_field.related_model is None:
+            return None
+        path.append(attr)
+        many = many or model_field.many_to_many or model_field.one_to_many
+        model = model_field.related_model
+    # related fields which return only the primary key read the foreign key
+    if (
+        not many
+        and len(path) == len(source_attrs) == 1
+        and isinstance(field, RelatedField)
+        and field.use_pk_only_optimization()
+    ):
+        return column, None, False
+    return column, "__".join(path), many
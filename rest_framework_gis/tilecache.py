@@ -0,0 +1,237 @@
+"""
+Cache of tile responses, invalidated by the changes of the geometries.
+
+The cached responses of each tile are keyed by a version token of the tile,
+a version token of its zoom level and a version token of the whole cache:
+invalidating a tile replaces its version token, the previous responses
+are never read again and expire (or are evicted) eventually.
+"""
+
+from hashlib import md5
+from uuid import uuid4
+
+from django.contrib.gis.gdal import GDALException
+from django.contrib.gis.geos import MultiPoint, Point
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from .fields import get_coord_transform
+from .mvt import MERCATOR_ORIGIN, tile_range
+
+__all__ = ["TileCache"]
+
+# latitude of the edges of the web mercator tiles
+MERCATOR_MAX_LATITUDE = 85.0511287798066
+
+
+class TileCache:
+    """
+    Stores the rendered responses of tiles in the Django cache named
+    ``cache_alias``, see ``rest_framework_gis.mixins.TileCacheMixin``.
+
+    :param name: prefix of the cache keys, which allows caching the tiles
+                 of different layers in the same cache
+    :param max_zoom: tiles of higher zoom levels are not cached
+    :param max_invalidated_tiles: when a change touches more tiles of a zoom
+                                  level, the whole zoom level is invalidated
+    :param buffer: fraction of the size of a tile by which the geometries
+                   are extended when looking for the tiles they touch (eg:
+                   the buffer of vector tiles)
+    """
+
+    def __init__(
+        self,
+        name,
+        cache_alias=DEFAULT_CACHE_ALIAS,
+        timeout=DEFAULT_TIMEOUT,
+        max_zoom=22,
+        max_invalidated_tiles=64,
+        buffer=256 / 4096,
+    ):
+        self.name = name
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self.max_zoom = max_zoom
+        self.max_invalidated_tiles = max_invalidated_tiles
+        self.buffer = buffer
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get(self, z, x, y, variant="", key=None):
+        """
+        Returns the response stored for the tile, ``variant`` identifies
+        the view and the parameters of the request
+        """
+        if z > self.max_zoom:
+            return None
+        return self.cache.get(key or self.get_key(z, x, y, variant))
+
+    def set(self, z, x, y, value, variant="", key=None):
+        """
+        Stores the response of the tile, ``key`` should be obtained with
+        ``get_key`` before the response is generated: if the tile is
+        invalidated in the meantime the response is stored under the
+        previous version and is never read
+        """
+        if z > self.max_zoom:
+            return
+        self.cache.set(key or self.get_key(z, x, y, variant), value, self.timeout)
+
+    def get_key(self, z, x, y, variant=""):
+        """
+        Returns the cache key of the current version of the tile
+        """
+        version_keys = [
+            f"{self.name}:version",
+            f"{self.name}:version:{z}",
+            f"{self.name}:version:{z}/{x}/{y}",
+        ]
+        versions = self.cache.get_many(version_keys)
+        missing = {
+            key: uuid4().hex for key in version_keys if versions.get(key) is None
+        }
+        if missing:
+            self.cache.set_many(missing, None)
+            versions.update(missing)
+        version = ".".join(versions[key] for key in version_keys)
+        variant = md5(variant.encode(), usedforsecurity=False).hexdigest()
+        return f"{self.name}:{z}/{x}/{y}:{version}:{variant}"
+
+    def invalidate_tiles(self, tiles):
+        """
+        Invalidates the ``(z, x, y)`` tiles
+        """
+        self.cache.set_many(
+            {f"{self.name}:version:{z}/{x}/{y}": uuid4().hex for z, x, y in tiles},
+            None,
+        )
+
+    def invalidate_geometry(self, geometry):
+        """
+        Invalidates the tiles touched by the bounding box of ``geometry``
+        (geometries without SRID are assumed to be in EPSG:4326)
+        """
+        if geometry is None or geometry.empty:
+            return
+        try:
+            bounds = self._get_mercator_bounds(geometry)
+        except GDALException:
+            # the tiles touched by the geometry can't be determined
+            self.clear()
+            return
+        versions = {}
+        for z in range(self.max_zoom + 1):
+            min_x, min_y, max_x, max_y = tile_range(bounds, z, self.buffer)
+            count = (max_x - min_x + 1) * (max_y - min_y + 1)
+            if count > self.max_invalidated_tiles:
+                versions[f"{self.name}:version:{z}"] = uuid4().hex
+                continue
+            for x in range(min_x, max_x + 1):
+                for y in range(min_y, max_y + 1):
+                    versions[f"{self.name}:version:{z}/{x}/{y}"] = uuid4().hex
+        self.cache.set_many(versions, None)
+
+    @staticmethod
+    def _get_mercator_bounds(geometry):
+        """
+        Returns the bounds of ``geometry`` in EPSG:3857, the latitudes
+        beyond the limits of web mercator (eg: the poles) are clamped
+        """
+        srid = geometry.srid or 4326
+        if srid == 3857:
+            min_x, min_y, max_x, max_y = geometry.extent
+        else:
+            envelope = geometry.envelope
+            envelope.srid = srid
+            if srid != 4326:
+                envelope.transform(get_coord_transform(srid, 4326))
+            min_x, min_y, max_x, max_y = envelope.extent
+            corners = MultiPoint(
+                Point(_clamp(min_x, 180), _clamp(min_y, MERCATOR_MAX_LATITUDE)),
+                Point(_clamp(max_x, 180), _clamp(max_y, MERCATOR_MAX_LATITUDE)),
+                srid=4326,
+            )
+            corners.transform(get_coord_transform(4326, 3857))
+            min_x, min_y, max_x, max_y = corners.extent
+        return tuple(
+            _clamp(value, MERCATOR_ORIGIN) for value in (min_x, min_y, max_x, max_y)
+        )
+
+    def clear(self):
+        """
+        Invalidates all the tiles
+        """
+        self.cache.set(f"{self.name}:version", uuid4().hex, None)
+
+    def register(self, model, geo_field):
+        """
+        Invalidates the tiles touched by the previous and the current value
+        of ``geo_field`` when an instance of ``model`` is saved or deleted,
+        once the transaction is committed.
+
+        Bulk operations (``bulk_create``, ``bulk_update`` and ``update`` of
+        querysets) don't send signals: call ``invalidate_geometry`` or
+        ``clear`` after them.
+        """
+        dispatch_uid = f"tile_cache_{self.name}_{model._meta.label}_{geo_field}"
+
+        def pre_save_handler(sender, instance, raw=False, **kwargs):
+            if raw or instance._state.adding or instance.pk is None:
+                return
+            self._set_previous_geometry(
+                instance,
+                geo_field,
+                model._default_manager.filter(pk=instance.pk)
+                .values_list(geo_field, flat=True)
+                .first(),
+            )
+
+        def post_save_handler(sender, instance, raw=False, **kwargs):
+            if raw:
+                return
+            previous = self._pop_previous_geometry(instance, geo_field)
+            self._invalidate_on_commit(
+                instance, [previous, getattr(instance, geo_field)]
+            )
+
+        def pre_delete_handler(sender, instance, **kwargs):
+            # deferred geometries can't be loaded once the row is deleted
+            self._set_previous_geometry(
+                instance, geo_field, getattr(instance, geo_field)
+            )
+
+        def post_delete_handler(sender, instance, **kwargs):
+            previous = self._pop_previous_geometry(instance, geo_field)
+            self._invalidate_on_commit(instance, [previous])
+
+        for signal, handler in (
+            (pre_save, pre_save_handler),
+            (post_save, post_save_handler),
+            (pre_delete, pre_delete_handler),
+            (post_delete, post_delete_handler),
+        ):
+            signal.connect(handler, sender=model, weak=False, dispatch_uid=dispatch_uid)
+
+    def _set_previous_geometry(self, instance, geo_field, geometry):
+        previous = instance.__dict__.setdefault("_tile_cache_geometries", {})
+        previous[(self.name, geo_field)] = geometry
+
+    def _pop_previous_geometry(self, instance, geo_field):
+        previous = instance.__dict__.get("_tile_cache_geometries", {})
+        return previous.pop((self.name, geo_field), None)
+
+    def _invalidate_on_commit(self, instance, geometries):
+        def invalidate():
+            for geometry in geometries:
+                self.invalidate_geometry(geometry)
+
+        using = router.db_for_write(type(instance), instance=instance)
+        transaction.on_commit(invalidate, using=using)
+
+
+def _clamp(value, limit):
+    return min(max(value, -limit), limit)
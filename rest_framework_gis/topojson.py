@@ -0,0 +1,245 @@
+"""
+GeoJSON to TopoJSON conversion.
+
+Lines and polygon rings are cut at the junctions (the points where the
+paths of different geometries join or split) into arcs, each arc is stored
+only once in the topology, even when it's shared by neighbouring polygons.
+
+When quantization is used, coordinates are converted to integers relative
+to the bounding box of the features and arcs are delta-encoded,
+see https://github.com/topojson/topojson-specification
+"""
+
+from .geojson import iter_geometries
+
+__all__ = ["geojson_to_topology"]
+
+
+def geojson_to_topology(features, quantization=None, object_name="collection"):
+    """
+    Returns a dictionary containing the TopoJSON topology made
+    of a single GeometryCollection object holding ``features``.
+
+    :param features: iterable of GeoJSON feature dictionaries
+    :param quantization: number of distinct values per dimension of the
+                         quantized coordinates (eg: ``1e4``),
+                         ``None`` disables quantization
+    :param object_name: the name of the object in the topology
+    """
+    features = list(features)
+    topology = {"type": "Topology"}
+    bbox = _get_bbox(features)
+    quantize = _get_quantize(bbox, quantization, topology)
+    builder = _TopologyBuilder(quantize)
+    geometries = [builder.add_feature(feature) for feature in features]
+    builder.build_arcs()
+    topology["objects"] = {
+        object_name: {"type": "GeometryCollection", "geometries": geometries}
+    }
+    topology["arcs"] = builder.get_arcs(delta=quantization is not None)
+    if bbox:
+        topology["bbox"] = bbox
+    return topology
+
+
+def _get_quantize(bbox, quantization, topology):
+    """
+    Returns the function which converts positions to
+    the (hashable) points used in the topology
+    """
+    if not quantization:
+        return lambda position: (position[0], position[1])
+    x0, y0, x1, y1 = bbox or (0, 0, 0, 0)
+    kx = (x1 - x0) / (quantization - 1) if x1 > x0 else 1
+    ky = (y1 - y0) / (quantization - 1) if y1 > y0 else 1
+    topology["transform"] = {"scale": [kx, ky], "translate": [x0, y0]}
+    return lambda position: (
+        int(round((position[0] - x0) / kx)),
+        int(round((position[1] - y0) / ky)),
+    )
+
+
+def _get_bbox(features):
+    xs = []
+    ys = []
+
+    def add(coordinates):
+        if coordinates and isinstance(coordinates[0], (int, float)):
+            xs.append(coordinates[0])
+            ys.append(coordinates[1])
+            return
+        for member in coordinates:
+            add(member)
+
+    for feature in features:
+        for geometry in iter_geometries(feature.get("geometry")):
+            add(geometry.get("coordinates") or [])
+    if not xs:
+        return None
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+class _Line:
+    """
+    A line or ring of a geometry, replaced by
+    the indexes of its arcs once they're built
+    """
+
+    __slots__ = ("points", "closed", "arcs")
+
+    def __init__(self, points, closed):
+        self.points = points
+        self.closed = closed
+        self.arcs = None
+
+
+class _TopologyBuilder:
+    def __init__(self, quantize):
+        self.quantize = quantize
+        self.lines = []
+        self.arcs = []
+        self.arc_indexes = {}
+        self.objects = []
+
+    def add_feature(self, feature):
+        obj = self.add_geometry(feature.get("geometry"))
+        if feature.get("id") is not None:
+            obj["id"] = feature["id"]
+        if feature.get("bbox") is not None:
+            obj["bbox"] = feature["bbox"]
+        obj["properties"] = feature.get("properties")
+        return obj
+
+    def add_geometry(self, geometry):
+        if not geometry:
+            return {"type": None}
+        geom_type = geometry["type"]
+        if geom_type == "GeometryCollection":
+            geometries = [self.add_geometry(g) for g in geometry["geometries"]]
+            return {"type": geom_type, "geometries": geometries}
+        coordinates = geometry["coordinates"]
+        obj = {"type": geom_type}
+        if geom_type == "Point":
+            obj["coordinates"] = list(self.quantize(coordinates)) if coordinates else []
+        elif geom_type == "MultiPoint":
+            obj["coordinates"] = [list(self.quantize(p)) for p in coordinates]
+        elif geom_type == "LineString":
+            obj["arcs"] = self.add_line(coordinates, closed=False)
+        elif geom_type == "MultiLineString":
+            obj["arcs"] = [self.add_line(line, closed=False) for line in coordinates]
+        elif geom_type == "Polygon":
+            obj["arcs"] = [self.add_line(ring, closed=True) for ring in coordinates]
+        elif geom_type == "MultiPolygon":
+            obj["arcs"] = [
+                [self.add_line(ring, closed=True) for ring in polygon]
+                for polygon in coordinates
+            ]
+        else:
+            raise ValueError(f"Unsupported geometry type: {geom_type}")
+        self.objects.append(obj)
+        return obj
+
+    def add_line(self, positions, closed):
+        points = []
+        for position in positions:
+            point = self.quantize(position)
+            # quantization can make consecutive points equal
+            if not points or point != points[-1]:
+                points.append(point)
+        if len(points) == 1:
+            points.append(points[0])
+        line = _Line(points, closed)
+        self.lines.append(line)
+        return line
+
+    def find_junctions(self):
+        """
+        Returns the set of points where lines join or split: the ends of
+        lines and the points which are reached from different neighbours
+        """
+        junctions = set()
+        neighbours = {}
+        for line in self.lines:
+            points = line.points
+            if not points:
+                continue
+            if line.closed:
+                # the last point of a ring is equal to the first one
+                ring = points[:-1]
+                triplets = zip(ring[-1:] + ring[:-1], ring, ring[1:] + ring[:1])
+            else:
+                junctions.add(points[0])
+                junctions.add(points[-1])
+                triplets = zip(points, points[1:-1], points[2:])
+            for previous, point, following in triplets:
+                if previous > following:
+                    previous, following = following, previous
+                seen = neighbours.setdefault(point, (previous, following))
+                if seen != (previous, following):
+                    junctions.add(point)
+        return junctions
+
+    def build_arcs(self):
+        junctions = self.find_junctions()
+        for line in self.lines:
+            points = line.points
+            if not points:
+                line.arcs = []
+                continue
+            if line.closed:
+                ring = points[:-1]
+                starts = [i for i, point in enumerate(ring) if point in junctions]
+                # rings without junctions are rotated to a canonical start
+                # so that equal rings are stored as a single arc
+                start = starts[0] if starts else ring.index(min(ring))
+                points = ring[start:] + ring[:start] + [ring[start]]
+            line.arcs = self.cut(points, junctions)
+        for obj in self.objects:
+            if "arcs" in obj:
+                obj["arcs"] = _resolve_arcs(obj["arcs"])
+
+    def cut(self, points, junctions):
+        arcs = []
+        start = 0
+        last = len(points) - 1
+        for index in range(1, last + 1):
+            if index == last or points[index] in junctions:
+                end = index + 1
+                arcs.append(self.add_arc(tuple(points[start:end])))
+                start = index
+        return arcs
+
+    def add_arc(self, points):
+        """
+        Returns the index of the arc made of ``points``,
+        the ones complement when the arc is stored reversed
+        """
+        index = self.arc_indexes.get(points)
+        if index is not None:
+            return index
+        index = self.arc_indexes.get(points[::-1])
+        if index is not None:
+            return ~index
+        index = len(self.arcs)
+        self.arcs.append(points)
+        self.arc_indexes[points] = index
+        return index
+
+    def get_arcs(self, delta):
+        if not delta:
+            return [[list(point) for point in arc] for arc in self.arcs]
+        arcs = []
+        for arc in self.arcs:
+            x0, y0 = arc[0]
+            encoded = [[x0, y0]]
+            for x, y in arc[1:]:
+                encoded.append([x - x0, y - y0])
+                x0, y0 = x, y
+            arcs.append(encoded)
+        return arcs
+
+
+def _resolve_arcs(arcs):
+    if isinstance(arcs, _Line):
+        return arcs.arcs
+    return [_resolve_arcs(member) for member in arcs]
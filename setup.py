@@ -30,6 +30,7 @@ setup(
         "djangorestframework>=3.12,<3.18",
         "django-filter>=23.5,<26.0",
     ],
+    extras_require={"numpy": ["numpy"]},
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Environment :: Web Environment",
@@ -2,7 +2,11 @@ from django.contrib.gis.geos import Point
 from rest_framework import pagination, serializers
 
 from rest_framework_gis import serializers as gis_serializers
-from rest_framework_gis.fields import GeometryField, GeometrySerializerMethodField
+from rest_framework_gis.fields import (
+    DistanceField,
+    GeometryField,
+    GeometrySerializerMethodField,
+)
 
 from .models import (
     BoxedLocation,
@@ -22,6 +26,8 @@ __all__ = [
     "LocationGeoSerializer",
     "PaginatedLocationGeoSerializer",
     "LocationGeoFeatureSerializer",
+    "LocationDistanceGeoFeatureSerializer",
+    "LocationGeoFeatureSparseSerializer",
     "LocationGeoFeatureSlugSerializer",
     "LocationGeoFeatureFalseIdSerializer",
     "LocationGeoFeatureNoIdSerializer",
@@ -89,6 +95,15 @@ class LocationGeoFeatureSerializer(gis_serializers.GeoFeatureModelSerializer):
         fields = "__all__"
 
 
+class LocationDistanceGeoFeatureSerializer(LocationGeoFeatureSerializer):
+    distance = DistanceField()
+
+
+class LocationGeoFeatureSparseSerializer(LocationGeoFeatureSerializer):
+    properties_param = "properties"
+    geometry_param = "geometry"
+
+
 class LocationGeoFeatureSlugSerializer(LocationGeoFeatureSerializer):
     """use slug as id attribute"""
 
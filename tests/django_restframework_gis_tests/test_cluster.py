@@ -0,0 +1,58 @@
+from django.contrib.gis.geos import Point
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import Location
+from .views import GeojsonLocationClusterList
+
+
+class TestClusterMixin(TestCase):
+    def setUp(self):
+        self.url = reverse("api_geojson_location_cluster_list")
+        Location.objects.create(name="l1", geometry=Point(1, 1))
+        Location.objects.create(name="l2", geometry=Point(1.5, 1.5))
+        Location.objects.create(name="l3", geometry=Point(50, 50))
+
+    def _get(self, params):
+        response = self.client.get(self.url, {"format": "json", **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["type"], "FeatureCollection")
+        return response.data["features"]
+
+    def test_cluster_size(self):
+        view = GeojsonLocationClusterList()
+        size = view.get_cluster_size(Location.objects.all(), "geometry", 2)
+        # the width of a tile of zoom level 2 is 90 degrees
+        self.assertEqual(size, 90 / 8)
+
+    def test_clusters(self):
+        features = sorted(
+            self._get({"zoom": 2}), key=lambda feature: feature["properties"]["count"]
+        )
+        self.assertEqual(len(features), 2)
+        self.assertEqual(features[0]["properties"], {"cluster": True, "count": 1})
+        self.assertEqual(features[0]["geometry"]["coordinates"], [50, 50])
+        self.assertEqual(features[1]["properties"], {"cluster": True, "count": 2})
+        self.assertEqual(features[1]["geometry"]["type"], "Point")
+        self.assertEqual(features[1]["geometry"]["coordinates"], [1.25, 1.25])
+
+    def test_clusters_filtered(self):
+        features = self._get({"zoom": 2, "in_bbox": "40,40,60,60"})
+        self.assertEqual(len(features), 1)
+        self.assertEqual(features[0]["properties"]["count"], 1)
+
+    def test_clusters_tile(self):
+        features = self._get({"tile": "1/1/0"})
+        self.assertEqual(sum(f["properties"]["count"] for f in features), 3)
+
+    def test_features(self):
+        # from cluster_max_zoom on and without zoom the features are listed
+        for params in ({"zoom": 10}, {}):
+            features = self._get(params)
+            names = sorted(feature["properties"]["name"] for feature in features)
+            self.assertEqual(names, ["l1", "l2", "l3"])
+
+    def test_invalid_zoom(self):
+        for zoom in ("a", "-1"):
+            response = self.client.get(self.url, {"zoom": zoom, "format": "json"})
+            self.assertEqual(response.status_code, 400)
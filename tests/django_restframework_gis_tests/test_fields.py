@@ -1,10 +1,24 @@
 import json
+from unittest import mock
 
 from django.contrib.gis.geos import GEOSGeometry
+from django.contrib.gis.measure import D
 from django.test import TestCase
 from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
 
+from rest_framework_gis import geojson
 from rest_framework_gis import serializers as gis_serializers
+from rest_framework_gis.fields import (
+    DistanceField,
+    GeoJsonDict,
+    RawGeoJson,
+    get_coord_transform,
+)
+
+from .models import OtherSridLocation
 
 Point = {"type": "Point", "coordinates": [-105.0162, 39.5742]}
 Point31287 = {"type": "Point", "coordinates": [625826.2376404074, 483198.2074507246]}
@@ -237,6 +251,49 @@ class TestTransform(BaseTestCase):
         ):
             self.assertAlmostEqual(received, expected, places=5)
 
+    def test_transform_feature_bbox_once(self):
+        class LocationGeoFeatureSerializer(gis_serializers.GeoFeatureModelSerializer):
+            geometry = gis_serializers.GeometryField(transform=4326)
+
+            class Meta:
+                model = OtherSridLocation
+                geo_field = "geometry"
+                fields = ("id",)
+                auto_bbox = True
+
+        geometry = GEOSGeometry(json.dumps(Point31287))
+        geometry.srid = 31287
+        location = OtherSridLocation(id=1, geometry=geometry)
+        with mock.patch.object(
+            gis_serializers.GeometryField,
+            "transform_geometry",
+            autospec=True,
+            side_effect=gis_serializers.GeometryField.transform_geometry,
+        ) as transform_geometry:
+            data = LocationGeoFeatureSerializer(location).data
+        self.assertEqual(transform_geometry.call_count, 1)
+        self.assertEqual(list(data["bbox"][:2]), data["geometry"]["coordinates"])
+        self.assertAlmostEqual(data["bbox"][0], 16.3725, places=5)
+
+    def test_transform_does_not_modify_instance(self):
+        model = self.get_instance(Point31287)
+        model.geometry.srid = 31287
+        Serializer = self.create_serializer(transform=4326)
+        Serializer(model).data
+        self.assertEqual(model.geometry.srid, 31287)
+        self.assertAlmostEqual(model.geometry.x, 625826.2376404074, places=5)
+
+    def test_transform_reuses_coord_transform(self):
+        geometry = GEOSGeometry("POINT (625826.2376404074 483198.2074507246)", 31287)
+        field = gis_serializers.GeometryField(transform=4326)
+        self.assertIs(
+            get_coord_transform(31287, 4326), get_coord_transform(31287, 4326)
+        )
+        self.assertEqual(
+            field.transform_geometry(geometry),
+            geometry.transform(get_coord_transform(31287, 4326), clone=True),
+        )
+
 
 class TestPrecision(BaseTestCase):
     def test_precision_Point(self):
@@ -775,3 +832,184 @@ class TestBoundingBox(BaseTestCase):
                 }
             },
         )
+
+
+class TestGeoJsonEncoding(BaseTestCase):
+    def _assertEqualToGdal(self, geometry):
+        Serializer = self.create_serializer()
+        data = Serializer({"geometry": geometry}).data
+        self.assertEqual(data["geometry"], json.loads(geometry.geojson))
+
+    def test_all_geometry_types(self):
+        for geometry in (
+            Point,
+            MultiPoint,
+            LineString,
+            MultiLineString,
+            Polygon,
+            MultiPolygon,
+            GeometryCollection,
+        ):
+            with self.subTest(geometry_type=geometry["type"]):
+                self._assertEqualToGdal(GEOSGeometry(json.dumps(geometry)))
+
+    def test_3d_geometries(self):
+        self._assertEqualToGdal(GEOSGeometry("POINT Z (1 2 3)"))
+        self._assertEqualToGdal(GEOSGeometry("LINESTRING Z (1 2 3, 4 5 6)"))
+
+    def test_empty_geometries(self):
+        Serializer = self.create_serializer()
+        for wkt in ("POLYGON EMPTY", "LINESTRING EMPTY", "GEOMETRYCOLLECTION EMPTY"):
+            with self.subTest(wkt=wkt):
+                self._assertEqualToGdal(GEOSGeometry(wkt))
+        data = Serializer({"geometry": GEOSGeometry("POINT EMPTY")}).data
+        self.assertEqual(data["geometry"], {"type": "Point", "coordinates": []})
+
+    def test_force_2d(self):
+        Serializer = self.create_serializer(force_2d=True)
+        geometry = GEOSGeometry("LINESTRING Z (1 2 3, 4 5 6)")
+        data = Serializer({"geometry": geometry}).data
+        self.assertEqual(
+            data["geometry"],
+            {"type": "LineString", "coordinates": [[1.0, 2.0], [4.0, 5.0]]},
+        )
+
+
+class TestGeoJsonDecoding(BaseTestCase):
+    def _assertEqualToGdal(self, geometry):
+        field = gis_serializers.GeometryField()
+        value = field.to_internal_value(geometry)
+        self.assertEqual(value.ewkt, GEOSGeometry(json.dumps(geometry)).ewkt)
+
+    def test_all_geometry_types(self):
+        for geometry in (
+            Point,
+            MultiPoint,
+            LineString,
+            MultiLineString,
+            Polygon,
+            MultiPolygon,
+            GeometryCollection,
+        ):
+            with self.subTest(geometry_type=geometry["type"]):
+                self._assertEqualToGdal(geometry)
+                with mock.patch.object(geojson, "numpy", None):
+                    self._assertEqualToGdal(geometry)
+
+    def test_3d_geometries(self):
+        self._assertEqualToGdal({"type": "Point", "coordinates": [1, 2, 3]})
+        self._assertEqualToGdal(
+            {"type": "LineString", "coordinates": [[1, 2, 3], [4, 5, 6]]}
+        )
+
+    def test_gdal_fallback(self):
+        for geometry in (
+            {"type": "Point", "coordinates": [1, 2, 3, 4]},
+            {"type": "LineString", "coordinates": [[1, 2, 3], [4, 5]]},
+            {
+                "type": "Point",
+                "coordinates": [1, 2],
+                "crs": {"type": "name", "properties": {"name": "EPSG:3857"}},
+            },
+        ):
+            with self.subTest(geometry=geometry):
+                with self.assertRaises(ValueError):
+                    geojson.geojson_to_geos(geometry)
+                self._assertEqualToGdal(geometry)
+
+
+class TestCoordinatesProcessing(BaseTestCase):
+    def _get_large_polygon(self):
+        polygon = GEOSGeometry("POINT (-84.32 34.98)").buffer(0.001, quadsegs=64)
+        rings = GEOSGeometry(json.dumps(Polygon)).coords + polygon.coords
+        return GEOSGeometry(
+            json.dumps({"type": "Polygon", "coordinates": rings}), srid=4326
+        )
+
+    def test_numpy_and_python_consistency(self):
+        geometry = self._get_large_polygon()
+        Serializer = self.create_serializer(precision=3, remove_duplicates=True)
+        data = Serializer({"geometry": geometry}).data
+        with mock.patch.object(geojson, "numpy", None):
+            python_data = Serializer({"geometry": geometry}).data
+        self.assertEqual(data, python_data)
+        # consecutive duplicates are removed after rounding
+        ring = data["geometry"]["coordinates"][2]
+        self.assertLess(len(ring), len(geometry.coords[2]))
+        for point, next_point in zip(ring, ring[1:]):
+            self.assertNotEqual(point, next_point)
+
+
+class TestSimplify(BaseTestCase):
+    def _get_geometry(self):
+        return GEOSGeometry("POINT (0 0)").buffer(1, quadsegs=32)
+
+    def test_simplify(self):
+        geometry = self._get_geometry()
+        Serializer = self.create_serializer(simplify=0.1)
+        data = Serializer({"geometry": geometry}).data
+        expected = geometry.simplify(0.1, preserve_topology=True)
+        self.assertEqual(len(data["geometry"]["coordinates"][0]), len(expected[0]))
+        self.assertLess(len(expected[0]), len(geometry[0]))
+
+    def test_simplify_zoom_tolerances(self):
+        geometry = self._get_geometry()
+        Serializer = self.create_serializer()
+        view = mock.Mock(simplify_tolerances={0: 0.5, 10: 0.01, 18: 0})
+        for zoom, tolerance in (("4", 0.5), ("12", 0.01), ("20", 0), ("", None)):
+            with self.subTest(zoom=zoom):
+                request = Request(APIRequestFactory().get("/", {"zoom": zoom}))
+                context = {"request": request, "view": view}
+                serializer = Serializer({"geometry": geometry}, context=context)
+                field = serializer.fields["geometry"]
+                self.assertEqual(field.simplify_tolerance, tolerance)
+                if tolerance:
+                    expected = geometry.simplify(tolerance, preserve_topology=True)
+                else:
+                    expected = geometry
+                self.assertEqual(
+                    len(serializer.data["geometry"]["coordinates"][0]),
+                    len(expected[0]),
+                )
+
+    def test_simplify_invalid_zoom(self):
+        Serializer = self.create_serializer()
+        view = mock.Mock(simplify_tolerances={0: 0.5})
+        request = Request(APIRequestFactory().get("/", {"zoom": "a"}))
+        serializer = Serializer(
+            {"geometry": self._get_geometry()},
+            context={"request": request, "view": view},
+        )
+        with self.assertRaises(ParseError):
+            serializer.data
+
+
+class TestRawGeoJson(BaseTestCase):
+    text = '{"type":"Point","coordinates":[1.50,2]}'
+
+    def test_raw_geojson(self):
+        raw = RawGeoJson(self.text)
+        self.assertEqual(str(raw), self.text)
+        self.assertEqual(raw, {"type": "Point", "coordinates": [1.5, 2]})
+        self.assertEqual(raw["coordinates"], [1.5, 2])
+        self.assertEqual(RawGeoJson(self.text.encode()).text, self.text)
+
+    def test_encoded_geometry(self):
+        field = gis_serializers.GeometryField()
+        value = field.to_representation(self.text)
+        self.assertIsInstance(value, RawGeoJson)
+        self.assertIs(field.to_representation(value), value)
+        # the coordinates must be processed in python
+        field = gis_serializers.GeometryField(force_2d=True)
+        value = field.to_representation('{"type":"Point","coordinates":[1,2,3]}')
+        self.assertIsInstance(value, GeoJsonDict)
+        self.assertEqual(value["coordinates"], [1, 2])
+
+
+class TestDistanceField(BaseTestCase):
+    def test_distance_field(self):
+        self.assertEqual(DistanceField().to_representation(D(km=1.5)), 1500)
+        self.assertEqual(DistanceField(unit="km").to_representation(D(m=500)), 0.5)
+        self.assertEqual(DistanceField().to_representation(2.5), 2.5)
+        self.assertIsNone(DistanceField().to_representation(None))
+        self.assertTrue(DistanceField().read_only)
@@ -1,13 +1,25 @@
 import json
 import urllib
-from unittest import skipIf
+from types import SimpleNamespace
+from unittest import mock, skipIf
 
 from django.conf import settings
-from django.contrib.gis.geos import GEOSGeometry, Polygon
+from django.contrib.gis.geos import GEOSGeometry, Point, Polygon
 from django.test import TestCase
 from django.urls import reverse
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from rest_framework_gis.filters import (
+    DistanceToPointFilter,
+    GeometryLookupFilter,
+    InBBoxFilter,
+    KNearestNeighborsFilter,
+)
+from rest_framework_gis.polyline import encode_polyline
 
-from .models import Location
+from .models import Location, OtherSridLocation
 from .views import (
     GeojsonLocationContainedInBBoxList,
     GeojsonLocationOrderDistanceToPointList,
@@ -44,6 +56,15 @@ class TestRestFrameworkGisFilters(TestCase):
         self.location_within_degrees_of_point_list_url = reverse(
             "api_geojson_location_list_within_degrees_of_point_filter"
         )
+        self.location_within_geodesic_distance_of_point_list_url = reverse(
+            "api_geojson_location_list_within_geodesic_distance_of_point_filter"
+        )
+        self.location_nearest_list_url = reverse(
+            "api_geojson_location_nearest_list_filter"
+        )
+        self.location_geometry_lookup_list_url = reverse(
+            "api_geojson_location_geometry_lookup_list_filter"
+        )
         self.geojson_contained_in_geometry = reverse(
             "api_geojson_contained_in_geometry"
         )
@@ -197,6 +218,80 @@ class TestRestFrameworkGisFilters(TestCase):
                 True,
             )
 
+    def test_inBBOXFilter_antimeridian(self):
+        for name, x in (("east", 175), ("west", -175), ("outside", 0)):
+            Location.objects.create(name=name, geometry=Point(x, 0))
+        url_params = "?in_bbox=170,-10,-170,10&format=json"
+        response = self.client.get(
+            self.location_contained_in_bbox_list_url + url_params
+        )
+        names = {f["properties"]["name"] for f in response.data["features"]}
+        self.assertEqual(names, {"east", "west"})
+
+    def test_inBBOXFilter_antimeridian_projected(self):
+        bbox_filter = InBBoxFilter()
+        request = Request(APIRequestFactory().get("/", {"in_bbox": "10,20,0,0"}))
+        bbox = bbox_filter.get_filter_bbox(request)
+        for srid in (3857, None):
+            split = bbox_filter.split_bbox(bbox, srid)
+            self.assertIsInstance(split, Polygon)
+            self.assertEqual(split.extent, (0, 0, 10, 20))
+        east, west = bbox_filter.split_bbox(bbox, 4326)
+        self.assertEqual(east.extent, (10, 0, 180, 20))
+        self.assertEqual(west.extent, (-180, 0, 0, 20))
+        request = Request(
+            APIRequestFactory().get("/", {"in_bbox": "10,20,0,0", "bbox_srid": 3857})
+        )
+        bbox = bbox_filter.split_bbox(bbox_filter.get_filter_bbox(request), 4326)
+        self.assertIsInstance(bbox, Polygon)
+        self.assertEqual(bbox.srid, 3857)
+
+    def test_inBBOXFilter_get_filter_bbox_override(self):
+        class BBoxFilter(InBBoxFilter):
+            def get_filter_bbox(self, request):
+                return Polygon.from_bbox((0, 0, 10, 10))
+
+        view = SimpleNamespace(bbox_filter_field="geometry")
+        request = Request(APIRequestFactory().get("/"))
+        queryset = BBoxFilter().filter_queryset(request, Location.objects.all(), view)
+        (lookup,) = queryset.query.where.children
+        self.assertEqual(lookup.lookup_name, "contained")
+        self.assertEqual(lookup.rhs.extent, (0, 0, 10, 10))
+
+    def test_inBBOXFilter_srid(self):
+        Location.objects.create(name="inside", geometry=Point(5, 5))
+        Location.objects.create(name="outside", geometry=Point(15, 5))
+        # (0, 0, 10, 10) in web mercator
+        url_params = "?in_bbox=0,0,1113194.9,1118890.0&bbox_srid=3857&format=json"
+        response = self.client.get(
+            self.location_contained_in_bbox_list_url + url_params
+        )
+        names = [f["properties"]["name"] for f in response.data["features"]]
+        self.assertEqual(names, ["inside"])
+
+    def test_inBBOXFilter_srid_transform(self):
+        bbox_filter = InBBoxFilter()
+        bbox = Polygon.from_bbox((0, 0, 1113194.9, 1118890.0))
+        bbox.srid = 3857
+        transformed = bbox_filter.transform_bbox(bbox, 4326)
+        self.assertEqual(transformed.srid, 4326)
+        for value, expected in zip(transformed.extent, (0, 0, 10, 10)):
+            self.assertAlmostEqual(value, expected, places=5)
+        # the sides of the bbox are densified before the transformation
+        self.assertEqual(len(transformed.coords[0]), 4 * 17 + 1)
+        self.assertIs(bbox_filter.transform_bbox(bbox, 3857), bbox)
+
+    def test_inBBOXFilter_invalid_srid(self):
+        url_params = "?in_bbox=0,0,1,1&bbox_srid=invalid&format=json"
+        response = self.client.get(
+            self.location_contained_in_bbox_list_url + url_params
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["detail"],
+            "Invalid SRID supplied for parameter bbox_srid",
+        )
+
     @skipIf(has_spatialite, "Skipped test for spatialite backend: not accurate enough")
     def test_TileFilter_filtering(self):
         """
@@ -334,6 +429,68 @@ class TestRestFrameworkGisFilters(TestCase):
         for result in response.data["features"]:
             self.assertEqual(result["properties"]["name"], treasure_island.name)
 
+    def test_DistanceToPointFilter_geodesic(self):
+        # at latitude 60 a degree of longitude is ~55.8 km long,
+        # the approximation of dist_to_deg is off by ~25% there
+        Location.objects.create(name="east", geometry=Point(10.2, 60))
+        Location.objects.create(name="north", geometry=Point(10, 60.09))
+        Location.objects.create(name="antimeridian", geometry=Point(-179.99, 0))
+
+        def get_names(point, distance):
+            response = self.client.get(
+                self.location_within_geodesic_distance_of_point_list_url,
+                {"point": point, "dist": distance, "format": "json"},
+            )
+            self.assertEqual(response.status_code, 200)
+            return {f["properties"]["name"] for f in response.data["features"]}
+
+        # east is ~11.17 km away, north ~10.03 km
+        self.assertEqual(get_names("10,60", 10500), {"north"})
+        self.assertEqual(get_names("10,60", 11500), {"east", "north"})
+        self.assertEqual(get_names("10,60", 9500), set())
+        # ~2.2 km across the antimeridian
+        self.assertEqual(get_names("179.99,0", 5000), {"antimeridian"})
+
+    def test_DistanceToPointFilter_geodesic_projected(self):
+        # the units of the projected SRID of the field are not meters on
+        # the ellipsoid, the distance is measured in the geodesic SRID
+        for name, x, y in (("east", 16.52, 48.21), ("north", 16.37, 48.30)):
+            point = Point(x, y, srid=4326)
+            point.transform(31287)
+            OtherSridLocation.objects.create(name=name, geometry=point)
+        distance_filter = DistanceToPointFilter()
+        queryset = OtherSridLocation.objects.all()
+
+        def get_names(distance):
+            point = Point(16.37, 48.21, srid=4326)
+            q = distance_filter.get_geodesic_filter(
+                queryset, "geometry", point, distance
+            )
+            return set(queryset.filter(q).values_list("name", flat=True))
+
+        # east is ~11.13 km away, north ~10.01 km
+        self.assertEqual(get_names(10500), {"north"})
+        self.assertEqual(get_names(11500), {"east", "north"})
+        self.assertEqual(get_names(9500), set())
+
+    def test_DistanceToPointFilter_geodesic_bbox(self):
+        distance_filter = DistanceToPointFilter()
+        (extent,) = distance_filter.get_geodesic_bbox(Point(10, 60), 11500)
+        xmin, ymin, xmax, ymax = extent
+        # the bbox is a bit larger than the circle
+        self.assertTrue(10.2 < xmax < 10.25)
+        self.assertTrue(9.75 < xmin < 9.8)
+        self.assertTrue(60.1 < ymax < 60.11)
+        self.assertTrue(59.89 < ymin < 59.9)
+        # split at the antimeridian
+        east, west = distance_filter.get_geodesic_bbox(Point(179.99, 0), 5000)
+        self.assertEqual(east[2], 180)
+        self.assertEqual(west[0], -180)
+        self.assertTrue(-180 < west[2] < -179.9)
+        # all the longitudes when a pole is within the distance
+        (extent,) = distance_filter.get_geodesic_bbox(Point(10, 89.9), 20000)
+        self.assertEqual((extent[0], extent[2], extent[3]), (-180, 180, 90))
+
     @skipIf(
         has_spatialite,
         'Skipped test for spatialite backend: missing feature "GeometryDistance"',
@@ -546,6 +703,203 @@ class TestRestFrameworkGisFilters(TestCase):
             "Invalid distance string supplied for parameter dist",
         )
 
+    def test_KNearestNeighborsFilter(self):
+        for x in (0.3, -0.1, 0.2, 0.4):
+            Location.objects.create(name=f"{x}", geometry=Point(x, 0))
+
+        def get_features(params):
+            response = self.client.get(
+                self.location_nearest_list_url, {"format": "json", **params}
+            )
+            self.assertEqual(response.status_code, 200)
+            return response.data["features"]
+
+        features = get_features({"point": "0,0", "k": 2})
+        self.assertEqual([f["properties"]["name"] for f in features], ["-0.1", "0.2"])
+        # the distance on the spheroid, in meters
+        distance = features[0]["properties"]["distance"]
+        self.assertAlmostEqual(distance, 11131.9, delta=1)
+        # k is limited by knn_max_k
+        features = get_features({"point": "0,0", "k": 10})
+        self.assertEqual(len(features), 3)
+        features = get_features({"point": "0,0", "k": 3, "dist": 25000})
+        self.assertEqual([f["properties"]["name"] for f in features], ["-0.1", "0.2"])
+        # the filter is not applied without point
+        self.assertEqual(len(get_features({"k": 2})), 4)
+
+    def test_KNearestNeighborsFilter_projected(self):
+        # the distance is in meters on the ellipsoid, not in the units
+        # of the projected SRID of the field
+        for name, x, y in (("east", 16.52, 48.21), ("north", 16.37, 48.30)):
+            point = Point(x, y, srid=4326)
+            point.transform(31287)
+            OtherSridLocation.objects.create(name=name, geometry=point)
+        request = Request(APIRequestFactory().get("/", {"point": "16.37,48.21"}))
+        view = SimpleNamespace(knn_filter_field="geometry", kwargs={})
+        queryset = KNearestNeighborsFilter().filter_queryset(
+            request, OtherSridLocation.objects.all(), view
+        )
+        distances = {location.name: location.distance.m for location in queryset}
+        self.assertAlmostEqual(distances["north"], 10010, delta=20)
+        self.assertAlmostEqual(distances["east"], 11140, delta=20)
+
+    def test_KNearestNeighborsFilter_details(self):
+        nearest = Location.objects.create(name="nearest", geometry=Point(0.1, 0))
+        farthest = Location.objects.create(name="farthest", geometry=Point(1, 0))
+        for location in (nearest, farthest):
+            url = reverse(
+                "api_geojson_location_nearest_details_filter", args=[location.pk]
+            )
+            response = self.client.get(url, {"point": "0,0", "k": 1, "format": "json"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["properties"]["name"], location.name)
+            self.assertIsNotNone(response.data["properties"]["distance"])
+        response = self.client.patch(
+            f"{url}?point=0,0&k=1&format=json",
+            {"properties": {"name": "updated"}},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        farthest.refresh_from_db()
+        self.assertEqual(farthest.name, "updated")
+
+    def test_KNearestNeighborsFilter_ValueError(self):
+        for params in ({"k": "a"}, {"k": 0}, {"dist": "a"}):
+            response = self.client.get(
+                self.location_nearest_list_url,
+                {"point": "0,0", "format": "json", **params},
+            )
+            self.assertEqual(response.status_code, 400)
+
+    def _create_geometry_lookup_locations(self):
+        Location.objects.create(name="inside", geometry=Point(5, 5))
+        Location.objects.create(name="crossing", geometry="LINESTRING (8 8, 12 12)")
+        Location.objects.create(name="outside", geometry=Point(15, 5))
+
+    def _get_geometry_lookup_names(self, params, method="get"):
+        response = getattr(self.client, method)(
+            f"{self.location_geometry_lookup_list_url}?format=json",
+            params,
+            **({"content_type": "application/json"} if method == "post" else {}),
+        )
+        self.assertEqual(response.status_code, 200)
+        return {f["properties"]["name"] for f in response.data["features"]}
+
+    def test_GeometryLookupFilter(self):
+        self._create_geometry_lookup_locations()
+        square = "POLYGON ((0 0, 10 0, 10 10, 0 10, 0 0))"
+        names = self._get_geometry_lookup_names({"geometry_filter": square})
+        self.assertEqual(names, {"inside", "crossing"})
+        names = self._get_geometry_lookup_names(
+            {"geometry_filter": square, "geometry_lookup": "within"}
+        )
+        self.assertEqual(names, {"inside"})
+        names = self._get_geometry_lookup_names(
+            {"geometry_filter": "POINT (5 5)", "geometry_lookup": "contains"}
+        )
+        self.assertEqual(names, {"inside"})
+        # EWKT in another SRID, (0, 0, 10, 10) in web mercator
+        names = self._get_geometry_lookup_names(
+            {
+                "geometry_filter": "SRID=3857;POLYGON ((0 0, 1113194.9 0, "
+                "1113194.9 1118890, 0 1118890, 0 0))",
+                "geometry_lookup": "within",
+            }
+        )
+        self.assertEqual(names, {"inside"})
+        self.assertEqual(len(self._get_geometry_lookup_names({})), 3)
+
+    def test_GeometryLookupFilter_geojson_polyline(self):
+        self._create_geometry_lookup_locations()
+        geojson = {
+            "type": "Polygon",
+            "coordinates": [[[14, 4], [16, 4], [16, 6], [14, 6], [14, 4]]],
+        }
+        names = self._get_geometry_lookup_names(
+            {"geometry_filter": json.dumps(geojson)}
+        )
+        self.assertEqual(names, {"outside"})
+        # a closed polyline is a polygon
+        polyline = encode_polyline([(4, 4), (6, 4), (6, 6), (4, 6), (4, 4)])
+        names = self._get_geometry_lookup_names({"geometry_filter": polyline})
+        self.assertEqual(names, {"inside"})
+        # in the request body
+        names = self._get_geometry_lookup_names(
+            {"geometry_filter": geojson, "geometry_lookup": "within"}, method="post"
+        )
+        self.assertEqual(names, {"outside"})
+
+    def test_GeometryLookupFilter_omitted_geometry(self):
+        self._create_geometry_lookup_locations()
+        response = self.client.get(
+            self.location_geometry_lookup_list_url,
+            {
+                "geometry_filter": "POLYGON ((0 0, 10 0, 10 10, 0 10, 0 0))",
+                "geometry": "false",
+                "format": "json",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        features = response.data["features"]
+        self.assertEqual(len(features), 2)
+        self.assertTrue(all(f["geometry"] is None for f in features))
+
+    def test_GeometryLookupFilter_ValueError(self):
+        circle = Point(0, 0).buffer(1, quadsegs=16)
+        for params, detail in (
+            (
+                {"geometry_filter": "POLYGON ((0 0"},
+                "Invalid geometry supplied for parameter geometry_filter",
+            ),
+            (
+                {"geometry_filter": "POINT (0 0)", "geometry_lookup": "overlaps"},
+                "Invalid lookup supplied for parameter geometry_lookup, "
+                "expected one of: intersects, within, contains",
+            ),
+            (
+                {"geometry_filter": circle.wkt},
+                "The geometry supplied for parameter geometry_filter "
+                "has more than 50 vertices",
+            ),
+        ):
+            response = self.client.get(
+                self.location_geometry_lookup_list_url, {"format": "json", **params}
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data["detail"], detail)
+
+    def test_GeometryLookupFilter_simplify(self):
+        geometry_filter = GeometryLookupFilter()
+        circle = Point(0, 0).buffer(1, quadsegs=16)
+        request = Request(APIRequestFactory().get("/", {"geometry_filter": circle.wkt}))
+
+        class View:
+            geometry_filter_max_vertices = 100
+            geometry_filter_simplify = 0.1
+
+        geometry = geometry_filter.get_filter_geometry(request, View())
+        self.assertLess(geometry.num_coords, 50)
+        self.assertEqual(geometry.srid, 4326)
+        self.assertTrue(geometry.equals_exact(circle.simplify(0.1, True)))
+        # the limit applies to the input, before transforming and simplifying it
+        View.geometry_filter_max_vertices = 50
+        with mock.patch(
+            "rest_framework_gis.filters.get_coord_transform"
+        ) as get_coord_transform, self.assertRaises(ParseError):
+            geometry_filter.get_filter_geometry(request, View(), srid=3857)
+        get_coord_transform.assert_not_called()
+
+    def test_GeometryLookupFilter_parse_geometry(self):
+        geometry_filter = GeometryLookupFilter()
+        line = geometry_filter.parse_geometry("_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+        self.assertEqual(line.geom_type, "LineString")
+        self.assertEqual(line.coords[0], (-120.2, 38.5))
+        self.assertEqual(line.srid, 4326)
+        point = geometry_filter.parse_geometry({"type": "Point", "coordinates": [1, 2]})
+        self.assertEqual(point.coords, (1, 2))
+        with self.assertRaises(ValueError):
+            geometry_filter.parse_geometry("not a polyline!")
+
     def test_DistanceToPointOrderingFilter_filtering_none(self):
         url_params = "?point=&format=json"
         response = self.client.get(
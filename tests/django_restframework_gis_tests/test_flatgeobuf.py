@@ -0,0 +1,305 @@
+from struct import unpack_from
+
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework_gis.flatgeobuf import encode_flatgeobuf
+from rest_framework_gis.renderers import FlatGeobufRenderer
+
+from .models import Location
+
+
+class _Table:
+    """
+    Reads the fields of a FlatBuffers table
+    """
+
+    def __init__(self, data, position):
+        self.data = data
+        self.position = position
+        vtable = position - unpack_from("<i", data, position)[0]
+        size = unpack_from("<H", data, vtable)[0]
+        self.offsets = unpack_from(f"<{(size - 4) // 2}H", data, vtable + 4)
+
+    def _field(self, index):
+        if index >= len(self.offsets) or not self.offsets[index]:
+            return None
+        return self.position + self.offsets[index]
+
+    def scalar(self, index, fmt, default=0):
+        position = self._field(index)
+        if position is None:
+            return default
+        return unpack_from(f"<{fmt}", self.data, position)[0]
+
+    def _indirect(self, index):
+        position = self._field(index)
+        if position is None:
+            return None
+        return position + unpack_from("<I", self.data, position)[0]
+
+    def table(self, index):
+        position = self._indirect(index)
+        return None if position is None else _Table(self.data, position)
+
+    def string(self, index):
+        position = self._indirect(index)
+        if position is None:
+            return None
+        start = position + 4
+        end = start + unpack_from("<I", self.data, position)[0]
+        return self.data[start:end].decode()
+
+    def vector(self, index, fmt):
+        position = self._indirect(index)
+        if position is None:
+            return []
+        length = unpack_from("<I", self.data, position)[0]
+        return list(unpack_from(f"<{length}{fmt}", self.data, position + 4))
+
+    def tables(self, index):
+        position = self._indirect(index)
+        if position is None:
+            return []
+        length = unpack_from("<I", self.data, position)[0]
+        tables = []
+        for n in range(length):
+            item = position + 4 + n * 4
+            tables.append(
+                _Table(self.data, item + unpack_from("<I", self.data, item)[0])
+            )
+        return tables
+
+
+def _read_size_prefixed(data, offset):
+    start = offset + 4
+    end = start + unpack_from("<I", data, offset)[0]
+    buffer = data[start:end]
+    return _Table(buffer, unpack_from("<I", buffer, 0)[0]), end
+
+
+def _decode_properties(data, columns):
+    properties = {}
+    offset = 0
+    while offset < len(data):
+        index = unpack_from("<H", data, offset)[0]
+        name, column_type = columns[index]
+        offset += 2
+        if column_type == 2:
+            value = bool(data[offset])
+            offset += 1
+        elif column_type == 7:
+            value = unpack_from("<q", data, offset)[0]
+            offset += 8
+        elif column_type == 10:
+            value = unpack_from("<d", data, offset)[0]
+            offset += 8
+        else:
+            start = offset + 4
+            offset = start + unpack_from("<I", data, offset)[0]
+            value = data[start:offset].decode()
+        properties[name] = value
+    return properties
+
+
+def _decode_geometry(table):
+    geometry = {"type": table.scalar(6, "B")}
+    parts = table.tables(7)
+    if parts:
+        geometry["parts"] = [_decode_geometry(part) for part in parts]
+    else:
+        geometry["xy"] = table.vector(1, "d")
+        geometry["ends"] = table.vector(0, "I")
+        geometry["z"] = table.vector(2, "d")
+    return geometry
+
+
+def _decode(data):
+    """
+    Returns the header, the index nodes and the features of a FlatGeobuf file
+    """
+    assert data[:8] == b"fgb\x03fgb\x00"
+    table, offset = _read_size_prefixed(data, 8)
+    header = {
+        "name": table.string(0),
+        "envelope": table.vector(1, "d"),
+        "geometry_type": table.scalar(2, "B"),
+        "has_z": table.scalar(3, "B"),
+        "columns": [
+            (column.string(0), column.scalar(1, "B")) for column in table.tables(7)
+        ],
+        "features_count": table.scalar(8, "Q"),
+        "index_node_size": table.scalar(9, "H", 16),
+        "crs": table.table(10).scalar(1, "i") if table.table(10) else None,
+    }
+    nodes = []
+    if header["index_node_size"] and header["features_count"]:
+        count = header["features_count"]
+        num_nodes = count
+        while count != 1:
+            count = -(-count // header["index_node_size"])
+            num_nodes += count
+        for _ in range(num_nodes):
+            nodes.append(unpack_from("<ddddQ", data, offset))
+            offset += 40
+    features_start = offset
+    features = []
+    while offset < len(data):
+        position = offset - features_start
+        table, offset = _read_size_prefixed(data, offset)
+        geometry = table.table(0)
+        features.append(
+            {
+                "offset": position,
+                "geometry": _decode_geometry(geometry) if geometry else None,
+                "properties": _decode_properties(
+                    bytes(table.vector(1, "B")), header["columns"]
+                ),
+            }
+        )
+    return header, nodes, features
+
+
+class TestFlatGeobuf(TestCase):
+    features = [
+        {
+            "type": "Feature",
+            "id": n,
+            "geometry": {"type": "Point", "coordinates": [n, n * 2]},
+            "properties": {"name": f"point {n}", "even": n % 2 == 0, "ratio": n / 2},
+        }
+        for n in range(5)
+    ]
+
+    def test_header(self):
+        header, _, features = _decode(b"".join(encode_flatgeobuf(self.features)))
+        self.assertEqual(header["features_count"], 5)
+        self.assertEqual(header["geometry_type"], 1)
+        self.assertEqual(header["envelope"], [0, 0, 4, 8])
+        self.assertEqual(header["crs"], 4326)
+        self.assertFalse(header["has_z"])
+        self.assertEqual(
+            header["columns"], [("id", 7), ("name", 11), ("even", 2), ("ratio", 10)]
+        )
+
+    def test_features(self):
+        _, _, features = _decode(b"".join(encode_flatgeobuf(self.features)))
+        features = sorted(features, key=lambda feature: feature["properties"]["id"])
+        self.assertEqual(
+            features[3]["properties"],
+            {"id": 3, "name": "point 3", "even": False, "ratio": 1.5},
+        )
+        self.assertEqual(features[3]["geometry"]["xy"], [3, 6])
+
+    def test_index(self):
+        data = b"".join(encode_flatgeobuf(self.features, index_node_size=2))
+        header, nodes, features = _decode(data)
+        self.assertEqual(header["index_node_size"], 2)
+        # 5 leaves, 3 + 2 + 1 parent nodes
+        self.assertEqual(len(nodes), 11)
+        self.assertEqual(nodes[0], (0, 0, 4, 8, 1))
+        leaves = nodes[6:]
+        self.assertEqual([leaf[4] for leaf in leaves], [f["offset"] for f in features])
+        for leaf, feature in zip(leaves, features):
+            x, y = feature["geometry"]["xy"]
+            self.assertEqual(leaf[:4], (x, y, x, y))
+        # features are sorted by their position on the hilbert curve
+        self.assertNotEqual([f["properties"]["id"] for f in features], [0, 1, 2, 3, 4])
+
+    def test_no_index(self):
+        data = b"".join(encode_flatgeobuf(self.features, index_node_size=0))
+        header, nodes, features = _decode(data)
+        self.assertEqual(header["index_node_size"], 0)
+        self.assertEqual(nodes, [])
+        self.assertEqual([f["properties"]["id"] for f in features], [0, 1, 2, 3, 4])
+
+    def test_geometry_types(self):
+        features = [
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [
+                        [[0, 0], [4, 0], [4, 4], [0, 0]],
+                        [[1, 1], [2, 1], [2, 2], [1, 1]],
+                    ],
+                },
+                "properties": {"tags": ["a"]},
+            },
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "MultiPolygon",
+                    "coordinates": [
+                        [[[0, 0], [1, 0], [1, 1], [0, 0]]],
+                        [[[5, 5], [6, 5], [6, 6], [5, 5]]],
+                    ],
+                },
+                "properties": {"tags": None},
+            },
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": [[0, 0, 1], [1, 1, 2]],
+                },
+                "properties": {},
+            },
+            {"type": "Feature", "geometry": None, "properties": {}},
+        ]
+        data = b"".join(encode_flatgeobuf(features, index_node_size=0))
+        header, _, (polygon, multipolygon, line, empty) = _decode(data)
+        self.assertEqual(header["geometry_type"], 0)
+        self.assertEqual(header["envelope"], [0, 0, 6, 6])
+        self.assertEqual(header["columns"], [("tags", 12)])
+        self.assertEqual(polygon["properties"], {"tags": '["a"]'})
+        self.assertEqual(polygon["geometry"]["type"], 3)
+        self.assertEqual(polygon["geometry"]["ends"], [4, 8])
+        self.assertEqual(len(polygon["geometry"]["xy"]), 16)
+        self.assertEqual(multipolygon["geometry"]["type"], 6)
+        parts = multipolygon["geometry"]["parts"]
+        self.assertEqual([part["type"] for part in parts], [3, 3])
+        self.assertEqual(parts[1]["xy"], [5, 5, 6, 5, 6, 6, 5, 5])
+        self.assertEqual(line["geometry"]["type"], 2)
+        # z is only written when all the geometries have it
+        self.assertEqual(line["geometry"]["z"], [])
+        self.assertIsNone(empty["geometry"])
+
+    def test_z(self):
+        features = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [1, 2, 3]},
+                "properties": {},
+            }
+        ]
+        header, _, (feature,) = _decode(b"".join(encode_flatgeobuf(features)))
+        self.assertTrue(header["has_z"])
+        self.assertEqual(feature["geometry"]["z"], [3])
+
+    def test_empty(self):
+        header, nodes, features = _decode(b"".join(encode_flatgeobuf([])))
+        self.assertEqual(header["features_count"], 0)
+        self.assertEqual(header["envelope"], [])
+        self.assertEqual((nodes, features), ([], []))
+
+    def test_renderer(self):
+        renderer = FlatGeobufRenderer()
+        data = renderer.render({"type": "FeatureCollection", "features": self.features})
+        header, _, features = _decode(data)
+        self.assertEqual(len(features), 5)
+        self.assertEqual(renderer.render({"detail": "error"}), b'{"detail":"error"}')
+
+    def test_streaming_list(self):
+        for n in range(1, 4):
+            Location.objects.create(name=f"l{n}", geometry=f"POINT ({n} {n})")
+        response = self.client.get(
+            reverse("api_geojson_location_streaming_list"), {"format": "fgb"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/flatgeobuf")
+        header, _, features = _decode(b"".join(response.streaming_content))
+        self.assertEqual(header["features_count"], 3)
+        names = sorted(feature["properties"]["name"] for feature in features)
+        self.assertEqual(names, ["l1", "l2", "l3"])
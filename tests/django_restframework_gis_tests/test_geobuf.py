@@ -0,0 +1,214 @@
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.exceptions import ParseError
+
+from rest_framework_gis import serializers as gis_serializers
+from rest_framework_gis.geobuf import decode_geobuf, encode_geobuf
+from rest_framework_gis.parsers import GeobufParser
+from rest_framework_gis.protobuf import message, packed, varint_field
+from rest_framework_gis.renderers import GeobufRenderer
+
+from .models import Location
+
+
+class _Stream:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+class TestGeobuf(TestCase):
+    collection = {
+        "type": "FeatureCollection",
+        "bbox": [0.5, 1.25, 10.5, 11.25],
+        "name": "collection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": 1,
+                "bbox": [0.5, 1.25, 0.5, 1.25],
+                "geometry": {"type": "Point", "coordinates": [0.5, 1.25]},
+                "properties": {
+                    "name": "point",
+                    "count": -3,
+                    "large": 2**40,
+                    "ratio": 0.1,
+                    "visible": True,
+                    "hidden": False,
+                    "tags": ["a", "b"],
+                    "extra": {"nested": None},
+                    "empty": None,
+                },
+            },
+            {
+                "type": "Feature",
+                "id": "line",
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": [[0, 0], [10.5, 11.25], [-3, 4]],
+                },
+                "properties": {"name": "line"},
+            },
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [
+                        [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]],
+                        [[2, 2], [3, 2], [3, 3], [2, 2]],
+                    ],
+                },
+                "properties": {},
+            },
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "MultiPolygon",
+                    "coordinates": [
+                        [[[0, 0], [1, 0], [1, 1], [0, 0]]],
+                        [
+                            [[5, 5], [9, 5], [9, 9], [5, 5]],
+                            [[6, 6], [7, 6], [7, 7], [6, 6]],
+                        ],
+                    ],
+                },
+                "properties": {"name": "multipolygon"},
+            },
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "GeometryCollection",
+                    "geometries": [
+                        {"type": "MultiPoint", "coordinates": [[1, 2], [3, 4]]},
+                        {
+                            "type": "MultiLineString",
+                            "coordinates": [[[0, 0], [1, 1]], [[2, 2], [3, 3]]],
+                        },
+                    ],
+                },
+                "properties": {},
+            },
+            {"type": "Feature", "geometry": None, "properties": {"name": "null"}},
+        ],
+    }
+
+    def test_round_trip(self):
+        data = encode_geobuf(self.collection)
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(decode_geobuf(data), self.collection)
+        self.assertLess(len(data), len(json.dumps(self.collection)) / 2)
+
+    def test_round_trip_geometry(self):
+        geometry = {"type": "LineString", "coordinates": [[1, 2, 3], [4, 5, 6]]}
+        self.assertEqual(decode_geobuf(encode_geobuf(geometry)), geometry)
+        feature = self.collection["features"][1]
+        self.assertEqual(decode_geobuf(encode_geobuf(feature)), feature)
+
+    def test_precision(self):
+        point = {"type": "Point", "coordinates": [1.123456789, 2.5]}
+        self.assertEqual(
+            decode_geobuf(encode_geobuf(point))["coordinates"], [1.123457, 2.5]
+        )
+        self.assertEqual(
+            decode_geobuf(encode_geobuf(point, precision=2))["coordinates"],
+            [1.12, 2.5],
+        )
+
+    def test_invalid(self):
+        for data in [b"\x0a\x05ab", b"\x0f", b"\x42\x02\x50\x00\x99"]:
+            with self.assertRaises(ValueError):
+                decode_geobuf(data)
+
+    def test_invalid_structure(self):
+        polygon = varint_field(1, 4)
+        for data in [
+            # truncated double
+            b"\x09\x00",
+            # truncated varint
+            b"\x10",
+            # no dimensions
+            varint_field(2, 0) + message(6, polygon),
+            # precision too large to be decoded
+            varint_field(3, 2**32 - 1) + message(6, polygon),
+            # coordinates which are not made of whole points
+            message(6, polygon + packed(3, [2, 4, 6])),
+            # ring lengths exceeding the coordinates
+            message(6, polygon + packed(2, [5, 1]) + packed(3, [2, 4])),
+            # multipolygon lengths without ring lengths
+            message(6, varint_field(1, 5) + packed(2, [2, 1]) + packed(3, [2, 4])),
+            # property key and value indexes out of range
+            message(5, message(13, message(1, b"a")) + packed(14, [0, 0])),
+            message(1, b"a") + message(5, message(13, b"") + packed(14, [0, 1])),
+        ]:
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                decode_geobuf(data)
+        with self.assertRaises(ParseError):
+            GeobufParser().parse(_Stream(b"\x09\x00"))
+
+    def test_renderer(self):
+        renderer = GeobufRenderer()
+        data = renderer.render(self.collection)
+        self.assertEqual(decode_geobuf(data), self.collection)
+        self.assertEqual(renderer.render({"detail": "error"}), b'{"detail":"error"}')
+
+    def test_renderer_field_precision(self):
+        class PrecisionSerializer(gis_serializers.GeoFeatureModelSerializer):
+            geometry = gis_serializers.GeometryField(precision=2)
+
+            class Meta:
+                model = Location
+                geo_field = "geometry"
+                fields = ("name", "geometry")
+
+        class View:
+            def get_serializer(self):
+                return PrecisionSerializer()
+
+        point = {"type": "Point", "coordinates": [1.123456789, 2.5]}
+        renderer = GeobufRenderer()
+        data = renderer.render(point, renderer_context={"view": View()})
+        self.assertEqual(decode_geobuf(data)["coordinates"], [1.12, 2.5])
+        renderer.precision = 3
+        data = renderer.render(point, renderer_context={"view": View()})
+        self.assertEqual(decode_geobuf(data)["coordinates"], [1.123, 2.5])
+
+    def test_parser(self):
+        parser = GeobufParser()
+        stream = _Stream(encode_geobuf(self.collection))
+        self.assertEqual(parser.parse(stream), self.collection)
+        with self.assertRaises(ParseError):
+            parser.parse(_Stream(b"\x0f"))
+        with self.assertRaises(ParseError):
+            parser.parse(None)
+
+    def test_list(self):
+        Location.objects.create(name="l1", geometry="POINT (1.5 2.5)")
+        response = self.client.get(
+            reverse("api_geojson_location_geobuf_list"), {"format": "geobuf"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/geobuf")
+        collection = decode_geobuf(response.content)
+        self.assertEqual(collection["type"], "FeatureCollection")
+        (feature,) = collection["features"]
+        self.assertEqual(feature["properties"]["name"], "l1")
+        self.assertEqual(feature["geometry"]["coordinates"], [1.5, 2.5])
+
+    def test_create(self):
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [1.5, 2.5]},
+            "properties": {"name": "geobuf"},
+        }
+        response = self.client.post(
+            reverse("api_geojson_location_geobuf_list"),
+            data=encode_geobuf(feature),
+            content_type="application/geobuf",
+        )
+        self.assertEqual(response.status_code, 201)
+        location = Location.objects.get(name="geobuf")
+        self.assertEqual(location.geometry.coords, (1.5, 2.5))
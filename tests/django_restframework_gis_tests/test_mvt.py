@@ -0,0 +1,258 @@
+from struct import unpack
+
+from django.contrib.gis.geos import GEOSGeometry
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework_gis.mvt import encode_tile, tile_bounds, tile_geometry
+
+from .models import Location
+
+
+def _read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, offset
+
+
+def _read_fields(data):
+    """
+    Returns the list of (field, value) pairs of a protocol buffers message
+    """
+    fields = []
+    offset = 0
+    while offset < len(data):
+        key, offset = _read_varint(data, offset)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, offset = _read_varint(data, offset)
+        elif wire_type == 1:
+            end = offset + 8
+            value = unpack("<d", data[offset:end])[0]
+            offset = end
+        else:
+            length, offset = _read_varint(data, offset)
+            end = offset + length
+            value = data[offset:end]
+            offset = end
+        fields.append((field, value))
+    return fields
+
+
+def _read_packed(data):
+    values = []
+    offset = 0
+    while offset < len(data):
+        value, offset = _read_varint(data, offset)
+        values.append(value)
+    return values
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _decode_value(data):
+    field, value = _read_fields(data)[0]
+    if field == 1:
+        return value.decode()
+    if field == 6:
+        return _unzigzag(value)
+    if field == 7:
+        return bool(value)
+    return value
+
+
+def _decode_tile(data):
+    """
+    Returns a dictionary containing the features of each layer, features
+    are dictionaries containing the id, type, commands and properties.
+    """
+    layers = {}
+    for _, layer_data in _read_fields(data):
+        fields = _read_fields(layer_data)
+        keys = [value.decode() for field, value in fields if field == 3]
+        values = [_decode_value(value) for field, value in fields if field == 4]
+        features = []
+        for field, value in fields:
+            if field != 2:
+                continue
+            feature = {"id": None, "properties": {}}
+            for feature_field, feature_value in _read_fields(value):
+                if feature_field == 1:
+                    feature["id"] = feature_value
+                elif feature_field == 2:
+                    tags = _read_packed(feature_value)
+                    for key, value_index in zip(tags[::2], tags[1::2]):
+                        feature["properties"][keys[key]] = values[value_index]
+                elif feature_field == 3:
+                    feature["type"] = feature_value
+                elif feature_field == 4:
+                    feature["commands"] = _read_packed(feature_value)
+            features.append(feature)
+        name = next(value.decode() for field, value in fields if field == 1)
+        extent = next(value for field, value in fields if field == 5)
+        layers[name] = {"extent": extent, "features": features}
+    return layers
+
+
+class TestMvt(TestCase):
+    def test_tile_bounds(self):
+        bounds = tile_bounds(0, 0, 0)
+        self.assertAlmostEqual(bounds[0], -20037508.342789244)
+        self.assertAlmostEqual(bounds[3], 20037508.342789244)
+        self.assertEqual(tile_bounds(1, 0, 1)[:2], (0.0, 0.0))
+
+    def test_tile_geometry(self):
+        bounds = tile_bounds(0, 0, 1)
+        point = GEOSGeometry("SRID=4326;POINT (-90 0)")
+        self.assertEqual(
+            tile_geometry(point, bounds),
+            {"type": "Point", "coordinates": [2048, 4096]},
+        )
+        # the y axis points down
+        polygon = GEOSGeometry(
+            "SRID=3857;POLYGON ((-1e7 1e6, -1e6 1e6, -1e6 2e6, -1e7 1e6))"
+        )
+        geometry = tile_geometry(polygon, bounds, extent=256)
+        self.assertEqual(geometry["type"], "Polygon")
+        self.assertEqual(geometry["coordinates"][0][0], [128, 243])
+
+    def test_tile_geometry_clipped(self):
+        bounds = tile_bounds(0, 0, 1)
+        line = GEOSGeometry("SRID=4326;LINESTRING (-170 10, 170 10)")
+        geometry = tile_geometry(line, bounds, extent=4096, buffer=64)
+        self.assertEqual(geometry["coordinates"][0][0], 228)
+        self.assertEqual(geometry["coordinates"][1][0], 4096 + 64)
+        outside = GEOSGeometry("SRID=4326;POINT (90 -45)")
+        self.assertIsNone(tile_geometry(outside, bounds))
+
+    def test_encode_tile(self):
+        features = [
+            (
+                1,
+                {
+                    "type": "Polygon",
+                    "coordinates": [[[0, 0], [0, 10], [10, 10], [0, 0]]],
+                },
+                {"name": "a", "count": 3, "ratio": 0.5, "ok": True, "none": None},
+            ),
+            (
+                None,
+                {"type": "MultiPoint", "coordinates": [[5, 5], [3, 7]]},
+                {"name": "a", "count": -2},
+            ),
+            (
+                3,
+                {
+                    "type": "GeometryCollection",
+                    "geometries": [
+                        {"type": "Point", "coordinates": [1, 1]},
+                        {"type": "LineString", "coordinates": [[1, 1], [1, 1], [2, 3]]},
+                    ],
+                },
+                {},
+            ),
+        ]
+        layers = _decode_tile(encode_tile([("test", 512, features)]))
+        layer = layers["test"]
+        self.assertEqual(layer["extent"], 512)
+        polygon, points, point, line = layer["features"]
+        self.assertEqual(polygon["id"], 1)
+        self.assertEqual(polygon["type"], 3)
+        self.assertEqual(
+            polygon["properties"], {"name": "a", "count": 3, "ratio": 0.5, "ok": True}
+        )
+        # MoveTo(10, 10), LineTo(0, 10), (0, 0), ClosePath (exterior ring
+        # reversed to have a positive area in tile coordinates)
+        self.assertEqual(polygon["commands"], [9, 20, 20, 18, 19, 0, 0, 19, 15])
+        self.assertIsNone(points["id"])
+        self.assertEqual(points["type"], 1)
+        self.assertEqual(points["commands"], [17, 10, 10, 3, 4])
+        self.assertEqual(points["properties"], {"name": "a", "count": -2})
+        # geometry collections are split into several features
+        self.assertEqual((point["id"], point["type"]), (3, 1))
+        self.assertEqual((line["id"], line["type"]), (3, 2))
+        # repeated points are left out
+        self.assertEqual(line["commands"], [9, 2, 2, 10, 2, 4])
+
+    def test_encode_tile_empty_layer(self):
+        features = [(1, {"type": "Point", "coordinates": [1, 1]}, {})]
+        layers = _decode_tile(
+            encode_tile([("empty", 4096, []), ("one", 4096, features)])
+        )
+        self.assertEqual(list(layers), ["one"])
+        self.assertEqual(encode_tile([("empty", 4096, [])]), b"")
+
+    def _create_locations(self):
+        Location.objects.create(name="inside", geometry="POINT (-90 45)")
+        Location.objects.create(name="outside", geometry="POINT (90 45)")
+        Location.objects.create(
+            name="line", geometry="LINESTRING (-100 -10, -100 10, 100 10)"
+        )
+
+    def test_vector_tile(self):
+        self._create_locations()
+        url = reverse(
+            "api_geojson_location_vector_tile_list", kwargs={"z": 1, "x": 0, "y": 0}
+        )
+        response = self.client.get(
+            url, HTTP_ACCEPT="application/vnd.mapbox-vector-tile"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/vnd.mapbox-vector-tile")
+        layer = _decode_tile(response.content)["locations"]
+        self.assertEqual(layer["extent"], 4096)
+        features = sorted(layer["features"], key=lambda feature: feature["id"])
+        self.assertEqual(len(features), 2)
+        inside, line = features
+        self.assertEqual(inside["properties"]["name"], "inside")
+        self.assertEqual(inside["properties"]["fancy_name"], "Kool inside")
+        self.assertEqual(inside["type"], 1)
+        self.assertEqual(line["properties"]["name"], "line")
+        self.assertEqual(line["type"], 2)
+
+    def test_vector_tile_json(self):
+        self._create_locations()
+        url = reverse(
+            "api_geojson_location_vector_tile_list", kwargs={"z": 1, "x": 0, "y": 0}
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["type"], "FeatureCollection")
+
+    def test_vector_tile_query_param(self):
+        self._create_locations()
+        url = reverse("api_geojson_location_column_vector_tile_list")
+        response = self.client.get(
+            f"{url}?tile=1/0/1&format=mvt",
+        )
+        self.assertEqual(response.status_code, 200)
+        layer = _decode_tile(response.content)["locations"]
+        self.assertEqual(len(layer["features"]), 1)
+        feature = layer["features"][0]
+        self.assertEqual(feature["properties"], {"name": "line"})
+        self.assertEqual(feature["id"], Location.objects.get(name="line").pk)
+
+    def test_vector_tile_empty(self):
+        url = reverse(
+            "api_geojson_location_vector_tile_list", kwargs={"z": 2, "x": 3, "y": 3}
+        )
+        response = self.client.get(url, {"format": "mvt"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+
+    def test_vector_tile_invalid(self):
+        url = reverse(
+            "api_geojson_location_vector_tile_list", kwargs={"z": 1, "x": 2, "y": 0}
+        )
+        response = self.client.get(url, {"format": "mvt"})
+        self.assertEqual(response.status_code, 400)
+        url = reverse("api_geojson_location_column_vector_tile_list")
+        response = self.client.get(url, {"format": "mvt", "tile": "1/0"})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,194 @@
+import io
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.exceptions import ParseError
+
+from rest_framework_gis.parsers import (
+    GeoJsonParser,
+    GeoJsonSeqParser,
+    NewlineDelimitedGeoJsonParser,
+)
+
+from .models import Location
+from .views import GeojsonLocationList, GeojsonLocationUpload
+
+
+class TestGeoJsonSeqParsers(TestCase):
+    point = b'{"type": "Feature", "geometry": {"type": "Point", "coordinates": [1, 2]}}'
+
+    streaming_context = {"view": GeojsonLocationUpload()}
+
+    def test_parse_newline_delimited(self):
+        stream = io.BytesIO(self.point + b"\n\n" + self.point + b"\n")
+        features = NewlineDelimitedGeoJsonParser().parse(
+            stream, parser_context=self.streaming_context
+        )
+        self.assertEqual(next(features)["geometry"]["coordinates"], [1, 2])
+        self.assertEqual(len(list(features)), 1)
+
+    def test_parse_list(self):
+        # views which don't stream the upload get a list of features
+        for parser_context in ({"view": GeojsonLocationList()}, None):
+            stream = io.BytesIO(b"\x1e" + self.point + b"\n\x1e" + self.point)
+            features = GeoJsonSeqParser().parse(stream, parser_context=parser_context)
+            self.assertIsInstance(features, list)
+            self.assertEqual(len(features), 2)
+        self.assertEqual(NewlineDelimitedGeoJsonParser().parse(None), [])
+
+    def test_parse_geojson_seq(self):
+        multiline = self.point.replace(b", ", b",\n")
+        stream = io.BytesIO(b"\x1e" + self.point + b"\n\x1e" + multiline + b"\n")
+        features = list(GeoJsonSeqParser().parse(stream))
+        self.assertEqual(len(features), 2)
+        self.assertEqual(features[0], features[1])
+
+    def test_parse_invalid_record(self):
+        stream = io.BytesIO(self.point + b"\n{invalid\n")
+        features = NewlineDelimitedGeoJsonParser().parse(
+            stream, parser_context=self.streaming_context
+        )
+        next(features)
+        with self.assertRaises(ParseError):
+            next(features)
+        stream = io.BytesIO(self.point + b"\n{invalid\n")
+        with self.assertRaises(ParseError):
+            NewlineDelimitedGeoJsonParser().parse(stream)
+
+    def test_parse_missing_record_separator(self):
+        stream = io.BytesIO(self.point + b"\n")
+        with self.assertRaises(ParseError):
+            list(GeoJsonSeqParser().parse(stream))
+
+
+class TestGeoJsonParser(TestCase):
+    collection = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": n,
+                "geometry": {"type": "Point", "coordinates": [n, n * 1.5]},
+                "properties": {"name": f'l{n} \u00e8\\"]}}'},
+            }
+            for n in range(5)
+        ],
+        "bbox": [0, 0, 4, 6],
+    }
+
+    def _parse(self, data, chunk_size=3, view=None, **kwargs):
+        parser = GeoJsonParser()
+        parser.chunk_size = chunk_size
+        for attr, value in kwargs.items():
+            setattr(parser, attr, value)
+        view = GeojsonLocationUpload() if view is None else view
+        return parser.parse(io.BytesIO(data), parser_context={"view": view})
+
+    def _features(self, data, **kwargs):
+        return list(self._parse(data, **kwargs))
+
+    def test_parse_feature_collection(self):
+        for indent in (None, 2):
+            data = json.dumps(self.collection, indent=indent, ensure_ascii=False)
+            features = self._parse(data.encode())
+            self.assertEqual(next(features), self.collection["features"][0])
+            self.assertEqual(list(features), self.collection["features"][1:])
+
+    def test_parse_feature_collection_list(self):
+        # views which don't stream the upload get a list of features
+        data = json.dumps(self.collection).encode()
+        features = self._parse(data, view=GeojsonLocationList())
+        self.assertEqual(features, self.collection["features"])
+        features = GeoJsonParser().parse(io.BytesIO(data))
+        self.assertEqual(features, self.collection["features"])
+
+    def test_parse_feature(self):
+        feature = self.collection["features"][0]
+        self.assertEqual(self._parse(json.dumps(feature).encode()), feature)
+
+    def test_parse_empty_collection(self):
+        data = b'{"features": [], "type": "FeatureCollection"}'
+        self.assertEqual(self._features(data), [])
+
+    def test_parse_malformed(self):
+        for data in [
+            b"",
+            b"[]",
+            b'{"type": "Feature"} {}',
+            b'{"type": "FeatureCollection", "features": [{"type": "Feature"},]}',
+            b'{"type": "FeatureCollection", "features": [{"type": "Feature"}',
+            b'{"type": "FeatureCollection", "features": [{"type": "Point"}]}',
+            b'{"features": [{"type": "Feature"}], "type": "Topology"}',
+            b'{"type": "Feature", "properties": {"a": "unterminated}}',
+            b'{"type": "Feature", "properties": {"a": tru}}',
+            b'{"type": "Feature", "properties": {"a": "\xff"}}',
+        ]:
+            with self.subTest(data=data), self.assertRaises(ParseError):
+                self._features(data)
+
+    def test_parse_malformed_early(self):
+        data = b'{"type": "FeatureCollection", "features": [{"type": "Feature"}, {]'
+        features = self._parse(data + b" " * 1000, chunk_size=64)
+        next(features)
+        with self.assertRaises(ParseError):
+            next(features)
+
+    def test_limits(self):
+        data = json.dumps(self.collection).encode()
+        with self.assertRaisesRegex(ParseError, "single value exceeds"):
+            self._features(data, max_feature_size=50)
+        with self.assertRaisesRegex(ParseError, "data exceeds"):
+            self._features(data, max_upload_size=100)
+        with self.assertRaisesRegex(ParseError, "number of features"):
+            self._features(data, max_features=4)
+
+    def test_upload(self):
+        data = {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [n, n]},
+                    "properties": {"name": f"upload {n}"},
+                }
+                for n in range(5)
+            ],
+        }
+        response = self.client.post(
+            reverse("api_geojson_location_upload"),
+            data=json.dumps(data),
+            content_type="application/geo+json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {"count": 5})
+        self.assertEqual(Location.objects.filter(name__startswith="upload").count(), 5)
+
+    def test_upload_invalid_feature(self):
+        features = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [n, n]},
+                "properties": {"name": f"upload {n}"},
+            }
+            for n in range(5)
+        ]
+        features[3]["geometry"] = {"type": "Point"}
+        response = self.client.post(
+            reverse("api_geojson_location_upload"),
+            data=json.dumps({"type": "FeatureCollection", "features": features}),
+            content_type="application/geo+json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data), ["3"])
+        # the features of the previous batches are not saved
+        self.assertEqual(Location.objects.count(), 0)
+
+    def test_upload_malformed(self):
+        response = self.client.post(
+            reverse("api_geojson_location_upload"),
+            data=b'{"type": "FeatureCollection", "features": [{"type": "Feature",]}',
+            content_type="application/geo+json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Location.objects.count(), 0)
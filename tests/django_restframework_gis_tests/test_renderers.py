@@ -0,0 +1,124 @@
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from rest_framework_gis.fields import RawGeoJson
+from rest_framework_gis.renderers import (
+    GeoJsonRenderer,
+    GeoJsonSeqRenderer,
+    NewlineDelimitedGeoJsonRenderer,
+    StreamingGeoJsonRenderer,
+)
+
+from .models import Location
+
+
+class TestGeoJsonRenderer(TestCase):
+    def setUp(self):
+        self.feature = {
+            "type": "Feature",
+            "geometry": RawGeoJson('{"type":"Point","coordinates":[1.50,2]}'),
+            "properties": {"name": "rawgeojson"},
+        }
+
+    def test_raw_geojson(self):
+        self.assertEqual(
+            GeoJsonRenderer().render(self.feature),
+            b'{"type":"Feature","geometry":{"type":"Point","coordinates":[1.50,2]},'
+            b'"properties":{"name":"rawgeojson"}}',
+        )
+        # the raw geometry is not decoded
+        self.assertIsNone(self.feature["geometry"]._geojson)
+
+    def test_raw_geojson_indent(self):
+        data = GeoJsonRenderer().render(
+            [self.feature, self.feature], renderer_context={"indent": 2}
+        )
+        self.assertEqual(data.count(b'{"type":"Point","coordinates":[1.50,2]}'), 2)
+
+    def test_raw_geojson_streaming(self):
+        chunks = StreamingGeoJsonRenderer().render_stream([self.feature])
+        self.assertIn(b'{"type":"Point","coordinates":[1.50,2]}', b"".join(chunks))
+
+    def test_raw_geojson_json_renderer(self):
+        data = json.loads(JSONRenderer().render(self.feature))
+        self.assertEqual(data["geometry"], {"type": "Point", "coordinates": [1.5, 2]})
+
+
+class TestStreamingGeoJsonRenderer(TestCase):
+    def _create_locations(self):
+        for n in range(1, 4):
+            Location.objects.create(
+                id=n, name=f"l{n}", slug=f"l{n}", geometry=f"POINT ({n} {n})"
+            )
+
+    def test_render_stream(self):
+        renderer = StreamingGeoJsonRenderer()
+        renderer.buffer_size = 1
+        features = [{"type": "Feature", "id": n} for n in range(3)]
+        chunks = list(renderer.render_stream(iter(features)))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(
+            json.loads(b"".join(chunks)),
+            {"type": "FeatureCollection", "features": features},
+        )
+
+    def test_render_stream_empty(self):
+        chunks = list(StreamingGeoJsonRenderer().render_stream(iter([])))
+        self.assertEqual(
+            json.loads(b"".join(chunks)), {"type": "FeatureCollection", "features": []}
+        )
+
+    def test_streaming_list(self):
+        self._create_locations()
+        response = self.client.get(reverse("api_geojson_location_streaming_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/geo+json")
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(data["type"], "FeatureCollection")
+        self.assertEqual([f["id"] for f in data["features"]], [1, 2, 3])
+        self.assertEqual(
+            data["features"][0]["geometry"], {"type": "Point", "coordinates": [1, 1]}
+        )
+        self.assertEqual(data["features"][0]["properties"]["fancy_name"], "Kool l1")
+
+    def test_streaming_list_negotiation(self):
+        self._create_locations()
+        response = self.client.get(
+            reverse("api_geojson_location_streaming_list"),
+            HTTP_ACCEPT="application/geo+json-seq",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/geo+json-seq")
+        output = b"".join(response.streaming_content)
+        ids = [json.loads(record)["id"] for record in output.split(b"\x1e")[1:]]
+        self.assertEqual(ids, [1, 2, 3])
+
+
+class TestGeoJsonSeqRenderer(TestCase):
+    features = [
+        {"type": "Feature", "id": 1, "geometry": None, "properties": {}},
+        {"type": "Feature", "id": 2, "geometry": None, "properties": {}},
+    ]
+
+    def test_render_feature_collection(self):
+        data = {"type": "FeatureCollection", "features": self.features}
+        output = GeoJsonSeqRenderer().render(data)
+        records = output.split(b"\x1e")
+        self.assertEqual(records[0], b"")
+        self.assertEqual([json.loads(r) for r in records[1:]], self.features)
+        self.assertTrue(all(r.endswith(b"\n") for r in records[1:]))
+
+    def test_render_feature(self):
+        output = GeoJsonSeqRenderer().render(self.features[0])
+        self.assertEqual(output[:1], b"\x1e")
+        self.assertEqual(json.loads(output[1:]), self.features[0])
+
+    def test_render_newline_delimited(self):
+        data = {"type": "FeatureCollection", "features": self.features}
+        output = NewlineDelimitedGeoJsonRenderer().render(data)
+        lines = output.splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.features)
@@ -514,6 +514,17 @@ class TestPaginationSchemaGeneration(TestCase):
             expected_schema["required"] = ["count", "results"]
         self.assertDictEqual(generated_schema, expected_schema)
 
+    def test_geo_json_pagination_count_exact_schema(self):
+        pagination = GeoJsonPagination()
+        pagination.count_mode = "capped"
+        generated_schema = pagination.get_paginated_response_schema(
+            geojson_location_list
+        )
+        self.assertEqual(
+            generated_schema["properties"]["count_exact"],
+            {"type": "boolean", "example": True},
+        )
+
 
 class TestRestFrameworkGisFiltersSchema(TestCase):
     def test_in_BBox_filter_schema(self):
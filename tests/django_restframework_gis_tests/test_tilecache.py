@@ -0,0 +1,118 @@
+from django.contrib.gis.geos import Point, Polygon
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework_gis.mvt import MERCATOR_ORIGIN, tile_bounds, tile_range
+from rest_framework_gis.tilecache import TileCache
+
+from .models import Location
+
+
+class TestTileCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tile_cache = TileCache("test", max_zoom=10, max_invalidated_tiles=4)
+
+    def test_tile_range(self):
+        min_x, min_y, max_x, max_y = tile_bounds(3, 5, 4)
+        x, y = (min_x + max_x) / 2, (min_y + max_y) / 2
+        center = (x, y, x, y)
+        self.assertEqual(tile_range(center, 4), (3, 5, 3, 5))
+        self.assertEqual(tile_range(center, 3), (1, 2, 1, 2))
+        self.assertEqual(tile_range(center, 4, 0.6), (2, 4, 4, 6))
+        # the tiles which share an edge with the bounds are included
+        self.assertEqual(tile_range(tile_bounds(3, 5, 4), 4), (3, 5, 4, 6))
+        self.assertEqual(tile_range(tile_bounds(0, 0, 0), 2), (0, 0, 3, 3))
+
+    def test_get_set(self):
+        self.assertIsNone(self.tile_cache.get(1, 0, 0, "a"))
+        self.tile_cache.set(1, 0, 0, b"tile", "a")
+        self.assertEqual(self.tile_cache.get(1, 0, 0, "a"), b"tile")
+        self.assertIsNone(self.tile_cache.get(1, 0, 0, "b"))
+        self.assertIsNone(self.tile_cache.get(1, 1, 0, "a"))
+        # tiles above max_zoom are not cached
+        self.tile_cache.set(11, 0, 0, b"tile")
+        self.assertIsNone(self.tile_cache.get(11, 0, 0))
+
+    def test_invalidated_while_rendering(self):
+        key = self.tile_cache.get_key(1, 1, 0)
+        self.tile_cache.invalidate_tiles([(1, 1, 0)])
+        # the stale response is stored under the previous version
+        self.tile_cache.set(1, 1, 0, b"stale", key=key)
+        self.assertIsNone(self.tile_cache.get(1, 1, 0))
+        self.assertEqual(self.tile_cache.get(1, 1, 0, key=key), b"stale")
+
+    def test_invalidate_geometry(self):
+        for z, x, y in ((0, 0, 0), (1, 1, 0), (1, 0, 0), (10, 654, 483)):
+            self.tile_cache.set(z, x, y, b"tile")
+        self.tile_cache.invalidate_geometry(Point(50, 10, srid=4326))
+        self.assertIsNone(self.tile_cache.get(0, 0, 0))
+        self.assertIsNone(self.tile_cache.get(1, 1, 0))
+        self.assertIsNone(self.tile_cache.get(10, 654, 483))
+        self.assertEqual(self.tile_cache.get(1, 0, 0), b"tile")
+
+    def test_invalidate_geometry_poles(self):
+        self.tile_cache.set(10, 511, 0, b"tile")
+        self.tile_cache.set(10, 511, 1023, b"tile")
+        self.tile_cache.set(1, 0, 0, b"tile")
+        # the latitudes are clamped to the edges of the tiles
+        self.tile_cache.invalidate_geometry(Point(-0.1, 90, srid=4326))
+        self.tile_cache.invalidate_geometry(Point(-0.1, -100, srid=4326))
+        self.assertIsNone(self.tile_cache.get(10, 511, 0))
+        self.assertIsNone(self.tile_cache.get(10, 511, 1023))
+        self.assertIsNone(self.tile_cache.get(1, 0, 0))
+        bounds = TileCache._get_mercator_bounds(Point(0, 90, srid=4326))
+        self.assertAlmostEqual(bounds[3], MERCATOR_ORIGIN, places=3)
+
+    def test_invalidate_zoom_level(self):
+        self.tile_cache.set(10, 0, 0, b"tile")
+        self.tile_cache.set(2, 0, 0, b"tile")
+        # touches more than 4 tiles of zoom level 10
+        self.tile_cache.invalidate_geometry(Polygon.from_bbox((100, 0, 110, 10)))
+        self.assertIsNone(self.tile_cache.get(10, 0, 0))
+        self.assertEqual(self.tile_cache.get(2, 0, 0), b"tile")
+
+    def test_clear(self):
+        self.tile_cache.set(1, 0, 0, b"tile")
+        self.tile_cache.clear()
+        self.assertIsNone(self.tile_cache.get(1, 0, 0))
+
+
+class TestTileCacheMixin(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("api_geojson_location_list_cached_tile")
+
+    def _get_names(self, tile):
+        response = self.client.get(self.url, {"tile": tile, "format": "json"})
+        self.assertEqual(response.status_code, 200)
+        return sorted(f["properties"]["name"] for f in response.json()["features"])
+
+    def test_cached_tile(self):
+        location = Location.objects.create(name="l1", geometry=Point(50, 10))
+        self.assertEqual(self._get_names("1/1/0"), ["l1"])
+        Location.objects.filter(pk=location.pk).update(name="updated")
+        # the update doesn't send signals, the cached response is returned
+        self.assertEqual(self._get_names("1/1/0"), ["l1"])
+
+    def test_invalidated_on_save(self):
+        location = Location.objects.create(name="l1", geometry=Point(50, 10))
+        self.assertEqual(self._get_names("1/1/0"), ["l1"])
+        self.assertEqual(self._get_names("1/0/0"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            location.geometry = Point(-50, 10)
+            location.save()
+        # both the tile of the previous and the current geometry are invalidated
+        self.assertEqual(self._get_names("1/1/0"), [])
+        self.assertEqual(self._get_names("1/0/0"), ["l1"])
+        with self.captureOnCommitCallbacks(execute=True):
+            location.delete()
+        self.assertEqual(self._get_names("1/0/0"), [])
+
+    def test_not_cached_without_tile(self):
+        Location.objects.create(name="l1", geometry=Point(50, 10))
+        response = self.client.get(self.url, {"format": "json"})
+        self.assertEqual(len(response.json()["features"]), 1)
+        response = self.client.get(self.url, {"tile": "1/0", "format": "json"})
+        self.assertEqual(response.status_code, 400)
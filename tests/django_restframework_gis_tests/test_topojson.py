@@ -0,0 +1,141 @@
+import json
+
+from django.test import TestCase
+
+from rest_framework_gis import serializers as gis_serializers
+from rest_framework_gis.renderers import TopoJsonRenderer
+from rest_framework_gis.topojson import geojson_to_topology
+
+from .models import Location
+
+
+def _square(x, y):
+    return [[[x, y], [x + 1, y], [x + 1, y + 1], [x, y + 1], [x, y]]]
+
+
+class TestTopoJson(TestCase):
+    features = [
+        {
+            "type": "Feature",
+            "id": n,
+            "geometry": {"type": "Polygon", "coordinates": _square(n, 0)},
+            "properties": {"name": f"square {n}"},
+        }
+        for n in range(3)
+    ]
+
+    def _decode_rings(self, topology):
+        """
+        Rebuilds the coordinates of the rings of each polygon
+        """
+        transform = topology.get("transform")
+        arcs = []
+        for arc in topology["arcs"]:
+            points = []
+            x = y = 0
+            for point in arc:
+                if transform:
+                    x, y = x + point[0], y + point[1]
+                    scale, translate = transform["scale"], transform["translate"]
+                    point = [x * scale[0] + translate[0], y * scale[1] + translate[1]]
+                points.append(point)
+            arcs.append(points)
+        polygons = []
+        for geometry in topology["objects"]["collection"]["geometries"]:
+            rings = []
+            for ring_arcs in geometry["arcs"]:
+                ring = []
+                for index in ring_arcs:
+                    points = arcs[index] if index >= 0 else arcs[~index][::-1]
+                    ring.extend(points[1:] if ring else points)
+                rings.append(ring)
+            polygons.append(rings)
+        return polygons
+
+    def test_shared_arcs(self):
+        topology = geojson_to_topology(self.features)
+        self.assertEqual(topology["type"], "Topology")
+        self.assertEqual(topology["bbox"], [0, 0, 3, 1])
+        self.assertNotIn("transform", topology)
+        # the two shared edges are stored once: 8 edges, 6 arcs
+        self.assertEqual(len(topology["arcs"]), 6)
+        geometries = topology["objects"]["collection"]["geometries"]
+        self.assertEqual(
+            [(g["id"], g["properties"]["name"]) for g in geometries],
+            [(0, "square 0"), (1, "square 1"), (2, "square 2")],
+        )
+        for rings, feature in zip(self._decode_rings(topology), self.features):
+            # rings can start from a different point
+            ring = rings[0][:-1]
+            expected = feature["geometry"]["coordinates"][0][:-1]
+            start = ring.index(expected[0])
+            self.assertEqual(ring[start:] + ring[:start], expected)
+
+    def test_quantization(self):
+        topology = geojson_to_topology(self.features, quantization=4)
+        self.assertEqual(
+            topology["transform"], {"scale": [1.0, 1 / 3], "translate": [0, 0]}
+        )
+        # delta encoded integer coordinates
+        self.assertEqual(topology["arcs"][0], [[1, 0], [0, 3]])
+        self.assertEqual(len(topology["arcs"]), 6)
+        for rings in self._decode_rings(topology):
+            for x, y in rings[0]:
+                self.assertIn(x, (0, 1, 2, 3))
+                self.assertIn(y, (0, 1))
+
+    def test_other_geometry_types(self):
+        features = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": [[0, 0], [2, 2]]},
+                "properties": {},
+            },
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [1, 1]},
+                "properties": {},
+            },
+            {"type": "Feature", "geometry": None, "properties": {}},
+        ]
+        topology = geojson_to_topology(features)
+        geometries = topology["objects"]["collection"]["geometries"]
+        self.assertEqual(geometries[0]["arcs"], [0])
+        self.assertEqual(geometries[1]["coordinates"], [1, 1])
+        self.assertEqual(geometries[2]["type"], None)
+        self.assertEqual(topology["arcs"], [[[0, 0], [2, 2]]])
+
+    def test_renderer(self):
+        data = {
+            "type": "FeatureCollection",
+            "count": 3,
+            "features": self.features,
+        }
+        topology = json.loads(TopoJsonRenderer().render(data))
+        self.assertEqual(topology["type"], "Topology")
+        self.assertEqual(topology["count"], 3)
+        self.assertEqual(len(topology["objects"]["collection"]["geometries"]), 3)
+        # other data is rendered as JSON
+        error = {"detail": "Not found."}
+        self.assertEqual(json.loads(TopoJsonRenderer().render(error)), error)
+
+    def test_list_serializer(self):
+        class LocationTopoJsonSerializer(gis_serializers.GeoFeatureModelSerializer):
+            class Meta:
+                model = Location
+                geo_field = "geometry"
+                fields = ("id", "name")
+                list_serializer_class = gis_serializers.TopoJsonListSerializer
+
+        locations = [
+            Location(
+                id=n,
+                name=f"l{n}",
+                geometry=f"POLYGON (({n} 0, {n + 1} 0, " f"{n + 1} 1, {n} 1, {n} 0))",
+            )
+            for n in range(3)
+        ]
+        data = LocationTopoJsonSerializer(locations, many=True).data
+        self.assertEqual(data["type"], "Topology")
+        self.assertIn("transform", data)
+        self.assertEqual(len(data["arcs"]), 6)
@@ -10,12 +10,19 @@ from django.contrib.gis.geos import GEOSGeometry, Point
 from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
 from django.urls import reverse
+from rest_framework import generics, serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
 
 from rest_framework_gis import serializers as gis_serializers
 from rest_framework_gis.fields import GeoJsonDict
+from rest_framework_gis.mixins import GeoFeatureQuerysetMixin
+from rest_framework_gis.pagination import EstimatedCountPaginator, GeoJsonPagination
 
-from .models import LocatedFile, Location, Nullable, OtherSridLocation
+from .models import BoxedLocation, LocatedFile, Location, Nullable, OtherSridLocation
 from .serializers import LocationGeoSerializer
+from .views import CappedCountPagination
 
 
 class TestRestFrameworkGis(TestCase):
@@ -693,6 +700,23 @@ class TestRestFrameworkGis(TestCase):
         with self.assertRaises(ImproperlyConfigured):
             LocationGeoFeatureSerializer()
 
+    def test_meta_improperly_configured(self):
+        self.assertIsNone(gis_serializers.GeoFeatureModelSerializer._meta_error)
+
+        class NoMetaGeoFeatureSerializer(gis_serializers.GeoFeatureModelSerializer):
+            pass
+
+        class NoModelGeoFeatureSerializer(gis_serializers.GeoFeatureModelSerializer):
+            class Meta:
+                geo_field = "geometry"
+
+        for serializer_class in (
+            NoMetaGeoFeatureSerializer,
+            NoModelGeoFeatureSerializer,
+        ):
+            with self.assertRaises(ImproperlyConfigured):
+                serializer_class()
+
     def test_exclude_geo_field_improperly_configured(self):
         self._create_locations()
 
@@ -716,6 +740,43 @@ class TestRestFrameworkGis(TestCase):
         self.assertIn("next", response.data)
         self.assertIn("previous", response.data)
 
+    def test_geojson_pagination_capped_count(self):
+        for n in range(3):
+            Location.objects.create(name=f"l{n}", geometry=Point(n, n))
+        url = reverse("api_geojson_location_capped_count_list")
+        response = self.client.get(url, {"page_size": 1})
+        # at most count_limit + 1 rows are counted
+        self.assertEqual(response.data["count"], 2)
+        self.assertFalse(response.data["count_exact"])
+        self.assertIsNotNone(response.data["next"])
+        # the pages beyond the count can be requested
+        response = self.client.get(url, {"page_size": 1, "page": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["features"][0]["properties"]["name"], "l2")
+        self.assertIsNotNone(response.data["next"])
+        response = self.client.get(url, {"page_size": 1, "page": 4})
+        self.assertEqual(response.data["features"], [])
+        self.assertIsNone(response.data["next"])
+        # small results are counted exactly
+        Location.objects.filter(name="l2").delete()
+        response = self.client.get(url, {"page_size": 1})
+        self.assertEqual(response.data["count"], 2)
+        self.assertTrue(response.data["count_exact"])
+        self.assertIsNone(response.data["previous"])
+
+    def test_geojson_pagination_paginator_class(self):
+        self.assertIs(GeoJsonPagination.django_paginator_class, EstimatedCountPaginator)
+        pagination = CappedCountPagination()
+        request = Request(APIRequestFactory().get("/", {"page_size": 1}))
+        self.assertEqual(pagination.paginate_queryset([1, 2, 3], request), [1])
+        paginator = pagination.page.paginator
+        self.assertIsInstance(paginator, EstimatedCountPaginator)
+        self.assertEqual((paginator.count_mode, paginator.count_limit), ("capped", 2))
+        # the class attribute of the pagination is not modified
+        self.assertIs(
+            CappedCountPagination.django_paginator_class, EstimatedCountPaginator
+        )
+
     def test_pickle(self):
         geometry = GEOSGeometry("POINT (30 10)")
         geojsondict = GeoJsonDict(
@@ -773,3 +834,325 @@ class TestRestFrameworkGis(TestCase):
         response = self.client.get(url)
         self.assertCountEqual(json.dumps(response.data), json.dumps(expected))
         self.assertContains(response, "Kool geometry collection geojson test")
+
+    def test_db_geojson(self):
+        self._create_locations()
+
+        class LocationGeoFeatureSerializer(gis_serializers.GeoFeatureModelSerializer):
+            geometry = gis_serializers.GeometryField(precision=2, auto_bbox=True)
+
+            class Meta:
+                model = Location
+                geo_field = "geometry"
+                fields = ("id", "name")
+                db_geojson = True
+
+        queryset = LocationGeoFeatureSerializer.annotate_geojson(
+            Location.objects.order_by("id")
+        )
+        self.assertEqual(queryset[0].get_deferred_fields(), {"geometry"})
+        data = LocationGeoFeatureSerializer(queryset, many=True).data
+        self.assertEqual(
+            data["features"][0]["geometry"],
+            {
+                "type": "Point",
+                "bbox": [13.01, 42.42, 13.01, 42.42],
+                "coordinates": [13.01, 42.42],
+            },
+        )
+        # instances which have not been annotated are encoded in python
+        data = LocationGeoFeatureSerializer(self.l1).data
+        self.assertEqual(data["geometry"]["coordinates"], [13.01, 42.42])
+
+    def test_db_geojson_transform_improperly_configured(self):
+        class LocationGeoFeatureSerializer(gis_serializers.GeoFeatureModelSerializer):
+            geometry = gis_serializers.GeometryField(transform="+proj=longlat")
+
+            class Meta:
+                model = Location
+                geo_field = "geometry"
+                fields = ("id", "name")
+                db_geojson = True
+
+        with self.assertRaises(ImproperlyConfigured):
+            LocationGeoFeatureSerializer.annotate_geojson(Location.objects.all())
+
+    def test_feature_fields_computed_once(self):
+        class LocationGeoFeatureSerializer(gis_serializers.GeoFeatureModelSerializer):
+            secret = serializers.CharField(write_only=True)
+
+            class Meta:
+                model = Location
+                geo_field = "geometry"
+                fields = ("id", "name", "secret")
+
+        locations = [
+            Location(id=1, name="l1", geometry="POINT (1 1)"),
+            Location(id=2, name="l2", geometry="POINT (2 2)"),
+        ]
+        serializer = LocationGeoFeatureSerializer(locations, many=True)
+        data = serializer.data
+        self.assertEqual(data["features"][0]["properties"], {"name": "l1"})
+        self.assertEqual(data["features"][1]["properties"], {"name": "l2"})
+        self.assertEqual(data["features"][1]["id"], 2)
+        id_field, geo_field, bbox_field, fields = serializer.child._feature_fields
+        self.assertIs(id_field, serializer.child.fields["id"])
+        self.assertIs(geo_field, serializer.child.fields["geometry"])
+        self.assertIsNone(bbox_field)
+        self.assertEqual([field.field_name for field in fields], ["name"])
+        # write only fields are skipped when passed to get_properties
+        properties = serializer.child.get_properties(
+            locations[0], serializer.child.fields.values()
+        )
+        self.assertNotIn("secret", properties)
+
+    def test_meta_resolved_once(self):
+        class LocationGeoFeatureSerializer(gis_serializers.GeoFeatureModelSerializer):
+            class Meta:
+                model = Location
+                geo_field = "geometry"
+                fields = ["id", "name"]
+
+        declared_meta = LocationGeoFeatureSerializer.Meta.__bases__[0]
+        meta = LocationGeoFeatureSerializer().Meta
+        self.assertIs(LocationGeoFeatureSerializer().Meta, meta)
+        self.assertEqual(meta.fields, ["id", "name", "geometry"])
+        self.assertEqual(meta.id_field, "id")
+        self.assertFalse(meta.auto_bbox)
+        # the declared options are not modified
+        self.assertEqual(declared_meta.fields, ["id", "name"])
+        self.assertFalse(hasattr(declared_meta, "id_field"))
+
+        class SlugGeoFeatureSerializer(LocationGeoFeatureSerializer):
+            class Meta(LocationGeoFeatureSerializer.Meta):
+                fields = ["slug", "name"]
+
+        meta = SlugGeoFeatureSerializer.Meta
+        self.assertEqual(meta.fields, ["slug", "name", "geometry"])
+        self.assertIsNone(meta.id_field)
+
+    def test_optimize_queryset(self):
+        self._create_locations()
+
+        class BoxedLocationGeoFeatureSerializer(
+            gis_serializers.GeoFeatureModelSerializer
+        ):
+            class Meta:
+                model = BoxedLocation
+                geo_field = "geometry"
+                bbox_geo_field = "bbox_geometry"
+                fields = ("id", "name")
+
+        queryset = BoxedLocationGeoFeatureSerializer.optimize_queryset(
+            BoxedLocation.objects.all()
+        )
+        self.assertEqual(
+            queryset.query.deferred_loading,
+            ({"id", "name", "geometry", "bbox_geometry"}, False),
+        )
+
+        class LocationGeoFeatureSerializer(gis_serializers.GeoFeatureModelSerializer):
+            class Meta:
+                model = Location
+                geo_field = "geometry"
+                fields = ("id", "name")
+
+        class LocationList(GeoFeatureQuerysetMixin, generics.ListAPIView):
+            queryset = Location.objects.order_by("id")
+            serializer_class = LocationGeoFeatureSerializer
+
+        view = LocationList(request=None, format_kwarg=None)
+        queryset = view.get_queryset()
+        self.assertEqual(queryset[0].get_deferred_fields(), {"slug", "timestamp"})
+        self.assertEqual(
+            LocationGeoFeatureSerializer(queryset, many=True).data,
+            LocationGeoFeatureSerializer(
+                Location.objects.order_by("id"), many=True
+            ).data,
+        )
+
+    def test_optimize_queryset_method_field(self):
+        class LocationGeoFeatureSerializer(gis_serializers.GeoFeatureModelSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Location
+                geo_field = "geometry"
+                fields = ("id", "label")
+
+            def get_label(self, obj):
+                return str(obj)
+
+        queryset = LocationGeoFeatureSerializer.optimize_queryset(
+            Location.objects.all()
+        )
+        self.assertEqual(queryset.query.deferred_loading, (frozenset(), True))
+
+    def _get_bulk_serializer_class(self, batch_size):
+        class LocationGeoFeatureSerializer(gis_serializers.GeoFeatureModelSerializer):
+            class Meta:
+                model = Location
+                geo_field = "geometry"
+                fields = ("id", "name", "slug")
+                bulk_batch_size = batch_size
+
+        return LocationGeoFeatureSerializer
+
+    def test_geojson_list_create(self):
+        data = {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [12.49, 41.89]},
+                    "properties": {"name": "rome", "slug": "rome"},
+                },
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [2.35, 48.85]},
+                    "properties": {"name": "paris", "slug": "paris"},
+                },
+            ],
+        }
+        for batch_size in (None, 1):
+            with self.subTest(batch_size=batch_size):
+                Location.objects.all().delete()
+                serializer_class = self._get_bulk_serializer_class(batch_size)
+                serializer = serializer_class(data=data, many=True)
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+                serializer.save()
+                self.assertEqual(Location.objects.count(), 2)
+                location = Location.objects.get(slug="paris")
+                self.assertEqual(location.geometry.coords, (2.35, 48.85))
+
+    def test_geojson_list_create_errors(self):
+        serializer_class = self._get_bulk_serializer_class(100)
+        data = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [12.49, 41.89]},
+                "properties": {"name": "rome", "slug": "rome"},
+            },
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [2.35, 48.85]},
+                "properties": {"slug": "paris"},
+            },
+        ]
+        serializer = serializer_class(data=data, many=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors[0], {})
+        self.assertIn("name", serializer.errors[1])
+
+    def test_geojson_list_update(self):
+        for batch_size in (None, 1):
+            with self.subTest(batch_size=batch_size):
+                Location.objects.all().delete()
+                self._create_locations()
+                data = {
+                    "type": "FeatureCollection",
+                    "features": [
+                        {
+                            "id": 2,
+                            "type": "Feature",
+                            "geometry": {"type": "Point", "coordinates": [1, 2]},
+                            "properties": {"name": "l2 changed", "slug": "l2"},
+                        },
+                        {
+                            "id": 1,
+                            "type": "Feature",
+                            "geometry": {"type": "Point", "coordinates": [3, 4]},
+                            "properties": {"name": "l1 changed", "slug": "l1"},
+                        },
+                    ],
+                }
+                serializer_class = self._get_bulk_serializer_class(batch_size)
+                serializer = serializer_class(
+                    Location.objects.all(), data=data, many=True
+                )
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+                serializer.save()
+                self.l1.refresh_from_db()
+                self.l2.refresh_from_db()
+                self.assertEqual(self.l1.name, "l1 changed")
+                self.assertEqual(self.l1.geometry.coords, (3, 4))
+                self.assertEqual(self.l2.name, "l2 changed")
+                self.assertEqual(self.l2.geometry.coords, (1, 2))
+
+    def test_geojson_list_update_not_found(self):
+        self._create_locations()
+        data = [
+            {
+                "id": 3,
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [1, 2]},
+                "properties": {"name": "l3", "slug": "l3"},
+            }
+        ]
+        serializer_class = self._get_bulk_serializer_class(100)
+        serializer = serializer_class(Location.objects.all(), data=data, many=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors[0]["id"][0].code, "not_found")
+
+    def _get_sparse_serializer(self, query_string, db_geojson=False):
+        db_geojson_option = db_geojson
+
+        class LocationGeoFeatureSerializer(gis_serializers.GeoFeatureModelSerializer):
+            properties_param = "properties"
+            geometry_param = "geometry"
+
+            class Meta:
+                model = Location
+                geo_field = "geometry"
+                fields = ("id", "name", "slug", "timestamp")
+                db_geojson = db_geojson_option
+
+        request = Request(APIRequestFactory().get(f"/?{query_string}"))
+        return LocationGeoFeatureSerializer, {"request": request}
+
+    def test_sparse_fieldsets(self):
+        location = Location(id=1, name="l1", slug="l1", geometry="POINT (1 1)")
+        serializer_class, context = self._get_sparse_serializer(
+            "properties=slug,name&geometry=false"
+        )
+        data = serializer_class(location, context=context).data
+        self.assertIsNone(data["geometry"])
+        self.assertEqual(data["properties"], {"name": "l1", "slug": "l1"})
+        queryset = serializer_class.optimize_queryset(Location.objects.all(), context)
+        self.assertEqual(
+            queryset.query.deferred_loading, ({"id", "name", "slug"}, False)
+        )
+        # the geometry is included by default
+        serializer_class, context = self._get_sparse_serializer("properties=")
+        data = serializer_class(location, context=context).data
+        self.assertEqual(data["geometry"]["coordinates"], [1.0, 1.0])
+        self.assertEqual(data["properties"], {})
+
+    def test_sparse_fieldsets_disabled_by_default(self):
+        class LocationGeoFeatureSerializer(gis_serializers.GeoFeatureModelSerializer):
+            class Meta:
+                model = Location
+                geo_field = "geometry"
+                fields = ("id", "name")
+
+        location = Location(id=1, name="l1", geometry="POINT (1 1)")
+        request = Request(APIRequestFactory().get("/?properties=x&geometry=false"))
+        serializer = LocationGeoFeatureSerializer(
+            location, context={"request": request}
+        )
+        data = serializer.data
+        self.assertEqual(data["geometry"]["coordinates"], [1.0, 1.0])
+        self.assertEqual(data["properties"], {"name": "l1"})
+
+    def test_sparse_fieldsets_invalid_property(self):
+        serializer_class, context = self._get_sparse_serializer("properties=name,x")
+        with self.assertRaises(ParseError):
+            serializer_class(Location(id=1), context=context).data
+
+    def test_sparse_fieldsets_db_geojson(self):
+        serializer_class, context = self._get_sparse_serializer(
+            "geometry=0", db_geojson=True
+        )
+        queryset = serializer_class.annotate_geojson(Location.objects.all(), context)
+        self.assertEqual(queryset.query.annotations, {})
+        self.assertEqual(queryset.query.deferred_loading, ({"geometry"}, True))
@@ -7,6 +7,36 @@ urlpatterns = [
     path("<int:pk>", views.location_details, name="api_location_details"),
     # geojson
     path("geojson/", views.geojson_location_list, name="api_geojson_location_list"),
+    path(
+        "geojson-capped-count/",
+        views.geojson_location_capped_count_list,
+        name="api_geojson_location_capped_count_list",
+    ),
+    path(
+        "geojson-streaming/",
+        views.geojson_location_streaming_list,
+        name="api_geojson_location_streaming_list",
+    ),
+    path(
+        "geojson-upload/",
+        views.geojson_location_upload,
+        name="api_geojson_location_upload",
+    ),
+    path(
+        "geojson-geobuf/",
+        views.geojson_location_geobuf_list,
+        name="api_geojson_location_geobuf_list",
+    ),
+    path(
+        "geojson-tiles/<int:z>/<int:x>/<int:y>/",
+        views.geojson_location_vector_tile_list,
+        name="api_geojson_location_vector_tile_list",
+    ),
+    path(
+        "geojson-tiles-columns/",
+        views.geojson_location_column_vector_tile_list,
+        name="api_geojson_location_column_vector_tile_list",
+    ),
     path(
         "geojson_writable_id/",
         views.geojson_location_writable_id_list,
@@ -106,6 +136,16 @@ urlpatterns = [
         views.geojson_location_overlaps_tile_list,
         name="api_geojson_location_list_overlaps_tile_filter",
     ),
+    path(
+        "filters/cached_tile",
+        views.geojson_location_cached_tile_list,
+        name="api_geojson_location_list_cached_tile",
+    ),
+    path(
+        "filters/clusters",
+        views.geojson_location_cluster_list,
+        name="api_geojson_location_cluster_list",
+    ),
     path(
         "filters/within_distance_of_point",
         views.geojson_location_within_distance_of_point_list,
@@ -116,6 +156,26 @@ urlpatterns = [
         views.geojson_location_within_degrees_of_point_list,
         name="api_geojson_location_list_within_degrees_of_point_filter",
     ),
+    path(
+        "filters/within_geodesic_distance_of_point",
+        views.geojson_location_within_geodesic_distance_of_point_list,
+        name="api_geojson_location_list_within_geodesic_distance_of_point_filter",
+    ),
+    path(
+        "filters/nearest",
+        views.geojson_location_nearest_list,
+        name="api_geojson_location_nearest_list_filter",
+    ),
+    path(
+        "filters/nearest/<int:pk>/",
+        views.geojson_location_nearest_details,
+        name="api_geojson_location_nearest_details_filter",
+    ),
+    path(
+        "filters/geometry_lookup",
+        views.geojson_location_geometry_lookup_list,
+        name="api_geojson_location_geometry_lookup_list_filter",
+    ),
     path(
         "filters/order_distance_to_point",
         views.geojson_location_order_distance_to_point_list,
@@ -1,15 +1,36 @@
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 
 from rest_framework_gis.filters import (
     DistanceToPointFilter,
     DistanceToPointOrderingFilter,
     GeoFilterSet,
     GeometryFilter,
+    GeometryLookupFilter,
     InBBoxFilter,
+    KNearestNeighborsFilter,
     TMSTileFilter,
 )
+from rest_framework_gis.mixins import (
+    ClusterMixin,
+    StreamingGeoJsonCreateMixin,
+    StreamingGeoJsonListMixin,
+    TileCacheMixin,
+    VectorTileMixin,
+)
 from rest_framework_gis.pagination import GeoJsonPagination
+from rest_framework_gis.parsers import GeobufParser, GeoJsonParser
+from rest_framework_gis.renderers import (
+    FlatGeobufRenderer,
+    GeobufRenderer,
+    GeoJsonRenderer,
+    GeoJsonSeqRenderer,
+    MvtRenderer,
+    StreamingGeoJsonRenderer,
+)
+from rest_framework_gis.tilecache import TileCache
 
 from .models import (
     BoxedLocation,
@@ -22,12 +43,14 @@ from .models import (
 from .serializers import (
     BoxedLocationGeoFeatureSerializer,
     LocatedFileGeoFeatureSerializer,
+    LocationDistanceGeoFeatureSerializer,
     LocationGeoFeatureBboxSerializer,
     LocationGeoFeatureFalseIdSerializer,
     LocationGeoFeatureMethodSerializer,
     LocationGeoFeatureNoIdSerializer,
     LocationGeoFeatureSerializer,
     LocationGeoFeatureSlugSerializer,
+    LocationGeoFeatureSparseSerializer,
     LocationGeoFeatureWritableIdSerializer,
     LocationGeoSerializer,
     NoGeoFeatureMethodSerializer,
@@ -76,6 +99,71 @@ class GeojsonLocationList(generics.ListCreateAPIView):
 geojson_location_list = GeojsonLocationList.as_view()
 
 
+class CappedCountPagination(GeoJsonPagination):
+    count_mode = "capped"
+    count_limit = 2
+
+
+class GeojsonLocationCappedCountList(generics.ListAPIView):
+    model = Location
+    serializer_class = LocationGeoFeatureSerializer
+    queryset = Location.objects.order_by("pk")
+    pagination_class = CappedCountPagination
+
+
+geojson_location_capped_count_list = GeojsonLocationCappedCountList.as_view()
+
+
+class GeojsonLocationStreamingList(StreamingGeoJsonListMixin, generics.ListAPIView):
+    model = Location
+    serializer_class = LocationGeoFeatureSerializer
+    queryset = Location.objects.order_by("id")
+    renderer_classes = (
+        StreamingGeoJsonRenderer,
+        GeoJsonSeqRenderer,
+        FlatGeobufRenderer,
+    )
+    stream_chunk_size = 1
+
+
+geojson_location_streaming_list = GeojsonLocationStreamingList.as_view()
+
+
+class GeojsonLocationGeobufList(generics.ListCreateAPIView):
+    model = Location
+    serializer_class = LocationGeoFeatureSerializer
+    queryset = Location.objects.order_by("id")
+    renderer_classes = (GeoJsonRenderer, GeobufRenderer)
+    parser_classes = (JSONParser, GeobufParser)
+
+
+geojson_location_geobuf_list = GeojsonLocationGeobufList.as_view()
+
+
+class GeojsonLocationUpload(StreamingGeoJsonCreateMixin, generics.CreateAPIView):
+    model = Location
+    serializer_class = LocationGeoFeatureSerializer
+    parser_classes = (GeoJsonParser, JSONParser)
+    upload_batch_size = 2
+
+
+geojson_location_upload = GeojsonLocationUpload.as_view()
+
+
+class GeojsonLocationVectorTileList(VectorTileMixin, generics.ListAPIView):
+    model = Location
+    serializer_class = LocationGeoFeatureSerializer
+    queryset = Location.objects.order_by("id")
+    renderer_classes = (JSONRenderer, MvtRenderer)
+    vector_tile_layer_name = "locations"
+
+
+geojson_location_vector_tile_list = GeojsonLocationVectorTileList.as_view()
+geojson_location_column_vector_tile_list = GeojsonLocationVectorTileList.as_view(
+    serializer_class=LocationGeoFeatureNoIdSerializer
+)
+
+
 class GeojsonLocationWritableIdList(generics.ListCreateAPIView):
     model = Location
     serializer_class = LocationGeoFeatureWritableIdSerializer
@@ -121,6 +209,29 @@ class GeojsonLocationOverlapsTileList(GeojsonLocationContainedInTileList):
 
 geojson_location_overlaps_tile_list = GeojsonLocationOverlapsTileList.as_view()
 
+location_tile_cache = TileCache("locations")
+location_tile_cache.register(Location, "geometry")
+
+
+class GeojsonLocationCachedTileList(TileCacheMixin, GeojsonLocationOverlapsTileList):
+    tile_cache = location_tile_cache
+
+
+geojson_location_cached_tile_list = GeojsonLocationCachedTileList.as_view()
+
+
+class GeojsonLocationClusterList(ClusterMixin, generics.ListAPIView):
+    model = Location
+    serializer_class = LocationGeoFeatureSerializer
+    queryset = Location.objects.all()
+    bbox_filter_field = "geometry"
+    bbox_filter_include_overlapping = True
+    filter_backends = (InBBoxFilter,)
+    cluster_max_zoom = 10
+
+
+geojson_location_cluster_list = GeojsonLocationClusterList.as_view()
+
 
 class GeojsonLocationWithinDistanceOfPointList(generics.ListAPIView):
     model = Location
@@ -145,6 +256,56 @@ geojson_location_within_degrees_of_point_list = (
 )
 
 
+class GeojsonLocationWithinGeodesicDistanceOfPointList(
+    GeojsonLocationWithinDistanceOfPointList
+):
+    distance_filter_geodesic = True
+
+
+geojson_location_within_geodesic_distance_of_point_list = (
+    GeojsonLocationWithinGeodesicDistanceOfPointList.as_view()
+)
+
+
+class GeojsonLocationNearestList(generics.ListAPIView):
+    model = Location
+    serializer_class = LocationDistanceGeoFeatureSerializer
+    queryset = Location.objects.all()
+    knn_filter_field = "geometry"
+    knn_max_k = 3
+    filter_backends = (KNearestNeighborsFilter,)
+
+
+geojson_location_nearest_list = GeojsonLocationNearestList.as_view()
+
+
+class GeojsonLocationNearestDetails(generics.RetrieveUpdateDestroyAPIView):
+    model = Location
+    serializer_class = LocationDistanceGeoFeatureSerializer
+    queryset = Location.objects.all()
+    knn_filter_field = "geometry"
+    filter_backends = (KNearestNeighborsFilter,)
+
+
+geojson_location_nearest_details = GeojsonLocationNearestDetails.as_view()
+
+
+class GeojsonLocationGeometryLookupList(generics.ListAPIView):
+    model = Location
+    serializer_class = LocationGeoFeatureSparseSerializer
+    queryset = Location.objects.all()
+    geometry_filter_field = "geometry"
+    geometry_filter_max_vertices = 50
+    filter_backends = (GeometryLookupFilter,)
+
+    def post(self, request, *args, **kwargs):
+        # geometries which are too long for the query string
+        return self.list(request, *args, **kwargs)
+
+
+geojson_location_geometry_lookup_list = GeojsonLocationGeometryLookupList.as_view()
+
+
 class GeojsonLocationOrderDistanceToPointList(generics.ListAPIView):
     model = Location
     serializer_class = LocationGeoFeatureSerializer